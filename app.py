@@ -7,17 +7,79 @@ Campus Cryptocurrency Prototype
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-import requests
-from io import StringIO
 import os
+import logging
+import threading
+import time
+import hmac
+from functools import partial
+from urllib.parse import urlencode
+
+from cryptocoin.client import FETCH_RETRIES, FETCH_TIMEOUT, LedgerClient
+from cryptocoin.core import (
+    ANOMALY_KINDS,
+    CHART_POINT_BUDGET,
+    LEADERBOARD_DEPTH,
+    LEADERBOARD_METRICS,
+    LEDGER_SOURCES,
+    LedgerFilter,
+    LedgerSync,
+    MultiLedgerSync,
+    NO_TIME,
+    ROLLUP_GRANULARITIES,
+    build_filter_index,
+    build_flow_graph,
+    build_views,
+    component_sizes,
+    counterparty_totals,
+    filtered_ledger,
+    format_number,
+    leaderboard_frame,
+    ledger_addresses,
+    ledger_position_at,
+    ledger_rows,
+    parse_ledger_sources,
+    rollup_by_type,
+    rollup_series,
+    rollup_totals,
+    search_addresses,
+    sort_positions,
+    top_flows,
+    truncate_addresses,
+    wallet_balance_at,
+    wallet_rollup,
+    wallet_rows,
+)
+from cryptocoin.exports import EXPORT_FORMATS, dataset_table, filter_query, iter_export
+from cryptocoin.metrics import Metrics
+from cryptocoin.server import serve_exports, serve_metrics
+
+logger = logging.getLogger(__name__)
 
 # === Configuration ===
-SHEET_CSV_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQ-7MdvgD9R5nXcW-MqHB3oQ_GYKG6I-a0IT9bjnJ-UGRGJF5VdfzsJOKmINEDk8s3xIbxuUphl9oXt/pub?output=csv"
+LEDGER_STORE_DIR = os.environ.get(
+    "LEDGER_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ledger_store"),
+)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))  # serve Prometheus text on this port when set
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.environ.get("METRICS_FILE")  # or write it here, e.g. for node_exporter's textfile collector
+METRICS_FILE_INTERVAL = 15  # seconds between writes of METRICS_FILE
+EXPORT_PORT = int(os.environ.get("EXPORT_PORT", 0))  # stream exports over HTTP on this port when set
+EXPORT_HOST = os.environ.get("EXPORT_HOST", "127.0.0.1")
+EXPORT_URL = os.environ.get("EXPORT_URL") or (f"http://{EXPORT_HOST}:{EXPORT_PORT}" if EXPORT_PORT else None)  # as seen by browsers
+EXPORT_DOWNLOAD_MAX_ROWS = int(os.environ.get("EXPORT_DOWNLOAD_MAX_ROWS", 500_000))  # larger exports only stream
+DEBUG_PANEL_TOKEN = os.environ.get("DEBUG_PANEL_TOKEN")  # ?debug=<token> shows the metrics panel
+
+# Sessions share one ledger snapshot; copy-on-write keeps any per-session
+# modification from touching it (always on from pandas 3).
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
-# === Page Config ===
 st.set_page_config(
     page_title="CryptoCoin",
     page_icon="◆",
@@ -270,85 +332,215 @@ st.markdown("""
         letter-spacing: 0.05em;
         margin-left: 10px;
     }
+
+    /* Integrity badge */
+    .integrity-badge {
+        display: inline-block;
+        padding: 4px 12px;
+        border-radius: 20px;
+        font-size: 0.75rem;
+        font-weight: 600;
+        letter-spacing: 0.05em;
+        margin-bottom: 1rem;
+    }
+
+    .integrity-verified {
+        background: rgba(34, 197, 94, 0.1);
+        border: 1px solid rgba(34, 197, 94, 0.3);
+        color: #86efac;
+    }
+
+    .integrity-unverified {
+        background: rgba(239, 68, 68, 0.1);
+        border: 1px solid rgba(239, 68, 68, 0.3);
+        color: #fca5a5;
+    }
 </style>
 """, unsafe_allow_html=True)
 
 
-@st.cache_data(ttl=60)
-def load_data():
+@st.cache_resource(max_entries=4)
+def ledger_views(version, _ledger):
+    """Derived views of ledger ``version``, computed once and shared by every tab and session."""
+    with get_metrics().timer('views') as sample:
+        sample['rows'] = len(_ledger.df)
+        return build_views(_ledger)
+
+
+@st.cache_resource(max_entries=2)
+def flow_graph(version, _ledger):
+    """The flow graph of ledger ``version``, built once and shared by every session."""
+    with get_metrics().timer('flow_graph') as sample:
+        sample['rows'] = len(_ledger.df)
+        return build_flow_graph(_ledger.df)
+
+
+def flow_figure(graph, addresses, top_n):
+    """Sankey of the ``top_n`` largest flows, senders on the left and recipients on the right."""
+    top = np.argsort(-graph.weights, kind='stable')[:top_n]
+    senders, source_nodes = np.unique(graph.sources[top], return_inverse=True)
+    recipients, target_nodes = np.unique(graph.targets[top], return_inverse=True)
+    labels = np.concatenate([truncate_addresses(addresses.take(senders)),
+                             truncate_addresses(addresses.take(recipients))])
+    fig = go.Figure(go.Sankey(
+        node=dict(label=labels, pad=12, thickness=14, color='#F59E0B', line=dict(width=0)),
+        link=dict(
+            source=source_nodes,
+            target=target_nodes + len(senders),
+            value=graph.weights[top],
+            color='rgba(245, 158, 11, 0.25)',
+        ),
+    ))
+    fig.update_layout(
+        title=f"Top {len(top)} Wallet Flows",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#94a3b8',
+        title_font_color='#f8fafc',
+        margin=dict(l=20, r=20, t=40, b=20),
+        height=max(280, 18 * max(len(senders), len(recipients))),
+    )
+    return fig
+
+
+@st.cache_resource(max_entries=16)
+def ledger_sort_order(version, column, ascending, _df):
+    """Row positions of ledger ``version`` sorted on ``column`` (nulls last).
+
+    Computed once per ledger version, column and direction, then shared by
+    every session so paging through a sorted table never re-sorts.
+    """
+    with get_metrics().timer('sort') as sample:
+        sample['rows'] = len(_df)
+        return sort_positions(_df[column], ascending)
+
+
+def ledger_page(ledger, views, page, page_size, sort_col=None, ascending=False, selection=None):
+    """Display frame for one page of the ledger; newest transactions first by default.
+
+    With a :class:`FilteredLedger` ``selection`` only its rows are paged.
+    Only the rows on the requested page are materialized and formatted.
+    """
+    df = ledger.df
+    rows = selection.rows if selection is not None else None
+    n = len(df) if rows is None else len(rows)
+    start = min(page * page_size, max(n - 1, 0))
+    stop = min(start + page_size, n)
+    if sort_col is None:
+        # The ledger is append-only, so the newest rows are at the end
+        positions = np.arange(n - 1 - start, n - 1 - stop, -1)
+        if rows is not None:
+            positions = rows[positions]
+    elif rows is None:
+        positions = ledger_sort_order(ledger.version, sort_col, ascending, df)[start:stop]
+    else:
+        positions = rows[filtered_sort_order(ledger.version, selection.filter, sort_col, ascending, df, rows)[start:stop]]
+
+    return ledger_rows(ledger, views, positions)
+
+
+@st.cache_resource(max_entries=2)
+def ledger_filter_index(version, _ledger):
+    """The filter index of ledger ``version``, built once and shared by every session."""
+    with get_metrics().timer('filter_index') as sample:
+        sample['rows'] = len(_ledger.df)
+        return build_filter_index(_ledger.df)
+
+
+@st.cache_resource(max_entries=16)
+def filter_ledger(version, flt, _ledger, _views):
+    """Resolve ``flt`` against ledger ``version``, shared by every session asking for it."""
+    index = ledger_filter_index(version, _ledger)
+    with get_metrics().timer('filter') as sample:
+        selection = filtered_ledger(_ledger, _views, index, flt)
+        sample['rows'] = selection.tx_count
+        return selection
+
+
+@st.cache_resource(max_entries=16)
+def filtered_sort_order(version, flt, column, ascending, _df, _rows):
+    """Positions into the filtered ``_rows`` sorted on ``column`` (nulls last)."""
+    return sort_positions(_df[column].iloc[_rows], ascending)
+
+
+def _write_metrics_file(metrics, path, interval):
+    while True:
+        try:
+            metrics.write(path)
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
+        time.sleep(interval)
+
+
+@st.cache_resource
+def get_metrics():
+    """Process-wide metrics registry, exported per ``METRICS_PORT`` / ``METRICS_FILE``."""
+    metrics = Metrics()
+    if METRICS_PORT:
+        try:
+            serve_metrics(metrics, METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            logger.warning("Could not serve metrics on %s:%d: %s", METRICS_HOST, METRICS_PORT, e)
+    if METRICS_FILE:
+        threading.Thread(
+            target=_write_metrics_file, args=(metrics, METRICS_FILE, METRICS_FILE_INTERVAL),
+            name='metrics-file', daemon=True,
+        ).start()
+    return metrics
+
+
+@st.cache_resource
+def get_ledger_sync():
+    """Process-wide ledger sync state, warm-started from the local store.
+
+    With ``LEDGER_SOURCES`` set, the configured ledgers are synced side by
+    side and merged; each keeps its store in a subdirectory.
+    """
+    if LEDGER_SOURCES:
+        return MultiLedgerSync(parse_ledger_sources(LEDGER_SOURCES), store_dir=LEDGER_STORE_DIR, metrics=get_metrics())
+    return LedgerSync(store_dir=LEDGER_STORE_DIR, metrics=get_metrics())
+
+
+@st.cache_resource
+def get_export_server():
+    """Process-wide export server for ``EXPORT_PORT``, or None when exports are only offered as downloads."""
+    if not EXPORT_PORT:
+        return None
     try:
-        response = requests.get(SHEET_CSV_URL, timeout=10)
-        response.raise_for_status()
-        df = pd.read_csv(StringIO(response.text))
-        return df, None
-    except Exception as e:
-        return None, str(e)
+        return serve_exports(get_ledger_sync(), EXPORT_HOST, EXPORT_PORT)
+    except OSError as e:
+        logger.warning("Could not serve exports on %s:%d: %s", EXPORT_HOST, EXPORT_PORT, e)
+        return None
 
 
-def format_number(num):
-    if pd.isna(num) or num == 0:
-        return "0"
-    
-    # Handle rounding edge case where ~999k rounds to 1000K instead of 1M
-    if abs(num) >= 999_995:
-        return f"{num/1_000_000:.2f}M"
-        
-    if abs(num) >= 1_000:
-        return f"{num/1_000:.2f}K"
-    return f"{num:,.2f}"
+@st.cache_resource
+def get_ledger_client():
+    """Process-wide HTTP client for the ledger sheet."""
+    return LedgerClient(metrics=get_metrics())
 
 
-def truncate_address(addr, front=6, back=4):
-    if pd.isna(addr) or not isinstance(addr, str) or len(addr) <= front + back:
-        return str(addr) if not pd.isna(addr) else "—"
-    return f"{addr[:front]}...{addr[-back:]}"
+def fetch_ledger_csv():
+    """Open the published ledger CSV; a context manager yielding its body stream (None if unchanged)."""
+    return get_ledger_client().fetch()
 
 
-def calculate_wallet_balances(df):
-    """Calculate balances for each unique wallet from transaction history."""
-    wallets = {}
-    
-    # Find relevant columns
-    from_col = next((c for c in df.columns if 'from' in c.lower()), None)
-    to_col = next((c for c in df.columns if 'to' in c.lower()), None)
-    amount_col = next((c for c in df.columns if 'amount' in c.lower() or 'value' in c.lower()), None)
-    
-    if not all([from_col, to_col, amount_col]):
-        return {}
-    
-    for _, row in df.iterrows():
-        sender = str(row[from_col]) if not pd.isna(row[from_col]) else None
-        recipient = str(row[to_col]) if not pd.isna(row[to_col]) else None
-        amount = pd.to_numeric(row[amount_col], errors='coerce')
-        
-        if pd.isna(amount):
-            amount = 0
-        
-        # Deduct from sender
-        if sender and sender != 'nan':
-            if sender not in wallets:
-                wallets[sender] = {'sent': 0, 'received': 0, 'role': 'Unknown'}
-            wallets[sender]['sent'] += amount
-        
-        # Add to recipient
-        if recipient and recipient != 'nan':
-            if recipient not in wallets:
-                wallets[recipient] = {'sent': 0, 'received': 0, 'role': 'Unknown'}
-            wallets[recipient]['received'] += amount
-    
-    # Calculate net balance
-    for addr in wallets:
-        wallets[addr]['balance'] = wallets[addr]['received'] - wallets[addr]['sent']
-        
-        # Assign roles based on activity
-        if wallets[addr]['sent'] == 0 and wallets[addr]['received'] > 0:
-            wallets[addr]['role'] = 'Treasury / Mint'
-        elif wallets[addr]['received'] > wallets[addr]['sent']:
-            wallets[addr]['role'] = 'Net Recipient'
-        else:
-            wallets[addr]['role'] = 'Net Sender'
-    
-    return wallets
+def load_data():
+    """Latest ledger snapshot; returns (snapshot, error, checked_at).
+
+    Never waits on the network once any snapshot exists: the background
+    refresher keeps it current, and ``error`` reports its last failure.
+    Only a cold start with no local store waits for the first fetch.
+    ``checked_at`` is the wall-clock time the snapshot was last confirmed
+    current. The snapshot is the same read-only object for every session.
+    """
+    sync = get_ledger_sync()
+    sync.start(fetch_ledger_csv)
+    if sync.snapshot is None:
+        sync.metrics.inc('ledger_cache', result='miss')
+        sync.wait_ready(timeout=FETCH_TIMEOUT * (FETCH_RETRIES + 1) + 5)
+    else:
+        sync.metrics.inc('ledger_cache', result='hit')
+    return sync.snapshot, sync.last_error, sync.checked_at
 
 
 def render_wallet_card(address, balance, role, label="Wallet"):
@@ -362,6 +554,180 @@ def render_wallet_card(address, balance, role, label="Wallet"):
     """, unsafe_allow_html=True)
 
 
+def render_balance_as_of(ledger, address, code):
+    """A wallet's balance as of a chosen date (or transaction), answered from the balance history."""
+    history = ledger.history
+    dated = history.row_times[history.row_times != NO_TIME] if history.row_times is not None else []
+    if len(dated):
+        first, last = pd.Timestamp(dated[0]).date(), pd.Timestamp(dated[-1]).date()
+        day = st.date_input("Balance as of", value=last, min_value=first, max_value=last, key="as_of_date")
+        position = ledger_position_at(history, pd.Timestamp(day) + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns'))
+        label = f"Balance at end of {day:%b %d, %Y}"
+    else:
+        number = st.number_input("Balance after transaction", min_value=1, max_value=len(ledger.df),
+                                 value=len(ledger.df), step=1, key="as_of_tx")
+        position = number - 1
+        label = f"Balance after transaction {number:,}"
+    balance, count = wallet_balance_at(history, code, position)
+    render_wallet_card(address=address, balance=balance, role=f"{count:,} transactions by then", label=label)
+
+
+def render_wallet_activity(ledger, code):
+    """A wallet's transactions, volume and fees over a chosen date range, answered from the rollups."""
+    days = ledger.rollups.wallet_days
+    codes = days.index.get_level_values('code').to_numpy()
+    own = days.index.get_level_values('day').to_numpy()[np.searchsorted(codes, code):np.searchsorted(codes, code, side='right')]
+    dated = own[own != NO_TIME]
+    if not len(dated):
+        return
+    first, last = pd.Timestamp(dated[0]).date(), pd.Timestamp(dated[-1]).date()
+    picked = st.date_input("Activity between", value=(first, last), min_value=first, max_value=last,
+                           key="wallet_activity_range")
+    # The picker returns a single date while a range is being chosen
+    day_from, day_to = (picked[0], picked[-1]) if len(picked) else (first, last)
+    totals = wallet_rollup(ledger.rollups, code, pd.Timestamp(day_from), pd.Timestamp(day_to) + pd.Timedelta(days=1))
+    st.caption(f"{int(totals['count']):,} transactions · sent ◆ {format_number(totals['sent'])} · "
+               f"received ◆ {format_number(totals['received'])} · fees paid ◆ {format_number(totals['fees'])}")
+
+
+@st.cache_resource(max_entries=32)
+def wallet_counterparties(version, code, _ledger, limit=20):
+    """Top counterparties of address ``code`` in ledger ``version`` by total amount exchanged."""
+    return counterparty_totals(_ledger, code, limit)
+
+
+def render_leaderboard(ledger):
+    """Top-K wallets by a chosen metric, read straight from the maintained rankings."""
+    addresses = ledger_addresses(ledger.df)
+    if addresses is None:
+        return
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        metric = st.selectbox("Rank wallets by", list(LEADERBOARD_METRICS), format_func=LEADERBOARD_METRICS.get,
+                              key="leaderboard_metric")
+    with c2:
+        k = st.selectbox("Top", [5, 10, 25, 50, LEADERBOARD_DEPTH], index=1, key="leaderboard_k")
+    board = leaderboard_frame(ledger.leaders, addresses, metric, k)
+    board.insert(0, 'rank', np.arange(1, len(board) + 1))
+    st.dataframe(board, width="stretch", height=min(35 * (len(board) + 1) + 3, 400))
+
+
+def render_wallet_explorer(ledger, views):
+    """Address search plus a drill-down into one wallet's totals, counterparties and transactions."""
+    addresses = ledger_addresses(ledger.df)
+    if addresses is None or not len(addresses):
+        return
+
+    query = st.text_input("Search wallets", placeholder="Type the start of an address, e.g. 0x3f", key="wallet_search")
+    if query.strip():
+        matches, total = search_addresses(ledger.index, addresses, query, limit=50)
+        label = f"{total:,} matching wallets" + (" (first 50 shown)" if total > 50 else "")
+    else:
+        matches, label = [str(a) for a in views.top_wallets.index], "Top wallets"
+    if not matches:
+        st.caption(f"No wallet address starts with “{query.strip()}”.")
+        return
+    address = st.selectbox(label, matches, key="wallet_pick")
+    code = addresses.get_loc(address)
+    wallet = ledger.wallets.loc[address]
+    sent, received = wallet_rows(ledger.index, code)
+    rows = np.union1d(sent, received)
+
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        render_metric_card("Balance", format_number(wallet['balance']), "◆ ")
+    with c2:
+        render_metric_card("Received", format_number(wallet['received']), "◆ ")
+    with c3:
+        render_metric_card("Sent", format_number(wallet['sent']), "◆ ")
+    with c4:
+        render_metric_card("Transactions", f"{len(rows):,}")
+    sync = get_ledger_sync()
+    if isinstance(sync, MultiLedgerSync):
+        st.dataframe(source_balances(sync, address), width="stretch")
+    rollups = ledger.rollups
+    st.caption(f"Fees paid ◆ {format_number(rollups.wallet_fees[code])} · smallest transaction "
+               f"◆ {format_number(rollups.wallet_min[code])} · largest ◆ {format_number(rollups.wallet_max[code])}")
+
+    left, right = st.columns([2, 1])
+    with left:
+        st.dataframe(wallet_counterparties(ledger.version, code, ledger), width="stretch", height=250)
+    with right:
+        render_balance_as_of(ledger, address, code)
+        render_wallet_activity(ledger, code)
+
+    page_size = 10
+    num_pages = max(1, -(-len(rows) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, step=1, key="wallet_tx_page") - 1
+    newest_first = rows[::-1][page * page_size:(page + 1) * page_size]
+    st.dataframe(ledger_rows(ledger, views, newest_first), width="stretch")
+    st.caption(f"{len(sent):,} sent · {len(received):,} received · page {page + 1} of {num_pages:,}")
+
+
+def source_balances(sync, address):
+    """``address``'s sent, received and balance in each source ledger it appears in."""
+    rows = {
+        name: snapshot.wallets.loc[address, ['sent', 'received', 'balance']]
+        for name, snapshot in sync.source_snapshots().items()
+        if snapshot is not None and address in snapshot.wallets.index
+    }
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('source')
+
+
+def _transaction_number(row):
+    return f"#{row + 1:,}" if row is not None else "—"
+
+
+def integrity_problems(integrity):
+    """Human-readable reasons an integrity report failed verification."""
+    problems = []
+    if integrity.first_mismatch is not None:
+        problems.append(f"History changed from transaction {_transaction_number(integrity.first_mismatch)}")
+    if integrity.duplicates:
+        problems.append(f"{integrity.duplicates:,} repeated transaction hashes, "
+                        f"first at {_transaction_number(integrity.first_duplicate)}")
+    return problems
+
+
+def render_integrity(ledger):
+    """Verified/unverified badge for the ledger, with the digest root and any findings."""
+    integrity = ledger.integrity
+    if integrity.verified:
+        badge = '<span class="integrity-badge integrity-verified">✓ VERIFIED</span>'
+    else:
+        badge = '<span class="integrity-badge integrity-unverified">✗ UNVERIFIED</span>'
+    st.markdown(badge, unsafe_allow_html=True)
+    with st.expander("Integrity details"):
+        st.caption(f"{len(integrity.digests):,} transactions digested · root `{integrity.root.hex()}`")
+        for problem in integrity_problems(integrity):
+            st.warning(problem)
+        if integrity.out_of_order:
+            st.info(f"{integrity.out_of_order:,} transactions are dated earlier than the one before them, "
+                    f"first at {_transaction_number(integrity.first_out_of_order)}")
+
+
+def render_sources(sync):
+    """Per-source totals and sync status of a merged ledger."""
+    rows = []
+    for source in sync.sources:
+        snapshot = sync.source_snapshots()[source.name]
+        error = sync.source_errors.get(source.name)
+        rows.append({
+            'source': source.name,
+            'transactions': snapshot.tx_count if snapshot else 0,
+            'volume': snapshot.total_volume if snapshot else 0.0,
+            'wallets': len(snapshot.wallets) if snapshot else 0,
+            'status': f"Failed: {error}" if error else ("Synced" if snapshot else "Waiting"),
+            'integrity': ("; ".join(integrity_problems(snapshot.integrity)) or "Verified") if snapshot else "",
+        })
+    st.dataframe(
+        pd.DataFrame(rows),
+        width="stretch",
+        hide_index=True,
+        column_config={'volume': st.column_config.NumberColumn(format="%.2f")},
+    )
+
+
 def render_metric_card(label, value, prefix=""):
     st.markdown(f"""
     <div class="glass-card">
@@ -371,6 +737,386 @@ def render_metric_card(label, value, prefix=""):
     """, unsafe_allow_html=True)
 
 
+def volume_figure(views):
+    """Transaction volume over ledger position (proxy for time), from the downsampled series."""
+    fig = px.area(
+        views.volume,
+        x='index',
+        y=views.columns.amount_col,
+        title="Transaction Volume",
+        color_discrete_sequence=['#F59E0B'] # Gold color
+    )
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#94a3b8',
+        title_font_color='#f8fafc',
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(showgrid=False, title=None),
+        yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.05)', title=None),
+        height=280,
+        showlegend=False
+    )
+    fig.update_traces(fillcolor='rgba(245, 158, 11, 0.2)', line=dict(width=2))
+    return fig
+
+
+def distribution_figure(views, scheme='fixed'):
+    """Histogram of transaction amounts, drawn from the pre-binned counts.
+
+    Quantile bins have unequal widths, so they are drawn as density
+    (count per unit amount) to keep the areas comparable.
+    """
+    bins = views.histograms[scheme]
+    widths = (bins['right'] - bins['left']).to_numpy()
+    heights = bins['count'] / np.where(widths > 0, widths, 1) if scheme == 'quantile' else bins['count']
+    fig = go.Figure(go.Bar(
+        x=(bins['left'] + bins['right']) / 2,
+        y=heights,
+        width=widths * 0.9,
+        customdata=bins[['left', 'right', 'count']],
+        hovertemplate='%{customdata[0]:,.2f} – %{customdata[1]:,.2f}<br>%{customdata[2]:,} transactions<extra></extra>',
+        marker_color='#D97706', # Darker gold
+    ))
+    fig.update_layout(
+        title="Value Distribution",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#94a3b8',
+        title_font_color='#f8fafc',
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(showgrid=False, title=None),
+        yaxis=dict(showgrid=False, title=None),
+        height=280,
+        showlegend=False,
+    )
+    return fig
+
+
+def render_chart(build, *args, rows=0):
+    """Build a figure with ``build(*args)`` and draw it, timing both steps; ``rows`` is the data size plotted."""
+    metrics = get_metrics()
+    with metrics.timer('figure') as sample:
+        fig = build(*args)
+        sample['rows'] = rows
+    with metrics.timer('chart_render') as sample:
+        st.plotly_chart(fig, width="stretch", config={'displayModeBar': False})
+        sample['rows'] = rows
+
+
+def activity_figure(series, granularity):
+    """Stacked volume per period and transaction type from a rollup series."""
+    fig = px.bar(
+        series.reset_index(),
+        x='period',
+        y='amount',
+        color='type',
+        title=f"{ROLLUP_GRANULARITIES[granularity]} Volume by Type",
+        color_discrete_sequence=['#F59E0B', '#D97706', '#FCD34D', '#B45309', '#FDE68A', '#92400E'],
+    )
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='#94a3b8',
+        title_font_color='#f8fafc',
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(showgrid=False, title=None),
+        yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.05)', title=None),
+        legend=dict(title=None, orientation='h', y=-0.2),
+        height=320,
+        bargap=0.1,
+    )
+    return fig
+
+
+def render_activity(ledger):
+    """Time-filtered volume, fees and per-type totals, answered from the rollups."""
+    cube = ledger.rollups.cube
+    hours = cube.index.get_level_values('hour')
+    dated = hours[hours != NO_TIME]
+    if not len(dated):
+        st.info("The ledger has no timestamps to chart activity over time.")
+        return
+    first, last = pd.Timestamp(dated.min()).date(), pd.Timestamp(dated.max()).date()
+
+    c1, c2 = st.columns([1, 2])
+    with c1:
+        granularity = st.selectbox("Period", list(ROLLUP_GRANULARITIES), index=1, format_func=ROLLUP_GRANULARITIES.get,
+                                   key="activity_granularity")
+    with c2:
+        picked = st.date_input("Date range", value=(first, last), min_value=first, max_value=last, key="activity_range")
+    # The picker returns a single date while a range is being chosen
+    day_from, day_to = (picked[0], picked[-1]) if len(picked) else (first, last)
+    start, end = pd.Timestamp(day_from), pd.Timestamp(day_to) + pd.Timedelta(days=1)
+
+    totals = rollup_totals(ledger.rollups, start, end)
+    m1, m2, m3, m4 = st.columns(4)
+    with m1:
+        render_metric_card("Transactions", f"{int(totals['count']):,}")
+    with m2:
+        render_metric_card("Volume", format_number(totals['amount']), "◆ ")
+    with m3:
+        render_metric_card("Fees", format_number(totals['fees']), "◆ ")
+    with m4:
+        render_metric_card("Largest", format_number(totals['max'] if totals['count'] else 0), "◆ ")
+
+    series = rollup_series(ledger.rollups, granularity, start, end)
+    periods = series.index.get_level_values('period').unique()
+    if len(periods) > CHART_POINT_BUDGET // 4:
+        series = series.loc[series.index.get_level_values('period') >= periods[-(CHART_POINT_BUDGET // 4)]]
+        st.caption(f"Showing the last {CHART_POINT_BUDGET // 4:,} periods; pick a shorter range or a coarser period for the rest.")
+    render_chart(activity_figure, series, granularity, rows=len(series))
+
+    by_type = rollup_by_type(ledger.rollups, start, end)
+    by_type['average'] = by_type['amount'] / by_type['count'].where(by_type['count'] > 0)
+    st.dataframe(
+        by_type.rename(index={'': '—'}),
+        width="stretch",
+        column_config={col: st.column_config.NumberColumn(format="%.2f") for col in ('amount', 'fees', 'min', 'max', 'average')},
+    )
+
+
+def render_flows(ledger):
+    """Flow graph summary, a Sankey of the largest flows and the most central wallets."""
+    addresses = ledger_addresses(ledger.df)
+    graph = flow_graph(ledger.version, ledger)
+    if addresses is None or not len(graph.weights):
+        st.info("No wallet-to-wallet transfers yet.")
+        return
+    sizes = component_sizes(graph, np.flatnonzero(ledger.leaders.transactions))
+
+    m1, m2, m3 = st.columns(3)
+    with m1:
+        render_metric_card("Wallet Pairs", f"{len(graph.weights):,}")
+    with m2:
+        render_metric_card("Connected Groups", f"{len(sizes):,}")
+    with m3:
+        render_metric_card("Largest Group", f"{sizes[0]:,} wallets")
+
+    top_n = st.slider("Flows shown", min_value=5, max_value=100, value=25, step=5, key="flow_top_n")
+    render_chart(flow_figure, graph, addresses, top_n, rows=top_n)
+
+    left, right = st.columns(2)
+    with left:
+        st.markdown("**Largest flows**")
+        flows = top_flows(graph, addresses, limit=10)
+        flows['from'], flows['to'] = truncate_addresses(flows['from']), truncate_addresses(flows['to'])
+        st.dataframe(flows, width="stretch", hide_index=True)
+    with right:
+        st.markdown("**Most central wallets** (PageRank by amount)")
+        k = min(10, len(graph.rank))
+        central = np.argpartition(-graph.rank, k - 1)[:k]
+        central = central[np.argsort(-graph.rank[central])]
+        st.dataframe(pd.DataFrame({
+            'wallet': truncate_addresses(addresses.take(central)),
+            'pagerank': graph.rank[central],
+            'group size': np.bincount(graph.component)[graph.component[central]],
+        }), width="stretch", hide_index=True)
+
+
+def render_alerts(ledger, views, selection=None, limit=100):
+    """Counts per anomaly kind and the most recent flagged transactions (within ``selection`` if given)."""
+    alerts = ledger.anomalies.alerts
+    if selection is not None:
+        alerts = alerts[np.isin(alerts['row'].to_numpy(), selection.rows, assume_unique=True)]
+    if alerts.empty:
+        st.info("No unusual activity flagged.")
+        return
+
+    for col, (kind, label) in zip(st.columns(len(ANOMALY_KINDS)), ANOMALY_KINDS.items()):
+        with col:
+            render_metric_card(label, f"{int(alerts[kind].sum()):,}")
+
+    recent = alerts.iloc[::-1][:limit]
+    kinds = recent[list(ANOMALY_KINDS)].to_numpy()
+    table = ledger_rows(ledger, views, recent['row'].to_numpy())
+    table.insert(0, 'Flags', [", ".join(label for label, hit in zip(ANOMALY_KINDS.values(), flags) if hit) for flags in kinds])
+    table['Score'] = np.fmax(recent['score'].to_numpy(), recent['sender_score'].to_numpy())
+    st.dataframe(
+        table,
+        width="stretch",
+        hide_index=True,
+        column_config={'Score': st.column_config.NumberColumn(format="%.1f σ", help="Standard deviations above the usual amount")},
+    )
+    st.caption(f"{len(alerts):,} flagged transactions · showing the latest {len(recent):,}")
+
+
+def export_bytes(metrics, ledger, dataset, fmt, rows=None, granularity='day'):
+    """One export as bytes; download buttons call this on their own thread when clicked."""
+    with metrics.timer('export') as sample:
+        table = dataset_table(ledger, dataset, granularity)
+        sample['rows'] = len(rows) if rows is not None else table.num_rows
+        data = b''.join(iter_export(table, fmt, rows))
+        sample['bytes'] = len(data)
+    metrics.inc('ledger_export', dataset=dataset, format=fmt)
+    return data
+
+
+def render_exports(ledger, selection=None):
+    """Download buttons for the ledger (the filtered rows when a filter is active), wallet balances and aggregates."""
+    left, right = st.columns(2)
+    with left:
+        fmt = st.radio("Format", list(EXPORT_FORMATS), format_func=str.upper, horizontal=True, key="export_format")
+    with right:
+        granularity = st.selectbox("Aggregates per", list(ROLLUP_GRANULARITIES),
+                                   format_func=ROLLUP_GRANULARITIES.get, index=1, key="export_granularity")
+    rows = selection.rows if selection is not None else None
+    exports = {
+        'ledger': (f"Filtered ledger ({len(rows):,} rows)" if rows is not None else f"Ledger ({ledger.tx_count:,} rows)", {}),
+        'wallets': (f"Wallet balances ({len(ledger.wallets):,})", {}),
+        'aggregates': (f"{ROLLUP_GRANULARITIES[granularity]} aggregates", {'granularity': granularity}),
+    }
+    sizes = {'ledger': len(rows) if rows is not None else ledger.tx_count, 'wallets': len(ledger.wallets)}
+    streamed = get_export_server() is not None
+    metrics = get_metrics()
+    for col, (dataset, (label, params)) in zip(st.columns(len(exports)), exports.items()):
+        with col:
+            # A download button holds the whole file in memory (twice, with Streamlit's copy)
+            if sizes.get(dataset, 0) > EXPORT_DOWNLOAD_MAX_ROWS:
+                st.button(label, disabled=True, key=f"export_{dataset}", width="stretch")
+                st.caption("Too large to download here; use the streamed link below." if streamed
+                           else "Too large to download here; set EXPORT_PORT to stream it.")
+                continue
+            st.download_button(
+                label,
+                data=partial(export_bytes, metrics, ledger, dataset, fmt, rows if dataset == 'ledger' else None, **params),
+                file_name=f"{dataset}.{fmt}",
+                mime=EXPORT_FORMATS[fmt],
+                key=f"export_{dataset}",
+                width="stretch",
+            )
+
+    if streamed:
+        links = []
+        for dataset, (label, params) in exports.items():
+            query = list(params.items())
+            if dataset == 'ledger' and selection is not None:
+                query += filter_query(selection.filter, ledger_addresses(ledger.df))
+            links.append(f"[{label}]({EXPORT_URL}/{dataset}.{fmt}{'?' + urlencode(query) if query else ''})")
+        st.caption("Streamed straight from the server, for large ledgers: " + " · ".join(links))
+
+
+def render_debug_panel(metrics):
+    """Admin-only stage timings and counters, shown for ``?debug=<DEBUG_PANEL_TOKEN>``."""
+    token = st.query_params.get("debug")
+    if not DEBUG_PANEL_TOKEN or not token or not hmac.compare_digest(token, DEBUG_PANEL_TOKEN):
+        return
+    with st.expander("Performance metrics", expanded=True):
+        st.dataframe(
+            metrics.summary(),
+            width="stretch",
+            hide_index=True,
+            column_config={
+                col: st.column_config.NumberColumn(format="%.1f")
+                for col in ('mean_ms', 'p50_ms', 'p95_ms', 'max_ms')
+            },
+        )
+        st.dataframe(metrics.counters(), width="stretch", hide_index=True)
+        st.download_button("Download Prometheus metrics", metrics.render(), file_name="metrics.prom",
+                           mime="text/plain")
+
+
+def _parse_amount(text, label):
+    """``text`` as a float, or None when blank or not a number (with a warning)."""
+    if not text.strip():
+        return None
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        st.caption(f"{label} “{text.strip()}” is not a number and is ignored.")
+        return None
+
+
+def render_filter_bar(ledger):
+    """Date range, wallet, amount and type filters shared by the tables, cards and charts.
+
+    Returns the :class:`LedgerFilter` picked (falsy when nothing is filtered).
+    """
+    with st.expander("Filter transactions"):
+        cube = ledger.rollups.cube
+        hours = cube.index.get_level_values('hour')
+        dated = hours[hours != NO_TIME]
+        types = sorted(t for t in cube.index.get_level_values('type').unique() if t)
+
+        c1, c2, c3 = st.columns([2, 2, 2])
+        start = end = None
+        with c1:
+            if len(dated):
+                first, last = pd.Timestamp(dated.min()).date(), pd.Timestamp(dated.max()).date()
+                picked = st.date_input("Date range", value=(first, last), min_value=first, max_value=last,
+                                       key="filter_range")
+                # The full range keeps undated rows too, so it filters nothing
+                if len(picked) and (picked[0], picked[-1]) != (first, last):
+                    start, end = pd.Timestamp(picked[0]), pd.Timestamp(picked[-1]) + pd.Timedelta(days=1)
+        with c2:
+            query = st.text_input("Wallet", placeholder="Address or its start, e.g. 0x3f", key="filter_wallet")
+        with c3:
+            picked_types = st.multiselect("Type", types, key="filter_types")
+
+        c4, c5, _ = st.columns([1, 1, 4])
+        with c4:
+            min_amount = _parse_amount(st.text_input("Min amount", key="filter_min"), "Min amount")
+        with c5:
+            max_amount = _parse_amount(st.text_input("Max amount", key="filter_max"), "Max amount")
+
+        wallet = None
+        addresses = ledger_addresses(ledger.df)
+        if query.strip() and addresses is not None:
+            matches, total = search_addresses(ledger.index, addresses, query, limit=2)
+            # An exact address sorts before the longer ones it prefixes
+            if total == 1 or (matches and matches[0].lower() == query.strip().lower()):
+                wallet = int(addresses.get_loc(matches[0]))
+                st.caption(f"Wallet {matches[0]}")
+            elif total:
+                st.caption(f"“{query.strip()}” matches {total:,} wallets; type more of the address.")
+            else:
+                st.caption(f"No wallet address starts with “{query.strip()}”.")
+
+    return LedgerFilter(start, end, wallet, min_amount, max_amount, tuple(picked_types))
+
+
+def render_transaction_table(ledger, views, key, page_size=10, height=None, column_config=None, selection=None):
+    """Paginated transaction table; only the visible page is sent to the browser.
+
+    With a :class:`FilteredLedger` ``selection`` only its rows are listed.
+    """
+    df = ledger.df
+    total = len(df) if selection is None else selection.tx_count
+    sort_options = ["Newest first"] + list(df.columns)
+
+    c1, c2, c3, c4 = st.columns([2, 1, 1, 1])
+    with c1:
+        sort_by = st.selectbox("Sort by", sort_options, key=f"{key}_sort")
+    with c2:
+        ascending = st.selectbox("Order", ["Descending", "Ascending"], key=f"{key}_order",
+                                 disabled=sort_by == "Newest first") == "Ascending"
+    with c3:
+        page_size = st.selectbox("Rows", [10, 25, 50, 100], index=[10, 25, 50, 100].index(page_size),
+                                 key=f"{key}_rows")
+    num_pages = max(1, -(-total // page_size))
+    with c4:
+        page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, step=1,
+                               key=f"{key}_page") - 1
+
+    sort_col = None if sort_by == "Newest first" else sort_by
+    metrics = get_metrics()
+    with metrics.timer('table_page') as sample:
+        page_df = ledger_page(ledger, views, page, page_size, sort_col, ascending, selection)
+        sample['rows'] = len(page_df)
+
+    with metrics.timer('table_render') as sample:
+        st.dataframe(
+            page_df,
+            width="stretch",
+            height=height,
+            column_config=column_config,
+        )
+        sample['rows'] = len(page_df)
+        sample['bytes'] = int(page_df.memory_usage(index=False, deep=True).sum())
+    first = page * page_size + 1 if len(page_df) else 0
+    st.caption(f"Showing {first:,}–{page * page_size + len(page_df):,} of {total:,} transactions · page {page + 1} of {num_pages:,}")
+
+
 def main():
     # === Top Bar ===
     st.markdown("""
@@ -391,23 +1137,31 @@ def main():
     st.markdown('<div class="hero-subtitle">Real-time transparency. Secure transactions. Student-first economy.</div>', unsafe_allow_html=True)
 
     # === Load Data ===
-    df, error = load_data()
+    ledger, error, checked_at = load_data()
 
-    if error:
-        st.error(f"Unable to connect to ledger: {error}")
+    if ledger is None:
+        if error:
+            st.error(f"Unable to connect to ledger: {error}")
+        else:
+            st.info("Loading the ledger… refresh the page in a moment.")
         return
 
-    if df is None or df.empty:
+    synced = datetime.fromtimestamp(checked_at).strftime('%b %d, %H:%M:%S') if checked_at else "unknown"
+
+    if error:
+        st.warning(f"Unable to reach the ledger; showing the copy last synced {synced}. ({error})")
+
+    if ledger.df.empty:
         st.warning("Ledger is currently empty.")
         return
 
-    df.columns = df.columns.str.strip()
-    
-    # Calculate wallet balances
-    wallets = calculate_wallet_balances(df)
-    
-    # Find amount column
-    amount_col = next((c for c in df.columns if 'amount' in c.lower() or 'value' in c.lower()), None)
+    wallets = ledger.wallets
+    views = ledger_views(ledger.version, ledger)
+    amount_col = views.columns.amount_col
+
+    flt = render_filter_bar(ledger)
+    selection = filter_ledger(ledger.version, flt, ledger, views) if flt else None
+    chart_views = selection.views if selection is not None else views
 
     # === TWO PAGES AS TABS ===
     # Centered Tabs
@@ -514,7 +1268,7 @@ def main():
             Beneficiaries -> Outcome;
         }
         """
-        st.graphviz_chart(flow_chart, use_container_width=True)
+        st.graphviz_chart(flow_chart, width="stretch")
         
         st.markdown("---")
         
@@ -522,15 +1276,11 @@ def main():
         st.markdown('<div class="section-header">Wallet Addresses</div>', unsafe_allow_html=True)
         st.markdown('<div class="section-subheader">Active addresses and their current CryptoCoin balances</div>', unsafe_allow_html=True)
         
-        if wallets:
-            # Get top wallets by absolute balance
-            sorted_wallets = sorted(wallets.items(), key=lambda x: abs(x[1]['balance']), reverse=True)
-            
-            # Display at least 2 wallets (requirement)
-            num_wallets = min(4, len(sorted_wallets))  # Show up to 4
+        if not wallets.empty:
+            # Top wallets by absolute balance (display up to 4, at least 2 required)
             cols = st.columns(2)
             
-            for i, (addr, data) in enumerate(sorted_wallets[:num_wallets]):
+            for i, (addr, data) in enumerate(views.top_wallets.iterrows()):
                 with cols[i % 2]:
                     # Just use "Active Wallet" as generic label since we don't have names
                     render_wallet_card(
@@ -539,33 +1289,37 @@ def main():
                         role=data['role'],
                         label="Active Wallet"
                     )
+            with st.expander("Wallet leaderboard"):
+                render_leaderboard(ledger)
         else:
             st.warning("Unable to calculate wallet balances from transaction data.")
         
         st.markdown("---")
         
+        # --- Wallet Explorer Section ---
+        st.markdown('<div class="section-header">Wallet Explorer</div>', unsafe_allow_html=True)
+        st.markdown('<div class="section-subheader">Search any address for its balance history, counterparties and transactions</div>', unsafe_allow_html=True)
+        render_wallet_explorer(ledger, views)
+        
+        st.markdown("---")
+        
         # --- Recent Transactions Section ---
         st.markdown('<div class="section-header">Recent Transactions</div>', unsafe_allow_html=True)
         st.markdown('<div class="section-subheader">Latest confirmed transactions on the network</div>', unsafe_allow_html=True)
         
-        # Format for display
-        display_df = df.copy()
-        
-        # Truncate addresses for cleaner display
-        for col in display_df.columns:
-            if any(x in col.lower() for x in ['hash', 'from', 'to', 'addr']):
-                display_df[col] = display_df[col].astype(str).apply(lambda x: truncate_address(x))
-        
-        st.dataframe(
-            display_df,
-            use_container_width=True,
+        render_transaction_table(
+            ledger,
+            views,
+            key="recent_tx",
+            page_size=10,
             height=300,
             column_config={
                 amount_col: st.column_config.NumberColumn(
                     "Amount",
                     format="◆ %.2f"
                 )
-            } if amount_col else None
+            } if amount_col else None,
+            selection=selection,
         )
         
         # Link to view full data
@@ -579,11 +1333,12 @@ def main():
         
         # --- Metrics Overview ---
         if amount_col:
-            amounts = pd.to_numeric(df[amount_col], errors='coerce').fillna(0)
-            total_vol = amounts.sum()
-            avg_tx = amounts.mean()
-            tx_count = len(df)
-            unique_wallets = len(wallets)
+            if selection is not None:
+                tx_count, total_vol, unique_wallets = selection.tx_count, selection.total_volume, selection.wallet_count
+            else:
+                totals = rollup_totals(ledger.rollups)
+                tx_count, total_vol, unique_wallets = int(totals['count']), totals['amount'], len(wallets)
+            avg_tx = total_vol / tx_count if tx_count else 0.0
             
             m1, m2, m3, m4 = st.columns(4)
             with m1:
@@ -594,6 +1349,11 @@ def main():
                 render_metric_card("Avg Transaction", format_number(avg_tx), "◆ ")
             with m4:
                 render_metric_card("Unique Wallets", f"{unique_wallets}")
+
+        sync = get_ledger_sync()
+        if isinstance(sync, MultiLedgerSync):
+            with st.expander(f"{len(sync.sources)} ledger sources"):
+                render_sources(sync)
         
         st.markdown("<br>", unsafe_allow_html=True)
         
@@ -605,66 +1365,58 @@ def main():
         
         with chart_col1:
             if amount_col:
-                # Transaction volume over index (proxy for time)
-                fig = px.area(
-                    df.reset_index(), 
-                    y=amount_col,
-                    title="Transaction Volume",
-                    color_discrete_sequence=['#F59E0B'] # Gold color
-                )
-                fig.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#94a3b8',
-                    title_font_color='#f8fafc',
-                    margin=dict(l=20, r=20, t=40, b=20),
-                    xaxis=dict(showgrid=False, title=None),
-                    yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.05)', title=None),
-                    height=280,
-                    showlegend=False
-                )
-                fig.update_traces(fillcolor='rgba(245, 158, 11, 0.2)', line=dict(width=2))
-                st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+                render_chart(volume_figure, chart_views, rows=len(chart_views.volume))
         
         with chart_col2:
             if amount_col:
-                # Distribution histogram
-                fig2 = px.histogram(
-                    df, 
-                    x=amount_col, 
-                    nbins=10,
-                    title="Value Distribution",
-                    color_discrete_sequence=['#D97706'] # Darker gold
-                )
-                fig2.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#94a3b8',
-                    title_font_color='#f8fafc',
-                    margin=dict(l=20, r=20, t=40, b=20),
-                    xaxis=dict(showgrid=False, title=None),
-                    yaxis=dict(showgrid=False, title=None),
-                    height=280,
-                    showlegend=False,
-                    bargap=0.1
-                )
-                st.plotly_chart(fig2, use_container_width=True, config={'displayModeBar': False})
+                scheme = st.selectbox("Bins", ['fixed', 'quantile'], key="hist_scheme",
+                                      format_func={'fixed': "Equal width", 'quantile': "Equal count (quantiles)"}.get)
+                render_chart(distribution_figure, chart_views, scheme, rows=len(chart_views.histograms[scheme]))
+        
+        st.markdown("---")
+        
+        # --- Activity Section ---
+        st.markdown('<div class="section-header">Activity Over Time</div>', unsafe_allow_html=True)
+        st.markdown('<div class="section-subheader">Volume, fees and transaction types per period</div>', unsafe_allow_html=True)
+        
+        if amount_col:
+            render_activity(ledger)
+        
+        st.markdown("---")
+        
+        # --- Flow Section ---
+        st.markdown('<div class="section-header">Token Flows</div>', unsafe_allow_html=True)
+        st.markdown('<div class="section-subheader">Who pays whom: transfers aggregated per sender and recipient</div>', unsafe_allow_html=True)
+        
+        if amount_col:
+            render_flows(ledger)
         
         st.markdown("---")
         
         # --- Transaction Table ---
         st.markdown('<div class="section-header">Transaction Details</div>', unsafe_allow_html=True)
         st.markdown('<div class="section-subheader">Complete record with sender/recipient roles, amounts, fees, and types</div>', unsafe_allow_html=True)
+        render_integrity(ledger)
         
-        # Show full transaction table with more detail
-        st.dataframe(
-            display_df,
-            use_container_width=True,
-            height=350
-        )
+        if not ledger.rejects.empty:
+            with st.expander(f"{len(ledger.rejects):,} malformed ledger rows were skipped"):
+                st.dataframe(ledger.rejects.tail(500), width="stretch", hide_index=True)
+
+        # Paginated transaction table with more detail
+        render_transaction_table(ledger, views, key="tx_details", page_size=25, height=350, selection=selection)
+
+        with st.expander("Export data"):
+            render_exports(ledger, selection)
         
         st.markdown("---")
         
+        # --- Alerts ---
+        st.markdown('<div class="section-header">Unusual Activity</div>', unsafe_allow_html=True)
+        st.markdown('<div class="section-subheader">Outsized transfers, bursts from one wallet and large amounts to new wallets</div>', unsafe_allow_html=True)
+        render_alerts(ledger, views, selection)
+
+        st.markdown("---")
+
         # --- Interpretation Section (placeholder for user content) ---
         st.markdown('<div class="section-header">Interpretation</div>', unsafe_allow_html=True)
         
@@ -694,11 +1446,13 @@ def main():
     st.markdown("---")
     f1, f2, f3 = st.columns([1, 2, 1])
     with f2:
-        if st.button("Refresh Data", use_container_width=True):
-            st.cache_data.clear()
-            st.rerun()
-        st.markdown("<div style='text-align:center; color: #64748b; font-size: 0.8rem; margin-top: 1rem;'>CryptoCoin Protocol v1.0 • Component 1: Streamlit Dashboard</div>", unsafe_allow_html=True)
+        if st.button("Refresh Data", width="stretch"):
+            get_ledger_sync().request_refresh()
+            st.toast("Refresh requested; new transactions will appear shortly.")
+        st.markdown(f"<div style='text-align:center; color: #64748b; font-size: 0.8rem; margin-top: 1rem;'>CryptoCoin Protocol v1.0 • Component 1: Streamlit Dashboard • Last synced {synced}</div>", unsafe_allow_html=True)
+    render_debug_panel(get_metrics())
 
 
 if __name__ == "__main__":
-    main()
+    with get_metrics().timer("rerun"):
+        main()
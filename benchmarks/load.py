@@ -0,0 +1,253 @@
+"""
+Load-test the dashboard with concurrent simulated sessions.
+
+For each ledger size a deterministic synthetic ledger is served from the
+local stand-in server, and N sessions run ``app.py`` through Streamlit's
+AppTest inside one process, as one server process would serve them: the
+sessions share the cached ledger, views and figures, and their reruns
+compete for the same interpreter. Each session loads the page, then makes
+``--reruns`` interactions:
+
+    rerun       plain rerun, as on the auto-refresh
+    page        next page of the transaction details table
+    leaderboard change the number of wallets ranked
+    histogram   switch the amount histogram's binning
+    flows       change the number of flows in the Sankey
+
+Every ledger size runs in a fresh process, so earlier sizes' caches and
+background refreshers do not skew later ones. Reported per size and session
+count: rerun latency percentiles (page loads separately), reruns per second
+across all sessions, and process CPU seconds and resident memory added per
+session:
+
+    python -m benchmarks.load --sessions 1 4 16 --rows 10000 100000
+    python -m benchmarks.load --sessions 1 2 4 8 --reruns 20 --json load.json
+"""
+
+import argparse
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+PERCENTILES = (50, 95, 99)
+
+
+def _set_widget(at, kind, key, value):
+    """Set widget ``key`` and rerun; a plain rerun if the page has no such widget."""
+    try:
+        widget = getattr(at, kind)(key=key)
+    except KeyError:
+        return at.run()
+    return widget.set_value(value).run()
+
+
+# (name, action); actions take the session's AppTest and its interaction number
+ACTIONS = (
+    ("rerun", lambda at, step: at.run()),
+    ("page", lambda at, step: _set_widget(at, "number_input", "tx_details_page", step % 3 + 1)),
+    ("leaderboard", lambda at, step: _set_widget(at, "selectbox", "leaderboard_k", (5, 10, 25)[step % 3])),
+    ("histogram", lambda at, step: _set_widget(at, "selectbox", "hist_scheme", ("quantile", "fixed")[step % 2])),
+    ("flows", lambda at, step: _set_widget(at, "slider", "flow_top_n", 10 + 5 * (step % 4))),
+)
+
+
+def _share_runtime():
+    """Keep a mock Runtime installed while any session's script is running.
+
+    AppTest installs a fresh mock Runtime before every run and clears the
+    singleton when the run returns, which pulls it out from under the other
+    sessions' script threads. Fall back to the last runtime installed instead.
+    """
+    from streamlit.runtime.runtime import Runtime
+
+    last = []
+
+    def current(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        return last[0] if last else None
+
+    def instance(cls):
+        runtime = current(cls)
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: current(cls) is not None)
+
+
+def _count_thread_errors(errors):
+    """Count uncaught exceptions in script threads; AppTest only reports errors raised by the script."""
+    default = threading.excepthook
+
+    def hook(args):
+        errors.append(args.thread.name if args.thread else None)
+        default(args)
+
+    threading.excepthook = hook
+
+
+def _rss_mb():
+    """Current resident set size; the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def _session(app_test, reruns, timeout, start, out):
+    """One simulated viewer: load the page, then cycle through :data:`ACTIONS`."""
+    at = app_test.from_file(APP_PATH, default_timeout=timeout)
+    record = out.setdefault(threading.get_ident(), {"load": None, "reruns": [], "errors": 0, "app": at})
+    start.wait()
+    began = time.perf_counter()
+    at.run()
+    record["load"] = time.perf_counter() - began
+    for step in range(reruns):
+        _, action = ACTIONS[step % len(ACTIONS)]
+        began = time.perf_counter()
+        try:
+            action(at, step)
+        except Exception:
+            record["errors"] += 1
+            continue
+        record["reruns"].append(time.perf_counter() - began)
+        record["errors"] += len(at.exception)
+
+
+def run_sessions(app_test, sessions, reruns, timeout, thread_errors=()):
+    """Drive ``sessions`` concurrent viewers once; returns their latencies and the process cost."""
+    gc.collect()
+    out, crashed = {}, len(thread_errors)
+    start = threading.Barrier(sessions)
+    threads = [
+        threading.Thread(target=_session, args=(app_test, reruns, timeout, start, out), name=f"session-{i}")
+        for i in range(sessions)
+    ]
+    rss, cpu = _rss_mb(), _cpu_seconds()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+    cpu, rss = _cpu_seconds() - cpu, _rss_mb() - rss  # sessions are still alive, so their state counts
+
+    loads = sorted(r["load"] for r in out.values() if r["load"] is not None)
+    latencies = sorted(t for r in out.values() for t in r["reruns"])
+    result = {
+        "load_p50": _percentile(loads, 50),
+        **{f"p{p}": _percentile(latencies, p) for p in PERCENTILES},
+        "reruns_per_s": (len(loads) + len(latencies)) / wall,
+        "cpu_s_per_session": cpu / sessions,
+        "rss_mb_per_session": rss / sessions,
+        "wall_s": wall,
+        "errors": sum(r["errors"] for r in out.values()) + len(thread_errors) - crashed,
+    }
+    return {name: round(value, 4) if isinstance(value, float) else value for name, value in result.items()}
+
+
+def bench_size(rows, wallets, session_counts, reruns, timeout, seed=0):
+    """Serve one synthetic ledger and load-test the app at each session count; runs in its own process."""
+    from benchmarks.standin import serve_ledger
+    from benchmarks.synthetic import ledger_csv_bytes
+
+    body = ledger_csv_bytes(rows, wallets, seed)
+    with serve_ledger(body) as server, tempfile.TemporaryDirectory() as store:
+        # Read when the app first imports cryptocoin.core, so set before any session starts
+        os.environ.update(LEDGER_CSV_URL=server.url, LEDGER_STORE_DIR=store)
+        os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+        logging.getLogger("streamlit").setLevel(logging.ERROR)
+        from streamlit.testing.v1 import AppTest
+
+        _share_runtime()
+        thread_errors = []
+        _count_thread_errors(thread_errors)
+        # Warm-up: one session fetches the ledger and fills the shared caches every action uses
+        warm = run_sessions(AppTest, 1, len(ACTIONS), timeout, thread_errors)
+        results = {"_meta": {
+            "csv_bytes": len(body),
+            "wallets": wallets,
+            "cold_start_s": warm["load_p50"],
+            "errors": warm["errors"],
+        }}
+        for sessions in session_counts:
+            print(f"  {sessions} session(s)...", file=sys.stderr)
+            results[str(sessions)] = run_sessions(AppTest, sessions, reruns, timeout, thread_errors)
+        results["_meta"]["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+
+def print_table(results):
+    columns = ("load_p50", *(f"p{p}" for p in PERCENTILES))
+    print(f"{'rows':>10} {'sessions':>8} " + " ".join(f"{c:>10}" for c in columns)
+          + f" {'reruns/s':>9} {'cpu s/sess':>10} {'MB/sess':>8} {'errors':>6}")
+    for size, by_sessions in results.items():
+        for sessions, r in by_sessions.items():
+            if sessions.startswith("_"):
+                continue
+            cells = " ".join(f"{r[c] * 1000:8.0f}ms" for c in columns)
+            print(f"{int(size):>10,} {sessions:>8} {cells} {r['reruns_per_s']:9.2f} "
+                  f"{r['cpu_s_per_session']:10.2f} {r['rss_mb_per_session']:8.1f} {r['errors']:>6}")
+    for size, by_sessions in results.items():
+        meta = by_sessions["_meta"]
+        print(f"{int(size):>10,} rows: cold start {meta['cold_start_s']:.2f}s, "
+              f"process max RSS {meta['max_rss_mb']:.0f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="ledger sizes to test")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="concurrent sessions per run")
+    parser.add_argument("--reruns", type=int, default=10, help="interactions per session after the page load")
+    parser.add_argument("--wallets", type=int, default=1_000)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds one rerun may take")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    # Spawned workers: a fresh interpreter per size that imports the app only after its stand-in is up
+    context = multiprocessing.get_context("spawn")
+    for rows in args.rows:
+        print(f"Load-testing {rows:,} rows...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[str(rows)] = pool.submit(
+                bench_size, rows, args.wallets, args.sessions, args.reruns, args.timeout,
+            ).result()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    errors = sum(r["errors"] for by_sessions in results.values() for r in by_sessions.values())
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Benchmark the dashboard's data path stage by stage.
+
+For each ledger size a deterministic synthetic ledger is served from a local
+stand-in server and pushed through the same functions ``main()`` uses:
+
+    download    fetch the CSV body over HTTP (LedgerClient)
+    parse       stream the body into typed columns (read_ledger_csv)
+    compact     dictionary-encode it (compact_ledger)
+    balances    wallet balances (calculate_wallet_balances)
+    views       per-version display views (ledger_views)
+    table_page  first page of the transaction table, newest first and sorted
+    charts      build both Plotly figures and serialize them to JSON
+    append      fold 1% newly appended rows into a synced ledger (LedgerSync)
+
+Each stage reports the median wall time over ``--repeat`` runs and the peak
+Python heap (tracemalloc) of one extra run. Results can be saved as a
+baseline and later runs compared against it:
+
+    python -m benchmarks.run --rows 1000 10000 100000 --save-baseline
+    python -m benchmarks.run --rows 1000 10000 100000 --check
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import pyarrow as pa  # noqa: E402
+
+import app  # noqa: E402
+from cryptocoin import core  # noqa: E402
+from cryptocoin.client import LedgerClient  # noqa: E402
+from benchmarks.standin import serve_ledger  # noqa: E402
+from benchmarks.synthetic import ledger_csv_bytes, write_ledger_csv  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+NOISE_FLOOR = 0.005  # seconds; slowdowns smaller than this are never flagged
+
+
+def _download(ctx):
+    client = LedgerClient(url=ctx["url"])
+    with client.fetch() as body:
+        ctx["bytes"] = len(body.read())
+
+
+def _parse(ctx):
+    ctx["chunk"] = core.read_ledger_csv(io.BytesIO(ctx["body"]))
+
+
+def _compact(ctx):
+    ctx["df"] = core.compact_ledger(ctx["chunk"].df)
+
+
+def _balances(ctx):
+    ctx["wallets"] = core.calculate_wallet_balances(ctx["df"])
+
+
+def _views(ctx):
+    app.ledger_views.clear()
+    ctx["views"] = app.ledger_views(ctx["snapshot"].version, ctx["snapshot"])
+
+
+def _table_page(ctx):
+    app.ledger_sort_order.clear()
+    snapshot, views = ctx["snapshot"], ctx["views"]
+    pages = [
+        app.ledger_page(snapshot, views, 0, 25),
+        app.ledger_page(snapshot, views, 0, 25, "Amount", False),
+    ]
+    ctx["payload"] = sum(pa.Table.from_pandas(page).nbytes for page in pages)
+
+
+def _charts(ctx):
+    views = ctx["views"]
+    figures = [app.volume_figure(views), app.distribution_figure(views)]
+    ctx["payload"] = sum(len(fig.to_json()) for fig in figures)
+
+
+def _append_setup(ctx):
+    sync = core.LedgerSync()
+    sync.apply(io.BytesIO(ctx["body"]))
+    ctx["sync"] = sync
+
+
+def _append(ctx):
+    ctx["sync"].apply(io.BytesIO(ctx["body"] + ctx["appended"]))
+
+
+# (name, setup, run); setup is untimed and runs before every repetition
+STAGES = (
+    ("download", None, _download),
+    ("parse", None, _parse),
+    ("compact", None, _compact),
+    ("balances", None, _balances),
+    ("views", None, _views),
+    ("table_page", None, _table_page),
+    ("charts", None, _charts),
+    ("append", _append_setup, _append),
+)
+
+
+def _measure(ctx, setup, run, repeat):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup(ctx)
+        start = time.perf_counter()
+        run(ctx)
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup(ctx)
+    tracemalloc.start()
+    run(ctx)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def bench_size(rows, wallets, repeat, seed=0):
+    """Run every stage for one ledger size; returns {stage: result}."""
+    body = ledger_csv_bytes(rows, wallets, seed)
+    appended = io.BytesIO()
+    extra = max(1, rows // 100)
+    write_ledger_csv(appended, extra, wallets, seed + 1)
+    ctx = {"body": body, "appended": appended.getvalue().split(b"\n", 1)[1]}
+
+    results = {}
+    with serve_ledger(body) as server:
+        ctx["url"] = server.url
+        for name, setup, run in STAGES:
+            if name == "views":
+                sync = core.LedgerSync()
+                sync.apply(io.BytesIO(body))
+                ctx["snapshot"] = sync.snapshot
+            ctx.pop("payload", None)
+            seconds, peak = _measure(ctx, setup, run, repeat)
+            results[name] = {"seconds": round(seconds, 6), "peak_mb": round(peak / 1e6, 3)}
+            if "payload" in ctx:
+                results[name]["payload_bytes"] = ctx["payload"]
+    results["_meta"] = {"csv_bytes": len(body), "wallets": wallets}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """List of human-readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if stage.startswith("_") or not base:
+                continue
+            now, before = result["seconds"], base["seconds"]
+            if now > before * tolerance and now - before > NOISE_FLOOR:
+                regressions.append(f"{size} rows / {stage}: {before:.4f}s -> {now:.4f}s ({now / before:.2f}x)")
+    return regressions
+
+
+def print_table(results):
+    stages = [name for name, _, _ in STAGES]
+    print(f"{'rows':>10} " + " ".join(f"{s:>12}" for s in stages))
+    for size, stage_results in results.items():
+        cells = [f"{stage_results[s]['seconds'] * 1000:10.1f}ms" for s in stages]
+        print(f"{int(size):>10,} " + " ".join(cells))
+    print(f"{'peak MB':>10} " + " ".join(f"{'':>12}" for _ in stages))
+    for size, stage_results in results.items():
+        cells = [f"{stage_results[s]['peak_mb']:12.1f}" for s in stages]
+        print(f"{int(size):>10,} " + " ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="ledger sizes to benchmark (1e3 to 1e7)")
+    parser.add_argument("--wallets", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if a stage regressed")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for rows in args.rows:
+        print(f"Benchmarking {rows:,} rows...", file=sys.stderr)
+        results[str(rows)] = bench_size(rows, args.wallets, args.repeat)
+
+    print_table(results)
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\nProcess max RSS: {max_rss_mb:.0f} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    if args.check:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        except FileNotFoundError:
+            print(f"No baseline at {args.baseline}; run with --save-baseline first.", file=sys.stderr)
+            return 2
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        status = 1 if regressions else 0
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Local HTTP stand-in for the published ledger sheet.
+
+Serves a CSV body with ETag / If-None-Match support and optional gzip, like
+the Google Sheets CSV export, so the dashboard and the benchmarks can run
+without network access. The body can be swapped or appended to while the
+server runs.
+
+    python -m benchmarks.standin --rows 100000 --port 8765
+    LEDGER_CSV_URL=http://127.0.0.1:8765/ledger.csv streamlit run app.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import ledger_csv_bytes
+
+
+class LedgerStandIn(ThreadingHTTPServer):
+    """Threaded HTTP server holding one ledger CSV body."""
+
+    daemon_threads = True
+
+    def __init__(self, body, host="127.0.0.1", port=0, gzip_level=1):
+        super().__init__((host, port), _LedgerHandler)
+        self.gzip_level = gzip_level
+        self.requests_served = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+        self.set_body(body)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/ledger.csv"
+
+    def set_body(self, body):
+        with self._lock:
+            self._body = body
+            self._etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+            self._gzipped = None
+
+    def append(self, data):
+        self.set_body(self._body + data)
+
+    def snapshot(self, gzipped):
+        """(etag, payload) for the current body, compressing lazily."""
+        with self._lock:
+            if gzipped and self._gzipped is None:
+                self._gzipped = gzip.compress(self._body, compresslevel=self.gzip_level)
+            return self._etag, self._gzipped if gzipped else self._body
+
+
+class _LedgerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        etag, payload = server.snapshot(gzipped)
+        server.requests_served += 1
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("ETag", etag)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        server.bytes_served += len(payload)
+
+
+@contextmanager
+def serve_ledger(body, **kwargs):
+    """Run a :class:`LedgerStandIn` for ``body`` in a background thread."""
+    server = LedgerStandIn(body, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--wallets", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="serve this CSV file instead of a synthetic ledger")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.csv:
+        with open(args.csv, "rb") as f:
+            body = f.read()
+    else:
+        body = ledger_csv_bytes(args.rows, args.wallets, args.seed)
+    server = LedgerStandIn(body, args.host, args.port)
+    print(f"Serving {len(body):,} bytes at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
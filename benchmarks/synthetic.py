@@ -0,0 +1,82 @@
+"""
+Deterministic synthetic ledger generator for the benchmarks.
+
+Wallet activity follows a power law (a few very busy wallets, a long tail of
+rarely used ones), amounts are log-normal, and every row carries a fee, a
+transaction type and a strictly increasing timestamp. The same arguments
+always produce byte-identical CSV.
+"""
+
+import io
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+HEADER = "Timestamp,Tx Hash,From,To,Amount,Fee,Type\n"
+TX_TYPES = np.array(["transfer", "reward", "donation", "stake", "mint"])
+TX_TYPE_WEIGHTS = np.array([0.6, 0.2, 0.1, 0.08, 0.02])
+START = np.datetime64("2025-01-01T00:00:00", "s")
+
+_HEX = np.array([f"{i:02x}" for i in range(256)], dtype="S2")
+
+
+def _hex_strings(rng, count, nbytes):
+    """``count`` random '0x'-prefixed hex strings of ``nbytes`` bytes each."""
+    digits = _HEX[rng.integers(0, 256, size=(count, nbytes), dtype=np.uint8)]
+    digits = np.ascontiguousarray(digits).view(f"S{2 * nbytes}").ravel()
+    return np.char.add(b"0x", digits).astype(f"U{2 * nbytes + 2}")
+
+
+def wallet_addresses(wallets, seed=0):
+    """The ``wallets`` addresses used by the generator for ``seed``."""
+    return _hex_strings(np.random.default_rng([seed, 0]), wallets, 20)
+
+
+def generate_ledger(rows, wallets=1_000, seed=0, alpha=1.2, start_row=0):
+    """Return ``rows`` synthetic transactions as a pyarrow Table.
+
+    Wallet ``k`` (by rank) is picked with probability proportional to
+    ``1 / (k + 1) ** alpha``. ``start_row`` offsets the timestamps and the
+    random stream, so consecutive chunks can be generated independently
+    and concatenated.
+    """
+    rng = np.random.default_rng([seed, 1, start_row])
+    addresses = wallet_addresses(wallets, seed)
+    weights = 1.0 / np.arange(1, wallets + 1) ** alpha
+    weights /= weights.sum()
+
+    senders = rng.choice(wallets, size=rows, p=weights)
+    recipients = rng.choice(wallets, size=rows, p=weights)
+    # Avoid self-transfers by shifting the recipient to the next wallet
+    recipients = np.where(recipients == senders, (recipients + 1) % wallets, recipients)
+    types = rng.choice(len(TX_TYPES), size=rows, p=TX_TYPE_WEIGHTS)
+    # Mints have no sender
+    from_col = pa.array(addresses[senders], mask=types == 4)
+
+    seconds = start_row * 30 + np.cumsum(rng.integers(1, 60, size=rows))
+    return pa.table({
+        "Timestamp": pa.array(START + seconds.astype("timedelta64[s]")),
+        "Tx Hash": pa.array(_hex_strings(rng, rows, 32)),
+        "From": from_col,
+        "To": pa.array(addresses[recipients]),
+        "Amount": pa.array(np.round(rng.lognormal(3.0, 1.5, size=rows), 2)),
+        "Fee": pa.array(np.round(rng.uniform(0.001, 0.05, size=rows), 4)),
+        "Type": pa.array(TX_TYPES[types]),
+    })
+
+
+def write_ledger_csv(out, rows, wallets=1_000, seed=0, alpha=1.2, chunk_rows=500_000):
+    """Write a synthetic ledger as CSV to the binary file object ``out`` in chunks."""
+    out.write(HEADER.encode())
+    options = pa_csv.WriteOptions(include_header=False, quoting_style="none")
+    for start in range(0, rows, chunk_rows):
+        table = generate_ledger(min(chunk_rows, rows - start), wallets, seed, alpha, start_row=start)
+        pa_csv.write_csv(table, out, options)
+
+
+def ledger_csv_bytes(rows, wallets=1_000, seed=0, alpha=1.2):
+    """A synthetic ledger as CSV bytes."""
+    out = io.BytesIO()
+    write_ledger_csv(out, rows, wallets, seed, alpha)
+    return out.getvalue()
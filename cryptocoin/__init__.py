@@ -0,0 +1,29 @@
+"""
+CryptoCoin analytics without the dashboard.
+
+The ledger logic behind ``app.py`` lives in :mod:`cryptocoin.core` and the
+batch reports in :mod:`cryptocoin.report`; ``python -m cryptocoin`` runs the
+report CLI (:mod:`cryptocoin.cli`). The dashboard's HTTP client, metrics,
+exports and servers are in :mod:`~cryptocoin.client`,
+:mod:`~cryptocoin.metrics`, :mod:`~cryptocoin.exports` and
+:mod:`~cryptocoin.server`. Nothing here imports Streamlit or Plotly, and
+submodules (with pandas and pyarrow) are only loaded on first use, so
+``import cryptocoin`` itself is instant:
+
+    import cryptocoin
+    chunk = cryptocoin.read_ledger_csv(open('ledger.csv', 'rb'))
+"""
+
+import importlib
+
+_SUBMODULES = ('core', 'report', 'cli', 'client', 'metrics', 'exports', 'server')
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    core = importlib.import_module(f'{__name__}.core')
+    try:
+        return getattr(core, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,5 @@
+import sys
+
+from cryptocoin.cli import main
+
+sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Build balance and aggregate reports for one or more ledger CSVs.
+
+Each source is a local CSV file or an http(s) URL serving one (such as the
+published sheet's CSV export). One report is written per source into
+``--out``; several sources are processed in parallel worker processes:
+
+    python -m cryptocoin ledger.csv
+    python -m cryptocoin archive/*.csv --out reports --format parquet --workers 4
+    python -m cryptocoin "$LEDGER_CSV_URL" --top 50
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+FORMAT_SUFFIXES = {'json': '.json', 'parquet': ''}  # parquet reports are directories
+
+
+def _report_job(source, path, fmt, top):
+    """Build and write one report; runs in a worker process. Returns (summary, seconds)."""
+    from cryptocoin.report import build_report, write_report
+
+    start = time.perf_counter()
+    report = build_report(source, top=top)
+    write_report(report, path, fmt)
+    return report.summary, time.perf_counter() - start
+
+
+def _output_paths(sources, out_dir, fmt):
+    """One output path per source, numbering reports whose names would collide."""
+    from cryptocoin.report import report_name
+
+    paths, used = [], set()
+    for source in sources:
+        stem = name = report_name(source)
+        number = 1
+        # Another source's own name may already end in "-2"; casefolded for case-insensitive file systems
+        while name.casefold() in used:
+            number += 1
+            name = f'{stem}-{number}'
+        used.add(name.casefold())
+        paths.append(os.path.join(out_dir, name + FORMAT_SUFFIXES[fmt]))
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cryptocoin', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', metavar='SOURCE', help='ledger CSV file or http(s) URL')
+    parser.add_argument('--out', default='reports', help='directory for the reports (default: %(default)s)')
+    parser.add_argument('--format', choices=list(FORMAT_SUFFIXES), default='json')
+    parser.add_argument('--top', type=int, default=20, help='wallets listed per leaderboard metric')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes when there are several sources')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    jobs = list(zip(args.sources, _output_paths(args.sources, args.out, args.format)))
+    workers = max(1, min(args.workers, len(jobs)))
+    failures = 0
+
+    def report(source, path, outcome):
+        nonlocal failures
+        try:
+            summary, seconds = outcome()
+        except Exception as e:
+            failures += 1
+            print(f"{source}: failed: {e}", file=sys.stderr)
+            return
+        print(f"{source}: {summary['transactions']:,} transactions, {summary['wallets']:,} wallets, "
+              f"{summary['rejected_rows']:,} rejected -> {path} ({seconds:.1f}s)")
+
+    if workers == 1:
+        for source, path in jobs:
+            report(source, path, lambda: _report_job(source, path, args.format, args.top))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_report_job, source, path, args.format, args.top): (source, path)
+                       for source, path in jobs}
+            for future in as_completed(futures):
+                report(*futures[future], future.result)
+    return 1 if failures else 0
@@ -0,0 +1,93 @@
+"""
+HTTP client for the published ledger CSV.
+
+Only needed to fetch a remote ledger; ``requests`` is imported when a
+:class:`LedgerClient` is created.
+"""
+
+import contextlib
+import random
+import time
+
+from cryptocoin.core import CSV_BLOCK_SIZE, LEDGER_CSV_URL
+from cryptocoin.metrics import Metrics
+
+FETCH_TIMEOUT = 10  # seconds
+FETCH_RETRIES = 3
+FETCH_RETRY_BACKOFF = 0.5  # seconds, doubled per retry with full jitter
+
+
+class LedgerClient:
+    """HTTP client for the published ledger CSV.
+
+    Keeps a pooled keep-alive session, asks for gzip, and sends conditional
+    requests (``If-None-Match`` / ``If-Modified-Since``) from the previous
+    response so an unchanged ledger costs a 304 and no parsing. (A body
+    that is re-sent unchanged is caught by :class:`LedgerSync`'s prefix
+    digest.) Connection errors, timeouts, 429 and 5xx responses are retried
+    a bounded number of times with exponential backoff and full jitter.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, url=LEDGER_CSV_URL, timeout=FETCH_TIMEOUT, retries=FETCH_RETRIES,
+                 backoff=FETCH_RETRY_BACKOFF, metrics=None):
+        self.url = url
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        import requests.adapters
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip'
+        self._etag = None
+        self._last_modified = None
+
+    @contextlib.contextmanager
+    def fetch(self):
+        """Open the ledger CSV; yields its decompressed body as a binary stream, or None if unchanged."""
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+
+        with self.metrics.timer('fetch'):
+            response = self._get(headers)
+        try:
+            if response.status_code == 304:
+                yield None
+            else:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                yield response.raw
+                # Only remember validators once the body was fully consumed
+                self._etag = response.headers.get('ETag')
+                self._last_modified = response.headers.get('Last-Modified')
+        except BaseException:
+            response.close()
+            raise
+        else:
+            # Drain whatever is left so the connection can go back to the pool
+            while response.raw.read(CSV_BLOCK_SIZE):
+                pass
+            response.raw.release_conn()
+
+    def _get(self, headers):
+        import requests
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self.session.get(self.url, headers=headers, timeout=self.timeout, stream=True)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in self.RETRY_STATUSES or last_attempt:
+                    return response
+                response.close()
+            self.metrics.inc('ledger_fetch_retries')
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
@@ -0,0 +1,2595 @@
+"""
+CryptoCoin analytics core: ledger parsing, balances, rollups, indexes and sync.
+
+Everything the dashboard computes from the ledger lives here, free of
+Streamlit and Plotly, so batch jobs and scripts can import it directly.
+Fetching a remote ledger (:mod:`cryptocoin.client`), metrics
+(:mod:`cryptocoin.metrics`), exports (:mod:`cryptocoin.exports`) and the
+HTTP servers (:mod:`cryptocoin.server`) live in their own modules.
+"""
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+from datetime import datetime
+import io
+import csv
+import re
+import tempfile
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+import random
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+from cryptocoin.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# === Configuration ===
+SHEET_CSV_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vQ-7MdvgD9R5nXcW-MqHB3oQ_GYKG6I-a0IT9bjnJ-UGRGJF5VdfzsJOKmINEDk8s3xIbxuUphl9oXt/pub?output=csv"
+LEDGER_STORE_FORMAT = 2
+LEDGER_TTL = 60  # seconds between fetches of the sheet
+LEDGER_CSV_URL = os.environ.get("LEDGER_CSV_URL", SHEET_CSV_URL)
+LEDGER_SOURCES = os.environ.get("LEDGER_SOURCES")  # "name=url,name=url": several ledgers merged into one
+REFRESH_BACKOFF_BASE = 5  # first retry delay after a failed fetch, in seconds
+REFRESH_BACKOFF_MAX = 300
+CSV_BLOCK_SIZE = 1 << 20  # bytes parsed per block when streaming the CSV
+SPOOL_MAX_BYTES = 16 << 20  # already-synced prefix kept in memory up to this size, then on disk
+CHART_POINT_BUDGET = 2000  # most points per chart series sent to the browser
+HISTOGRAM_BINS = 10
+
+def format_number(num):
+    if pd.isna(num) or num == 0:
+        return "0"
+    
+    # Handle rounding edge case where ~999k rounds to 1000K instead of 1M
+    if abs(num) >= 999_995:
+        return f"{num/1_000_000:.2f}M"
+        
+    if abs(num) >= 1_000:
+        return f"{num/1_000:.2f}K"
+    return f"{num:,.2f}"
+
+
+def truncate_address(addr, front=6, back=4):
+    if pd.isna(addr) or not isinstance(addr, str) or len(addr) <= front + back:
+        return str(addr) if not pd.isna(addr) else "—"
+    return f"{addr[:front]}...{addr[-back:]}"
+
+
+class LedgerField(NamedTuple):
+    """One column of the declared ledger schema."""
+    name: str  # canonical column name used throughout the app
+    aliases: Tuple[str, ...]  # normalised sheet headers accepted for this field
+    kind: str  # 'timestamp', 'hash', 'address', 'amount' or 'category'
+    required: bool
+
+
+LEDGER_SCHEMA = (
+    LedgerField('Timestamp', ('timestamp', 'time', 'date', 'datetime', 'created at'), 'timestamp', False),
+    LedgerField('Tx Hash', ('tx hash', 'hash', 'transaction hash', 'txhash', 'tx id', 'txid'), 'hash', False),
+    LedgerField('From', ('from', 'sender', 'from address', 'from wallet', 'sender address'), 'address', True),
+    LedgerField('To', ('to', 'recipient', 'receiver', 'to address', 'to wallet', 'recipient address'), 'address', True),
+    LedgerField('Amount', ('amount', 'value'), 'amount', True),
+    LedgerField('Fee', ('fee', 'fees', 'gas fee', 'tx fee'), 'amount', False),
+    LedgerField('Type', ('type', 'tx type', 'transaction type', 'category'), 'category', False),
+)
+# Tried in order (offsets are converted to UTC); anything else ISO 8601-like goes through _parse_iso
+TIMESTAMP_FORMATS = (
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%d %H:%M:%S%z',
+    '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%Y-%m-%d', '%m/%d/%Y',
+)
+_FRACTION_PATTERN = r'(:\d\d)[.,]\d+'  # fractional seconds, dropped: timestamps are kept to the second
+_NUMBER_PATTERN = r'^-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$'
+
+
+class LedgerSchemaError(ValueError):
+    """The ledger header is missing a required column."""
+
+
+def _normalize_header(name):
+    name = re.sub(r'\(.*?\)', ' ', name.strip().lower())
+    return re.sub(r'[\s_\-]+', ' ', name).strip()
+
+
+def map_ledger_columns(names):
+    """Map raw sheet headers to schema fields.
+
+    Returns a list of ``(raw_name, column_name, kind)``; headers that match
+    no field keep their own (stripped) name with kind 'text'. Raises
+    :class:`LedgerSchemaError` when a required field has no column.
+    """
+    fields = {alias: field for field in LEDGER_SCHEMA for alias in field.aliases}
+    mapping, used = [], set()
+    for raw in names:
+        field = fields.get(_normalize_header(raw))
+        if field is not None and field.name not in used:
+            used.add(field.name)
+            mapping.append((raw, field.name, field.kind))
+        else:
+            mapping.append((raw, raw.strip(), 'text'))
+    missing = [field.name for field in LEDGER_SCHEMA if field.required and field.name not in used]
+    if missing:
+        raise LedgerSchemaError(f"Ledger is missing required column(s): {', '.join(missing)}")
+    return mapping
+
+
+class LedgerColumns(NamedTuple):
+    """Ledger column names resolved from the sheet header."""
+    from_col: Optional[str]
+    to_col: Optional[str]
+    amount_col: Optional[str]
+    fee_col: Optional[str]
+    hash_col: Optional[str]
+    time_col: Optional[str]
+    type_col: Optional[str]
+    display_cols: Tuple[str, ...]  # address/hash columns shown truncated
+
+
+def resolve_columns(df):
+    """Resolve which schema columns are present in an ingested ledger."""
+    def present(name):
+        return name if name in df.columns else None
+
+    return LedgerColumns(
+        from_col=present('From'),
+        to_col=present('To'),
+        amount_col=present('Amount'),
+        fee_col=present('Fee'),
+        hash_col=present('Tx Hash'),
+        time_col=present('Timestamp'),
+        type_col=present('Type'),
+        display_cols=tuple(
+            c for c in df.columns if c in ('Tx Hash', 'From', 'To') or 'addr' in c.lower()
+        ),
+    )
+
+
+def _wallet_keys(col):
+    """Normalise an address column to strings, with blanks and NaN as missing."""
+    keys = col.astype(str).where(col.notna())
+    return keys.where(~keys.isin(['', 'nan']))
+
+
+def ledger_address_codes(df, from_col, to_col):
+    """Integer codes for the sender/recipient columns plus their shared address table.
+
+    Missing addresses get code -1. A compact ledger already carries the codes;
+    anything else is factorized in order of first appearance.
+    """
+    senders, recipients = df[from_col], df[to_col]
+    if (
+        isinstance(senders.dtype, pd.CategoricalDtype)
+        and isinstance(recipients.dtype, pd.CategoricalDtype)
+        and senders.cat.categories.equals(recipients.cat.categories)
+    ):
+        return senders.cat.codes.to_numpy(), recipients.cat.codes.to_numpy(), senders.cat.categories
+
+    # Sender before recipient within each row, matching ledger order
+    pairs = np.column_stack([
+        _wallet_keys(senders).to_numpy(dtype=object),
+        _wallet_keys(recipients).to_numpy(dtype=object),
+    ]).ravel()
+    codes, table = pd.factorize(pairs)
+    return codes[0::2], codes[1::2], pd.Index(table)
+
+
+def calculate_wallet_balances(df):
+    """Calculate balances for each unique wallet from transaction history.
+
+    Returns a DataFrame indexed by wallet address (in order of first
+    appearance) with ``sent``, ``received``, ``balance`` and ``role`` columns.
+    """
+    sums = _wallet_sums(df)
+    if sums is None:
+        return pd.DataFrame(columns=['sent', 'received', 'balance', 'role'])
+    sent, received, transactions, table = sums
+    return _active_wallet_frame(table, sent, received, transactions)
+
+
+def _wallet_sums(df):
+    """Per address code: amount sent, amount received and number of transactions.
+
+    Returns (sent, received, transactions, address table), or None when the
+    ledger lacks a sender, recipient or amount column.
+    """
+    from_col, to_col, amount_col = resolve_columns(df)[:3]
+    if not all([from_col, to_col, amount_col]):
+        return None
+
+    amounts = pd.to_numeric(df[amount_col], errors='coerce').fillna(0).to_numpy(dtype=float)
+    from_codes, to_codes, table = ledger_address_codes(df, from_col, to_col)
+    has_sender = from_codes >= 0
+    has_recipient = to_codes >= 0
+    n = len(table)
+
+    sent = np.bincount(from_codes[has_sender], weights=amounts[has_sender], minlength=n)
+    received = np.bincount(to_codes[has_recipient], weights=amounts[has_recipient], minlength=n)
+    transactions = np.bincount(from_codes[has_sender], minlength=n) + np.bincount(to_codes[has_recipient], minlength=n)
+    return sent, received, transactions, table
+
+
+def _active_wallet_frame(table, sent, received, transactions):
+    """Wallet table for the addresses of ``table`` that appear in at least one transaction."""
+    # The address table may hold addresses no longer referenced by any row
+    active = transactions > 0
+    index = pd.Index(table[active], name='address')
+    return _wallet_frame(index, pd.Series(sent[active], index=index), pd.Series(received[active], index=index))
+
+
+def _wallet_frame(index, sent, received):
+    """Build the wallet table for ``index`` from per-address sent/received sums."""
+    wallets = pd.DataFrame(index=index)
+    wallets['sent'] = sent.reindex(index, fill_value=0).astype(float)
+    wallets['received'] = received.reindex(index, fill_value=0).astype(float)
+    wallets['balance'] = wallets['received'] - wallets['sent']
+
+    # Assign roles based on activity
+    wallets['role'] = np.select(
+        [
+            (wallets['sent'] == 0) & (wallets['received'] > 0),
+            wallets['received'] > wallets['sent'],
+        ],
+        ['Treasury / Mint', 'Net Recipient'],
+        default='Net Sender',
+    )
+
+    return wallets
+
+
+LEADERBOARD_DEPTH = 100  # ranks kept per metric; the largest K offered in the UI
+LEADERBOARD_METRICS = {
+    'balance': 'Absolute balance',
+    'received': 'Received volume',
+    'sent': 'Sent volume',
+    'transactions': 'Transaction count',
+}
+
+
+class Leaderboard(NamedTuple):
+    """Per-wallet totals by address code plus the leading wallets for each metric.
+
+    ``top[metric]`` holds up to ``LEADERBOARD_DEPTH`` address codes in rank
+    order for every metric in ``LEADERBOARD_METRICS``.
+    """
+    sent: np.ndarray
+    received: np.ndarray
+    transactions: np.ndarray
+    top: dict
+
+
+def _metric_values(board, metric, codes):
+    if metric == 'balance':
+        return np.abs(board.received[codes] - board.sent[codes])
+    return getattr(board, metric)[codes].astype(float)
+
+
+def _rank(board, metric, candidates):
+    """The ``LEADERBOARD_DEPTH`` best of ``candidates`` by ``metric``, best first (ties by first appearance)."""
+    values = _metric_values(board, metric, candidates)
+    if len(candidates) > LEADERBOARD_DEPTH:
+        # Partial selection; everything tied with the cut-off value stays in for the tie-break
+        cutoff = np.partition(values, len(values) - LEADERBOARD_DEPTH)[len(values) - LEADERBOARD_DEPTH]
+        keep = values >= cutoff
+        candidates, values = candidates[keep], values[keep]
+    return candidates[np.lexsort((candidates, -values))][:LEADERBOARD_DEPTH]
+
+
+def build_leaderboard(df):
+    """Totals and rankings for every wallet in ``df`` (see :class:`Leaderboard`)."""
+    sums = _wallet_sums(df)
+    if sums is None:
+        empty = np.empty(0, dtype=np.int64)
+        return Leaderboard(np.empty(0), np.empty(0), empty, {metric: empty for metric in LEADERBOARD_METRICS})
+    sent, received, transactions, _ = sums
+    board = Leaderboard(sent, received, transactions.astype(np.int64), {})
+    active = np.flatnonzero(transactions)
+    return board._replace(top={metric: _rank(board, metric, active) for metric in LEADERBOARD_METRICS})
+
+
+def extend_leaderboard(board, new_rows):
+    """Fold ``new_rows`` (sharing address codes with ``board``) into the totals and rankings.
+
+    Only the previous leaders and the wallets the new rows touch are
+    re-ranked. Sent, received and transaction count never decrease, so that
+    is exact; an absolute balance can shrink, so when the new last leader
+    ranks below the previous one every wallet is re-ranked.
+    """
+    sums = _wallet_sums(new_rows)
+    if new_rows.empty or sums is None:
+        return board
+    sent, received, transactions, table = sums
+    grow = len(table) - len(board.sent)
+    updated = Leaderboard(
+        sent=np.pad(board.sent, (0, grow)) + sent,
+        received=np.pad(board.received, (0, grow)) + received,
+        transactions=np.pad(board.transactions, (0, grow)) + transactions,
+        top={},
+    )
+    touched = np.flatnonzero(transactions)
+    for metric in LEADERBOARD_METRICS:
+        leaders = board.top[metric]
+        top = _rank(updated, metric, np.union1d(leaders, touched))
+        if len(leaders) == LEADERBOARD_DEPTH:
+            cutoff = _metric_values(board, metric, leaders[-1:])[0]
+            last = _metric_values(updated, metric, top[-1:])[0]
+            if last < cutoff or (last == cutoff and top[-1] > leaders[-1]):
+                top = _rank(updated, metric, np.flatnonzero(updated.transactions))
+        updated.top[metric] = top
+    return updated
+
+
+def leaderboard_wallets(board, addresses):
+    """The full wallet table (as :func:`calculate_wallet_balances`) from the leaderboard's totals."""
+    if addresses is None:
+        return pd.DataFrame(columns=['sent', 'received', 'balance', 'role'])
+    return _active_wallet_frame(addresses, board.sent, board.received, board.transactions)
+
+
+def leaderboard_frame(board, addresses, metric, k):
+    """The top ``k`` wallets by ``metric`` as a small wallet table with a ``transactions`` column."""
+    codes = board.top[metric][:k]
+    index = pd.Index(addresses.take(codes), name='address')
+    frame = _wallet_frame(index, pd.Series(board.sent[codes], index=index),
+                          pd.Series(board.received[codes], index=index))
+    frame['transactions'] = board.transactions[codes]
+    return frame
+
+
+def total_volume(df):
+    """Sum of the amount column."""
+    amount_col = resolve_columns(df).amount_col
+    if amount_col is None:
+        return 0.0
+    return float(df[amount_col].sum())
+
+
+ROLLUP_AGGREGATIONS = {'count': 'sum', 'amount': 'sum', 'fees': 'sum', 'min': 'min', 'max': 'max'}
+WALLET_ROLLUP_AGGREGATIONS = {'count': 'sum', 'sent': 'sum', 'received': 'sum', 'fees': 'sum', 'min': 'min', 'max': 'max'}
+ROLLUP_GRANULARITIES = {'hour': 'Hourly', 'day': 'Daily', 'week': 'Weekly'}
+
+
+class Rollups(NamedTuple):
+    """Pre-aggregated ledger totals, maintained as rows arrive.
+
+    ``cube`` is indexed by (``hour``, ``type``): the hour as int64 ns
+    (undated rows under ``NO_TIME``) and the transaction type as text (''
+    without a type column), with ``count``, ``amount``, ``fees``, ``min``
+    and ``max`` columns. Days, weeks and per-type totals are re-aggregated
+    from it.
+
+    ``wallet_days`` is indexed by (``code``, ``day``): the address code and
+    the day as int64 ns (``NO_TIME`` when undated), with the wallet's
+    ``count`` of transactions, amount ``sent`` and ``received``, ``fees``
+    paid as sender and the ``min`` / ``max`` amount it was party to that
+    day; a wallet's days are contiguous, so :func:`wallet_rollup` answers a
+    wallet over a date range without touching the ledger. Per address code,
+    ``wallet_fees``, ``wallet_min`` and ``wallet_max`` hold the same over
+    the wallet's lifetime (counts and sums are in the :class:`Leaderboard`).
+    """
+    cube: pd.DataFrame
+    wallet_days: pd.DataFrame
+    wallet_fees: np.ndarray
+    wallet_min: np.ndarray
+    wallet_max: np.ndarray
+
+
+def _rollup_cube(df):
+    columns = resolve_columns(df)
+    n = len(df)
+    amounts = pd.to_numeric(df[columns.amount_col], errors='coerce').to_numpy(dtype=float) if columns.amount_col else np.full(n, np.nan)
+    fees = df[columns.fee_col].fillna(0).to_numpy(dtype=float) if columns.fee_col else np.zeros(n)
+    if columns.time_col and pd.api.types.is_datetime64_any_dtype(df[columns.time_col]):
+        # NaT floors to NaT, which is NO_TIME as int64
+        hours = df[columns.time_col].dt.floor('h').to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    else:
+        hours = np.full(n, NO_TIME)
+    types = df[columns.type_col].astype(str).where(df[columns.type_col].notna(), '') if columns.type_col else ''
+    frame = pd.DataFrame({
+        'hour': hours, 'type': types, 'count': 1, 'amount': amounts, 'fees': fees, 'min': amounts, 'max': amounts,
+    })
+    return frame.groupby(['hour', 'type'], sort=True).agg(ROLLUP_AGGREGATIONS)
+
+
+def _wallet_day_cube(df):
+    """Per (address code, day) totals of ``df``, or None without sender, recipient and amount columns."""
+    columns = resolve_columns(df)
+    if not all([columns.from_col, columns.to_col, columns.amount_col]):
+        return None
+    from_codes, to_codes, _ = ledger_address_codes(df, columns.from_col, columns.to_col)
+    amounts = pd.to_numeric(df[columns.amount_col], errors='coerce').to_numpy(dtype=float)
+    fees = df[columns.fee_col].fillna(0).to_numpy(dtype=float) if columns.fee_col else np.zeros(len(df))
+    if columns.time_col and pd.api.types.is_datetime64_any_dtype(df[columns.time_col]):
+        days = df[columns.time_col].dt.floor('D').to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    else:
+        days = np.full(len(df), NO_TIME)
+
+    # One posting per side of each transaction, as in the Leaderboard's counts
+    has_sender, has_recipient = from_codes >= 0, to_codes >= 0
+    sent, received = amounts[has_sender], amounts[has_recipient]
+    frame = pd.DataFrame({
+        'code': np.concatenate([from_codes[has_sender], to_codes[has_recipient]]).astype(np.int64),
+        'day': np.concatenate([days[has_sender], days[has_recipient]]),
+        'count': 1,
+        'sent': np.concatenate([np.nan_to_num(sent), np.zeros(len(received))]),
+        'received': np.concatenate([np.zeros(len(sent)), np.nan_to_num(received)]),
+        'fees': np.concatenate([fees[has_sender], np.zeros(len(received))]),
+        'min': np.concatenate([sent, received]),
+        'max': np.concatenate([sent, received]),
+    })
+    return frame.groupby(['code', 'day'], sort=True).agg(WALLET_ROLLUP_AGGREGATIONS)
+
+
+def _empty_wallet_days():
+    index = pd.MultiIndex.from_arrays([np.empty(0, dtype=np.int64)] * 2, names=['code', 'day'])
+    columns = {name: np.empty(0, dtype=np.int64 if name == 'count' else float) for name in WALLET_ROLLUP_AGGREGATIONS}
+    return pd.DataFrame(columns, index=index)
+
+
+def _wallet_extremes(df):
+    """(fees paid, smallest amount, largest amount) per address code, or None without addresses."""
+    columns = resolve_columns(df)
+    if not all([columns.from_col, columns.to_col, columns.amount_col]):
+        return None
+    from_codes, to_codes, table = ledger_address_codes(df, columns.from_col, columns.to_col)
+    amounts = pd.to_numeric(df[columns.amount_col], errors='coerce').to_numpy(dtype=float)
+    fees = df[columns.fee_col].fillna(0).to_numpy(dtype=float) if columns.fee_col else np.zeros(len(df))
+    n = len(table)
+    has_sender = from_codes >= 0
+    codes = np.concatenate([from_codes[has_sender], to_codes[to_codes >= 0]])
+    values = np.concatenate([amounts[has_sender], amounts[to_codes >= 0]])
+    smallest, largest = np.full(n, np.nan), np.full(n, np.nan)
+    np.fmin.at(smallest, codes, values)
+    np.fmax.at(largest, codes, values)
+    return np.bincount(from_codes[has_sender], weights=fees[has_sender], minlength=n), smallest, largest
+
+
+def build_rollups(df):
+    """Aggregate ``df`` into :class:`Rollups`."""
+    extremes = _wallet_extremes(df) or (np.empty(0), np.empty(0), np.empty(0))
+    wallet_days = _wallet_day_cube(df)
+    return Rollups(_rollup_cube(df), _empty_wallet_days() if wallet_days is None else wallet_days, *extremes)
+
+
+def extend_rollups(rollups, new_rows):
+    """Fold ``new_rows`` (sharing address codes) into ``rollups``.
+
+    Only the new rows are aggregated; merging costs time proportional to
+    the size of the cubes and the wallet count, not to the ledger length.
+    """
+    if new_rows.empty:
+        return rollups
+    cube = pd.concat([rollups.cube, _rollup_cube(new_rows)]).groupby(level=['hour', 'type'], sort=True).agg(ROLLUP_AGGREGATIONS)
+    extremes = _wallet_extremes(new_rows)
+    if extremes is None:
+        return rollups._replace(cube=cube)
+    wallet_days = pd.concat([rollups.wallet_days, _wallet_day_cube(new_rows)]).groupby(
+        level=['code', 'day'], sort=True).agg(WALLET_ROLLUP_AGGREGATIONS)
+    fees, smallest, largest = extremes
+    grow = len(fees) - len(rollups.wallet_fees)
+    return Rollups(
+        cube=cube,
+        wallet_days=wallet_days,
+        wallet_fees=np.pad(rollups.wallet_fees, (0, grow)) + fees,
+        wallet_min=np.fmin(np.pad(rollups.wallet_min, (0, grow), constant_values=np.nan), smallest),
+        wallet_max=np.fmax(np.pad(rollups.wallet_max, (0, grow), constant_values=np.nan), largest),
+    )
+
+
+def _cube_slice(rollups, start=None, end=None):
+    """Cube rows with hours in [``start``, ``end``); all rows, undated included, without bounds."""
+    cube = rollups.cube
+    if start is None and end is None:
+        return cube
+    hours = cube.index.get_level_values('hour').to_numpy()
+    lo = np.searchsorted(hours, pd.Timestamp(start).as_unit('ns').value if start is not None else NO_TIME + 1)
+    hi = np.searchsorted(hours, pd.Timestamp(end).as_unit('ns').value) if end is not None else len(hours)
+    return cube.iloc[lo:hi]
+
+
+def rollup_totals(rollups, start=None, end=None):
+    """count, amount, fees, min and max over [``start``, ``end``) as a Series."""
+    cube = _cube_slice(rollups, start, end)
+    return cube.agg(ROLLUP_AGGREGATIONS).reindex(list(ROLLUP_AGGREGATIONS))
+
+
+def rollup_by_type(rollups, start=None, end=None):
+    """Per-type totals over [``start``, ``end``), largest volume first."""
+    cube = _cube_slice(rollups, start, end)
+    by_type = cube.groupby(level='type').agg(ROLLUP_AGGREGATIONS)
+    return by_type.sort_values('amount', ascending=False)
+
+
+def rollup_series(rollups, granularity, start=None, end=None):
+    """Totals per ``granularity`` bucket ('hour', 'day' or 'week') and type over dated rows in range."""
+    cube = _cube_slice(rollups, start, end).reset_index()
+    cube = cube[cube['hour'] != NO_TIME]
+    period = pd.to_datetime(cube['hour'])
+    if granularity == 'day':
+        period = period.dt.floor('D')
+    elif granularity == 'week':
+        period = period.dt.to_period('W-SUN').dt.start_time
+    return cube.assign(period=period).groupby(['period', 'type']).agg(ROLLUP_AGGREGATIONS)
+
+
+def wallet_rollup(rollups, code, start=None, end=None):
+    """Totals of wallet ``code`` over the days in [``start``, ``end``) as a Series.
+
+    ``count``, ``sent``, ``received``, ``fees``, ``min`` and ``max`` as in
+    :attr:`Rollups.wallet_days`. Bounds are widened to whole days; undated
+    rows only count without bounds.
+    """
+    wallet_days = rollups.wallet_days
+    codes = wallet_days.index.get_level_values('code').to_numpy()
+    lo, hi = np.searchsorted(codes, code), np.searchsorted(codes, code, side='right')
+    days = wallet_days.iloc[lo:hi]
+    if start is not None or end is not None:
+        day = days.index.get_level_values('day').to_numpy()
+        first = pd.Timestamp(start).floor('D').as_unit('ns').value if start is not None else NO_TIME + 1
+        last = pd.Timestamp(end).ceil('D').as_unit('ns').value if end is not None else None
+        days = days.iloc[np.searchsorted(day, first):np.searchsorted(day, last) if last is not None else len(day)]
+    totals = days.agg(WALLET_ROLLUP_AGGREGATIONS).reindex(list(WALLET_ROLLUP_AGGREGATIONS))
+    return totals.fillna({'count': 0, 'sent': 0.0, 'received': 0.0, 'fees': 0.0})
+
+
+class BalanceHistory(NamedTuple):
+    """Running balance of every wallet after each transaction that touched it.
+
+    Postings (one per side of a transaction) are grouped by address code in
+    ledger order: wallet ``c`` owns ``positions[offsets[c]:offsets[c + 1]]``,
+    the ledger rows it appears in, and ``balances`` holds its balance right
+    after each of them. ``row_times`` is the running maximum of the ledger
+    timestamps (int64 ns), so a point in time maps to the last row recorded
+    by then; it is None when the ledger has no timestamp column.
+    """
+    offsets: np.ndarray
+    positions: np.ndarray
+    balances: np.ndarray
+    row_times: Optional[np.ndarray]
+
+
+NO_TIME = np.iinfo(np.int64).min  # NaT as int64
+
+
+def _ledger_postings(df, start=0):
+    """Signed postings of ``df`` sorted by (address code, row); rows are numbered from ``start``."""
+    columns = resolve_columns(df)
+    from_codes, to_codes, table = ledger_address_codes(df, columns.from_col, columns.to_col)
+    amounts = pd.to_numeric(df[columns.amount_col], errors='coerce').fillna(0).to_numpy(dtype=float)
+    rows = np.arange(start, start + len(df), dtype=np.int64)
+
+    codes = np.concatenate([from_codes, to_codes]).astype(np.int64)
+    positions = np.concatenate([rows, rows])
+    signed = np.concatenate([-amounts, amounts])
+    keep = codes >= 0
+    codes, positions, signed = codes[keep], positions[keep], signed[keep]
+    order = np.lexsort((positions, codes))
+    return codes[order], positions[order], signed[order], len(table)
+
+
+def _row_times(df, previous=NO_TIME):
+    """Running maximum of the timestamp column as int64 ns, continuing from ``previous``."""
+    time_col = resolve_columns(df).time_col
+    if time_col is None or not pd.api.types.is_datetime64_any_dtype(df[time_col]):
+        return None
+    # NaT is the smallest int64, so undated rows inherit the previous row's time
+    times = df[time_col].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return np.maximum.accumulate(np.append(np.int64(previous), times))[1:]
+
+
+def _group_cumsum(codes, signed, counts):
+    """Cumulative sum of ``signed`` restarting at every group of equal (sorted) ``codes``."""
+    totals = np.cumsum(signed)
+    starts = np.concatenate([[0], np.cumsum(counts)])[:-1]
+    before = np.concatenate([[0.0], totals])[starts]
+    return totals - before[codes]
+
+
+def build_balance_history(df):
+    """Index the running balance of every wallet in ``df`` (see :class:`BalanceHistory`)."""
+    columns = resolve_columns(df)
+    if not all([columns.from_col, columns.to_col, columns.amount_col]):
+        return BalanceHistory(np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), None)
+    codes, positions, signed, n = _ledger_postings(df)
+    counts = np.bincount(codes, minlength=n)
+    return BalanceHistory(
+        offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        positions=positions,
+        balances=_group_cumsum(codes, signed, counts),
+        row_times=_row_times(df),
+    )
+
+
+def extend_balance_history(history, new_rows, start):
+    """Fold ``new_rows`` (ledger rows ``start`` onwards, sharing address codes) into ``history``.
+
+    Only the new postings are sorted and summed; each is placed at the end of
+    its wallet's run, continuing from that wallet's last balance.
+    """
+    columns = resolve_columns(new_rows)
+    if new_rows.empty or not all([columns.from_col, columns.to_col, columns.amount_col]):
+        return history
+    codes, positions, signed, n = _ledger_postings(new_rows, start)
+    old_n = len(history.offsets) - 1
+    ends = np.append(history.offsets, np.full(n - old_n, history.offsets[-1]))
+    counts = np.bincount(codes, minlength=n)
+
+    has_old = np.diff(ends) > 0
+    last = np.zeros(n)
+    last[has_old] = history.balances[ends[1:][has_old] - 1]
+    balances = _group_cumsum(codes, signed, counts) + last[codes]
+
+    insert_at = ends[codes + 1]
+    row_times = None
+    if history.row_times is not None:
+        previous = history.row_times[-1] if len(history.row_times) else NO_TIME
+        row_times = _row_times(new_rows, previous)
+        row_times = np.concatenate([history.row_times, row_times]) if row_times is not None else None
+    return BalanceHistory(
+        offsets=ends + np.concatenate([[0], np.cumsum(counts)]),
+        positions=np.insert(history.positions, insert_at, positions),
+        balances=np.insert(history.balances, insert_at, balances),
+        row_times=row_times,
+    )
+
+
+def ledger_position_at(history, when):
+    """Last ledger row recorded at or before ``when`` (-1 if none), by binary search."""
+    when = pd.Timestamp(when).as_unit('ns').value
+    return int(np.searchsorted(history.row_times, when, side='right')) - 1
+
+
+def wallet_balance_at(history, code, position):
+    """Balance of wallet ``code`` after ledger row ``position``, by binary search.
+
+    Returns (balance, number of the wallet's transactions up to that row).
+    """
+    if code < 0 or code + 1 >= len(history.offsets):
+        return 0.0, 0
+    lo, hi = history.offsets[code], history.offsets[code + 1]
+    count = int(np.searchsorted(history.positions[lo:hi], position, side='right'))
+    return (float(history.balances[lo + count - 1]) if count else 0.0), count
+
+
+def wallet_balance_history(history, code):
+    """(ledger rows, balance after each) for every transaction of wallet ``code``."""
+    lo, hi = history.offsets[code], history.offsets[code + 1]
+    return history.positions[lo:hi], history.balances[lo:hi]
+
+
+class AddressIndex(NamedTuple):
+    """Prefix search over full addresses plus an inverted index of their ledger rows.
+
+    ``keys`` are the lower-cased UTF-8 addresses in sorted order and
+    ``codes`` their address codes, so a prefix is the range between two
+    binary searches. The rows (ascending) where address ``c`` is the sender
+    are ``sent_rows[sent_offsets[c]:sent_offsets[c + 1]]``; likewise for
+    ``received_*``.
+    """
+    keys: np.ndarray
+    codes: np.ndarray
+    sent_offsets: np.ndarray
+    sent_rows: np.ndarray
+    received_offsets: np.ndarray
+    received_rows: np.ndarray
+
+
+def _address_keys(addresses):
+    lowered = pd.Index(addresses, dtype=object).str.lower().to_numpy(dtype=str)
+    return np.char.encode(lowered, 'utf-8') if len(lowered) else np.empty(0, dtype='S1')
+
+
+def _rows_by_code(codes, n, start=0):
+    """(offsets, rows) grouping row numbers ``start + i`` by ``codes[i]``; missing codes are skipped."""
+    rows = np.flatnonzero(codes >= 0)
+    grouped = codes[rows].astype(np.int64)
+    order = np.argsort(grouped, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(grouped, minlength=n))]).astype(np.int64)
+    return offsets, rows[order] + start
+
+
+def _extend_rows(offsets, rows, new_offsets, new_rows):
+    """Append grouped ``new_rows`` after each code's existing rows; codes may have grown."""
+    n = len(new_offsets) - 1
+    ends = np.append(offsets, np.full(n - (len(offsets) - 1), offsets[-1]))
+    insert_at = np.repeat(ends[1:], np.diff(new_offsets))
+    return ends + new_offsets, np.insert(rows, insert_at, new_rows)
+
+
+def build_address_index(df):
+    """Index every address of ``df`` for prefix search and row lookup (see :class:`AddressIndex`)."""
+    columns = resolve_columns(df)
+    if not (columns.from_col and columns.to_col):
+        empty = np.empty(0, dtype=np.int64)
+        return AddressIndex(np.empty(0, dtype='S1'), empty, np.zeros(1, dtype=np.int64), empty,
+                            np.zeros(1, dtype=np.int64), empty)
+    from_codes, to_codes, table = ledger_address_codes(df, columns.from_col, columns.to_col)
+    keys = _address_keys(table)
+    order = np.argsort(keys, kind='stable')
+    sent_offsets, sent_rows = _rows_by_code(from_codes, len(table))
+    received_offsets, received_rows = _rows_by_code(to_codes, len(table))
+    return AddressIndex(keys[order], order.astype(np.int64), sent_offsets, sent_rows, received_offsets, received_rows)
+
+
+def extend_address_index(index, new_rows, start):
+    """Fold ``new_rows`` (ledger rows ``start`` onwards, sharing address codes) into ``index``.
+
+    New addresses are merged into the sorted keys and new rows appended to
+    each address's lists; nothing already indexed is re-sorted.
+    """
+    columns = resolve_columns(new_rows)
+    if new_rows.empty or not (columns.from_col and columns.to_col):
+        return index
+    from_codes, to_codes, table = ledger_address_codes(new_rows, columns.from_col, columns.to_col)
+    old_n = len(index.codes)
+    keys, codes = index.keys, index.codes
+    if len(table) > old_n:
+        added = _address_keys(table[old_n:])
+        order = np.argsort(added, kind='stable')
+        added = added[order]
+        width = max(keys.dtype.itemsize, added.dtype.itemsize)
+        keys = keys.astype(f'S{width}')
+        at = np.searchsorted(keys, added, side='right')
+        keys = np.insert(keys, at, added)
+        codes = np.insert(codes, at, order + old_n)
+
+    sent = _extend_rows(index.sent_offsets, index.sent_rows, *_rows_by_code(from_codes, len(table), start))
+    received = _extend_rows(index.received_offsets, index.received_rows, *_rows_by_code(to_codes, len(table), start))
+    return AddressIndex(keys, codes, *sent, *received)
+
+
+def search_addresses(index, addresses, prefix, limit=20):
+    """Addresses starting with ``prefix`` (case-insensitive) in sorted order.
+
+    Returns (up to ``limit`` full addresses, total number of matches).
+    """
+    key = prefix.strip().lower().encode('utf-8')
+    if not key:
+        return [], 0
+    lo = int(np.searchsorted(index.keys, key, side='left'))
+    hi = int(np.searchsorted(index.keys, key + b'\xff', side='left'))  # 0xff never occurs in UTF-8
+    return list(addresses.take(index.codes[lo:min(hi, lo + limit)])), hi - lo
+
+
+def wallet_rows(index, code):
+    """Ledger rows (ascending) where address ``code`` is the sender, and where it is the recipient."""
+    return (
+        index.sent_rows[index.sent_offsets[code]:index.sent_offsets[code + 1]],
+        index.received_rows[index.received_offsets[code]:index.received_offsets[code + 1]],
+    )
+
+
+INTEGRITY_CHUNK_ROWS = 1 << 16  # rows per digest chunk; the chain links chunk digests
+INTEGRITY_POOL_ROWS = 1_000_000  # ledgers at least this long are digested in a process pool
+INTEGRITY_WORKERS = int(os.environ.get("INTEGRITY_WORKERS", 0)) or os.cpu_count() or 1
+_DIGEST_SIZE = 16
+
+
+class IntegrityReport(NamedTuple):
+    """Integrity checks over the rows of one ledger version.
+
+    ``digests`` holds a BLAKE2b digest of each row's canonical content and
+    ``chain`` the running chain value after each complete chunk of
+    :data:`INTEGRITY_CHUNK_ROWS` digests; ``root`` also covers the last,
+    partial chunk, so it commits to every row in order. ``hashes`` are the
+    sorted transaction hashes seen so far and ``last_time`` the latest
+    timestamp, which let appended rows be checked on their own.
+
+    Findings are counted with the ledger position of the first one:
+    repeated transaction hashes, rows whose content differs from the
+    previously verified ledger (edited, removed or reordered history) and
+    timestamps earlier than a previous row's. Late timestamps are only
+    reported, as hand-entered rows are often backdated; the other two fail
+    verification. A mismatch is evidence that history was rewritten, so it
+    stays reported even if the rows are later changed back, and is kept in
+    the store manifest across restarts.
+    """
+    digests: np.ndarray
+    chain: np.ndarray
+    root: bytes
+    hashes: Optional[np.ndarray]
+    last_time: int
+    duplicates: int
+    first_duplicate: Optional[int]
+    out_of_order: int
+    first_out_of_order: Optional[int]
+    first_mismatch: Optional[int]
+
+    @property
+    def verified(self):
+        return not self.duplicates and self.first_mismatch is None
+
+
+def _arrow_values(series):
+    values = pa.array(series, from_pandas=True)
+    return values.combine_chunks() if isinstance(values, pa.ChunkedArray) else values
+
+
+def _canonical_rows(df):
+    """The schema columns of ``df`` as a string-typed Arrow table, one canonical form per row."""
+    columns = resolve_columns(df)
+    arrays = []
+    if columns.time_col and pd.api.types.is_datetime64_any_dtype(df[columns.time_col]):
+        times = df[columns.time_col].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        arrays.append(pa.array(times, mask=times == NO_TIME))
+    for col in (columns.from_col, columns.to_col, columns.amount_col, columns.fee_col, columns.type_col, columns.hash_col):
+        if col is None:
+            continue
+        values = _arrow_values(df[col])
+        if pa.types.is_dictionary(values.type):
+            values = values.dictionary_decode()
+        if pa.types.is_fixed_size_binary(values.type):
+            values = values.cast(pa.binary())
+        values = values.cast(pa.string())
+        # One row per line, whatever the text holds
+        arrays.append(pc.replace_substring(pc.replace_substring(values, '\\', '\\\\'), '\n', '\\n'))
+    return pa.table(arrays, names=[str(i) for i in range(len(arrays))])
+
+
+def _digest_rows(table):
+    """BLAKE2b digests of each row of a canonical table, concatenated."""
+    out = io.BytesIO()
+    pa_csv.write_csv(table, out, pa_csv.WriteOptions(include_header=False))
+    lines = out.getvalue().split(b'\n')[:table.num_rows]
+    return b''.join(hashlib.blake2b(line, digest_size=_DIGEST_SIZE).digest() for line in lines)
+
+
+def row_digests(df, workers=None):
+    """Per-row content digests of ``df`` as an (n, 16) uint8 array.
+
+    Ledgers of at least :data:`INTEGRITY_POOL_ROWS` rows are split into
+    chunks digested by ``workers`` processes (default ``INTEGRITY_WORKERS``).
+    """
+    table = _canonical_rows(df)
+    workers = workers or INTEGRITY_WORKERS
+    chunks = [table.slice(i, INTEGRITY_CHUNK_ROWS) for i in range(0, table.num_rows, INTEGRITY_CHUNK_ROWS)]
+    if table.num_rows >= INTEGRITY_POOL_ROWS and workers > 1 and len(chunks) > 1:
+        # Spawned workers, as forking the multi-threaded server is unsafe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+            parts = list(pool.map(_digest_rows, chunks))
+    else:
+        parts = [_digest_rows(chunk) for chunk in chunks]
+    return np.frombuffer(b''.join(parts), dtype=np.uint8).reshape(-1, _DIGEST_SIZE)
+
+
+def _chain(digests, start=0, previous=None):
+    """Chain values after each complete chunk of ``digests`` from chunk ``start``, and the root."""
+    value = previous if previous is not None else bytes(_DIGEST_SIZE)
+    chain = []
+    for i in range(start * INTEGRITY_CHUNK_ROWS, len(digests), INTEGRITY_CHUNK_ROWS):
+        chunk = digests[i:i + INTEGRITY_CHUNK_ROWS]
+        link = hashlib.blake2b(value + hashlib.blake2b(chunk.tobytes(), digest_size=_DIGEST_SIZE).digest(),
+                               digest_size=_DIGEST_SIZE).digest()
+        if len(chunk) < INTEGRITY_CHUNK_ROWS:
+            return np.frombuffer(b''.join(chain), dtype=np.uint8).reshape(-1, _DIGEST_SIZE), link
+        chain.append(link)
+        value = link
+    return np.frombuffer(b''.join(chain), dtype=np.uint8).reshape(-1, _DIGEST_SIZE), value
+
+
+def _hash_keys(df):
+    """Non-null transaction hashes of ``df`` as a bytes array with their row offsets."""
+    hash_col = resolve_columns(df).hash_col
+    if hash_col is None:
+        return None, None
+    values = _arrow_values(df[hash_col])
+    rows = np.flatnonzero(values.is_valid().to_numpy(zero_copy_only=False))
+    values = values.drop_null()
+    if pa.types.is_fixed_size_binary(values.type) and len(values):
+        width = values.type.byte_width
+        return np.frombuffer(values.buffers()[1], dtype=f'S{width}', count=len(values), offset=values.offset * width), rows
+    keys = [k if isinstance(k, bytes) else str(k).encode('utf-8') for k in values.to_pylist()]
+    return np.array(keys, dtype=bytes), rows
+
+
+def _first(mask, start):
+    hits = np.flatnonzero(mask)
+    return (len(hits), int(hits[0]) + start) if len(hits) else (0, None)
+
+
+def _order_checks(df, previous):
+    """(violations, first violating offset, latest time) for the timestamps of ``df`` after ``previous``."""
+    time_col = resolve_columns(df).time_col
+    if time_col is None or not pd.api.types.is_datetime64_any_dtype(df[time_col]) or SOURCE_COLUMN in df:
+        # Merged ledgers interleave their sources; each source is checked on its own
+        return 0, None, previous
+    times = df[time_col].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    latest = np.maximum.accumulate(np.append(np.int64(previous), times))
+    count, first = _first((times != NO_TIME) & (times < latest[:-1]), 0)
+    return count, first, int(latest[-1])
+
+
+def _combine(first, other):
+    return other if first is None else first if other is None else min(first, other)
+
+
+def build_integrity(df, previous=None, workers=None):
+    """Verify every row of ``df``; rows differing from the ``previous`` report are mismatches."""
+    digests = row_digests(df, workers)
+    chain, root = _chain(digests)
+
+    hashes, rows = _hash_keys(df)
+    duplicates, first_duplicate = 0, None
+    if hashes is not None:
+        order = np.argsort(hashes, kind='stable')
+        repeated = np.zeros(len(hashes), dtype=bool)
+        repeated[order[1:]] = hashes[order[1:]] == hashes[order[:-1]]
+        duplicates, first = _first(repeated, 0)
+        first_duplicate = int(rows[first]) if first is not None else None
+        hashes = hashes[order]
+    out_of_order, first_out_of_order, last_time = _order_checks(df, NO_TIME)
+
+    first_mismatch = None
+    if previous is not None:
+        shared = min(len(previous.digests), len(digests))
+        differs = np.flatnonzero((previous.digests[:shared] != digests[:shared]).any(axis=1))
+        if len(differs):
+            first_mismatch = int(differs[0])
+        elif len(digests) < len(previous.digests):
+            first_mismatch = len(digests)  # rows were removed from the end
+        first_mismatch = _combine(previous.first_mismatch, first_mismatch)
+    return IntegrityReport(digests, chain, root, hashes, last_time, duplicates, first_duplicate,
+                           out_of_order, first_out_of_order, first_mismatch)
+
+
+def extend_integrity(report, new_rows, start):
+    """Verify ``new_rows`` (ledger rows ``start`` onwards) on top of ``report`` without revisiting older rows."""
+    if new_rows.empty:
+        return report
+    digests = np.concatenate([report.digests, row_digests(new_rows)])
+    complete = len(report.chain)
+    chain, root = _chain(digests, complete, report.chain[-1].tobytes() if complete else None)
+
+    hashes, rows = _hash_keys(new_rows)
+    duplicates, first_duplicate = report.duplicates, report.first_duplicate
+    if hashes is not None and report.hashes is not None:
+        order = np.argsort(hashes, kind='stable')
+        ranked = hashes[order]
+        repeated = np.zeros(len(hashes), dtype=bool)
+        repeated[order[1:]] = ranked[1:] == ranked[:-1]
+        at = np.searchsorted(report.hashes, hashes)
+        repeated |= report.hashes[np.minimum(at, len(report.hashes) - 1)] == hashes if len(report.hashes) else False
+        count, first = _first(repeated, 0)
+        duplicates += count
+        first_duplicate = _combine(first_duplicate, int(rows[first]) + start if first is not None else None)
+        dtype = np.promote_types(report.hashes.dtype, ranked.dtype)
+        hashes = np.insert(report.hashes.astype(dtype), np.searchsorted(report.hashes, ranked), ranked.astype(dtype))
+    else:
+        hashes = report.hashes
+    count, first, last_time = _order_checks(new_rows, report.last_time)
+
+    return IntegrityReport(
+        digests=digests,
+        chain=np.concatenate([report.chain, chain]),
+        root=root,
+        hashes=hashes,
+        last_time=last_time,
+        duplicates=duplicates,
+        first_duplicate=first_duplicate,
+        out_of_order=report.out_of_order + count,
+        first_out_of_order=_combine(report.first_out_of_order, first + start if first is not None else None),
+        first_mismatch=report.first_mismatch,
+    )
+
+
+def _stored_mismatch(summary, report):
+    """First row of ``report`` (to chunk precision) not covered by the stored ``summary``, or None."""
+    if summary['root'] == report.root.hex():
+        return None
+    stored, chain = summary['chain'], [link.tobytes().hex() for link in report.chain]
+    for i, (old, new) in enumerate(zip(stored, chain)):
+        if old != new:
+            return i * INTEGRITY_CHUNK_ROWS
+    return min(len(stored), len(chain)) * INTEGRITY_CHUNK_ROWS
+
+
+def integrity_summary(report):
+    """JSON-ready summary of ``report``, as kept in the store manifest."""
+    return {
+        'rows': len(report.digests),
+        'root': report.root.hex(),
+        'chain': [link.tobytes().hex() for link in report.chain],
+        'duplicates': report.duplicates,
+        'first_duplicate': report.first_duplicate,
+        'out_of_order': report.out_of_order,
+        'first_out_of_order': report.first_out_of_order,
+        'first_mismatch': report.first_mismatch,
+    }
+
+
+ANOMALY_ALPHA = 0.02  # weight of each transfer in the network-wide amount EWMA
+ANOMALY_WALLET_ALPHA = 0.2  # weight of each transfer in its sender's amount EWMA
+ANOMALY_Z = 4.0  # standard deviations above the mean log amount that make a transfer outsized
+ANOMALY_MIN_STD = 0.25  # floor on the log-amount standard deviation, so near-constant amounts don't flag noise
+ANOMALY_WARMUP = 20  # network-wide transfers seen before scores count
+ANOMALY_WALLET_WARMUP = 5  # transfers a sender needs before its own scores count
+BURST_WINDOW = 600  # seconds: decay time of each sender's send-rate counter
+BURST_COUNT = 10.0  # rate counter value (about this many sends within the window) that starts a burst
+NEW_WALLET_SEEN = 3  # recipients seen in fewer earlier transactions are new
+NEW_WALLET_Z = 2.0  # lower outsized threshold for transfers to new wallets
+ANOMALY_KINDS = {
+    'outsized': 'Outsized transfer',
+    'unusual_for_sender': 'Unusual for sender',
+    'burst': 'Burst from sender',
+    'new_recipient': 'Large transfer to new wallet',
+}
+
+
+class AnomalyStats(NamedTuple):
+    """Rolling statistics after the last scored transaction.
+
+    Amounts are scored as ``log1p(amount)``, on which transfer sizes are
+    roughly normal. ``count``, ``mean`` and ``mean_sq`` are the network-wide
+    EWMA of log amounts (the variance is ``mean_sq - mean ** 2``); the arrays
+    hold the same per sender, indexed by address code, along with each
+    wallet's decaying send-rate counter, the time it was last advanced and
+    the number of ledger sides (sender or recipient) the wallet appeared on.
+    """
+    count: int
+    mean: float
+    mean_sq: float
+    sends: np.ndarray  # transfers with an amount sent by the wallet
+    wallet_mean: np.ndarray
+    wallet_mean_sq: np.ndarray
+    rate: np.ndarray
+    rate_time: np.ndarray  # int64 ns, NO_TIME until a dated send
+    seen: np.ndarray
+
+
+class Anomalies(NamedTuple):
+    """Flagged transactions of a ledger and the statistics to score appended rows with.
+
+    ``alerts`` has one row per flagged transaction in ledger order: its
+    ledger ``row``, network-wide ``score`` and ``sender_score`` (z-scores of
+    the log amount against the transfers before it), the sender's ``rate``
+    counter, and one boolean column per kind in :data:`ANOMALY_KINDS`.
+    """
+    stats: AnomalyStats
+    alerts: pd.DataFrame
+
+
+ALERT_COLUMNS = ['row', 'score', 'sender_score', 'rate', *ANOMALY_KINDS]
+
+
+def _anomaly_inputs(df):
+    """(sender codes, recipient codes, address count, log amounts, int64 times) of ``df``."""
+    columns = resolve_columns(df)
+    from_codes, to_codes, table = ledger_address_codes(df, columns.from_col, columns.to_col)
+    amounts = pd.to_numeric(df[columns.amount_col], errors='coerce').to_numpy(dtype=float)
+    times = np.full(len(df), NO_TIME, dtype=np.int64)
+    if columns.time_col and pd.api.types.is_datetime64_any_dtype(df[columns.time_col]):
+        times = df[columns.time_col].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return (from_codes.astype(np.int64), to_codes.astype(np.int64), len(table),
+            np.log1p(np.clip(amounts, 0, None)), times)
+
+
+def _affine_scan(scale, shift):
+    """Running ``m = scale[i] * m + shift[i]`` from ``m = 0``, by log-depth doubling.
+
+    A zero ``scale`` restarts the recurrence, so independent runs share one pass.
+    """
+    scale, shift = scale.astype(float), shift.astype(float)
+    step = 1
+    while step < len(scale) and scale[step:].any():
+        shift[step:] = scale[step:] * shift[:-step] + shift[step:]
+        scale[step:] = scale[step:] * scale[:-step]
+        step *= 2
+    return shift
+
+
+def _run_starts(starts):
+    """Index of the first element of each element's run."""
+    return np.maximum.accumulate(np.where(starts, np.arange(len(starts)), 0))
+
+
+def _ewma_runs(x, starts, alpha):
+    """EWMA count, mean and mean square of ``x`` up to each element, per run; NaN values are skipped."""
+    valid = ~np.isnan(x)
+    totals = np.cumsum(valid)
+    first = _run_starts(starts)
+    count = totals - (totals - valid)[first]
+    restart = valid & (count == 1) | starts
+    values = np.where(valid, x, 0.0)
+    scale = np.where(restart, 0.0, np.where(valid, 1 - alpha, 1.0))
+    weight = np.where(restart, 1.0, alpha)
+    step = np.where(valid, weight, 0.0)
+    return count, _affine_scan(scale, step * values), _affine_scan(scale, step * values ** 2)
+
+
+def _before(values, starts, fill):
+    """``values`` of the previous element in the same run (``fill`` at run starts)."""
+    shifted = np.concatenate([[fill], values[:-1]]).astype(np.result_type(values, type(fill)))
+    shifted[starts] = fill
+    return shifted
+
+
+def _zscores(x, count, mean, mean_sq, warmup):
+    std = np.maximum(np.sqrt(np.maximum(mean_sq - mean ** 2, 0)), ANOMALY_MIN_STD)
+    return np.where(count >= warmup, (x - mean) / std, np.nan)
+
+
+def _alerts(start, score, sender_score, rate, flags):
+    """Alert frame of the flagged rows; ``flags`` maps each kind to a boolean array."""
+    flagged = np.logical_or.reduce(list(flags.values()))
+    rows = np.flatnonzero(flagged)
+    return pd.DataFrame({
+        'row': rows + start,
+        'score': score[rows],
+        'sender_score': sender_score[rows],
+        'rate': rate[rows],
+        **{kind: mask[rows] for kind, mask in flags.items()},
+    })
+
+
+def _empty_anomalies(n=0):
+    return Anomalies(
+        AnomalyStats(0, 0.0, 0.0, np.zeros(n, dtype=np.int64), np.zeros(n), np.zeros(n), np.zeros(n),
+                     np.full(n, NO_TIME, dtype=np.int64), np.zeros(n, dtype=np.int64)),
+        pd.DataFrame({col: pd.Series(dtype=bool if col in ANOMALY_KINDS else float) for col in ALERT_COLUMNS})
+        .astype({'row': np.int64}),
+    )
+
+
+def build_anomalies(df):
+    """Score every transaction of ``df`` against those before it, vectorized over the whole ledger.
+
+    This is the batch form of :func:`extend_anomalies`: the EWMA and rate
+    recurrences of all wallets run as one log-depth scan over the rows
+    sorted by sender, rather than transaction by transaction.
+    """
+    columns = resolve_columns(df)
+    if not all([columns.from_col, columns.to_col, columns.amount_col]):
+        return _empty_anomalies()
+    from_codes, to_codes, n, x, times = _anomaly_inputs(df)
+    rows = len(df)
+
+    # Network-wide, scored against the statistics before each row
+    starts = np.zeros(rows, dtype=bool)
+    starts[:1] = True
+    count, mean, mean_sq = _ewma_runs(x, starts, ANOMALY_ALPHA)
+    score = _zscores(x, _before(count, starts, 0), _before(mean, starts, 0.0), _before(mean_sq, starts, 0.0),
+                     ANOMALY_WARMUP)
+    stats = AnomalyStats(
+        int(count[-1]) if rows else 0, float(mean[-1]) if rows else 0.0, float(mean_sq[-1]) if rows else 0.0,
+        *_empty_anomalies(n).stats[3:],
+    )
+
+    # Per sender: rows in (sender, row) order, one run per wallet
+    order = np.argsort(from_codes, kind='stable')
+    order = order[from_codes[order] >= 0]
+    codes, xs, ts = from_codes[order], x[order], times[order]
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = codes[1:] != codes[:-1]
+    w_count, w_mean, w_mean_sq = _ewma_runs(xs, starts, ANOMALY_WALLET_ALPHA)
+    sender_score = np.full(rows, np.nan)
+    sender_score[order] = _zscores(xs, _before(w_count, starts, 0), _before(w_mean, starts, 0.0),
+                                   _before(w_mean_sq, starts, 0.0), ANOMALY_WALLET_WARMUP)
+
+    # Send rate decays with the time since the wallet's previous dated send
+    dated = ts != NO_TIME
+    last_dated = np.maximum.accumulate(np.where(dated, np.arange(len(order)), -1))
+    previous = _before(last_dated, starts, -1)
+    previous[previous < _run_starts(starts)] = -1
+    elapsed = np.where(dated & (previous >= 0), ts - ts[np.maximum(previous, 0)], 0)
+    decay = np.exp(-np.maximum(elapsed, 0) / (BURST_WINDOW * 1e9))
+    sorted_rate = _affine_scan(np.where(starts, 0.0, decay), np.ones(len(order)))
+    rate = np.zeros(rows)
+    rate[order] = sorted_rate
+
+    if len(order):
+        ends = np.append(np.flatnonzero(starts)[1:] - 1, len(order) - 1)
+        wallets = codes[ends]
+        stats.sends[wallets] = w_count[ends]
+        stats.wallet_mean[wallets] = w_mean[ends]
+        stats.wallet_mean_sq[wallets] = w_mean_sq[ends]
+        stats.rate[wallets] = sorted_rate[ends]
+        has_time = last_dated[ends] >= _run_starts(starts)[ends]
+        stats.rate_time[wallets[has_time]] = ts[last_dated[ends][has_time]]
+
+    # Recipient's appearances on earlier rows, from both sides sorted by (wallet, row)
+    sides = np.concatenate([from_codes, to_codes])
+    posting = np.flatnonzero(sides >= 0)
+    posting = posting[np.lexsort((posting % max(rows, 1), sides[posting]))]
+    wallet, row = sides[posting], posting % max(rows, 1)
+    new_wallet = np.ones(len(posting), dtype=bool)
+    new_wallet[1:] = wallet[1:] != wallet[:-1]
+    new_row = new_wallet.copy()
+    new_row[1:] |= row[1:] != row[:-1]
+    earlier = _run_starts(new_row) - _run_starts(new_wallet)
+    seen_before = np.zeros(rows, dtype=np.int64)
+    recipient = posting >= rows
+    seen_before[row[recipient]] = earlier[recipient]
+    stats.seen[:] = np.bincount(wallet, minlength=n)
+
+    flags = {
+        'outsized': score >= ANOMALY_Z,
+        'unusual_for_sender': sender_score >= ANOMALY_Z,
+        'burst': (rate >= BURST_COUNT) & (rate - 1 < BURST_COUNT),
+        'new_recipient': (to_codes >= 0) & (seen_before < NEW_WALLET_SEEN) & (score >= NEW_WALLET_Z),
+    }
+    return Anomalies(stats, _alerts(0, score, sender_score, rate, flags))
+
+
+def _grow(values, n, fill):
+    return np.concatenate([values, np.full(n - len(values), fill, dtype=values.dtype)])
+
+
+def extend_anomalies(anomalies, new_rows, start):
+    """Score ``new_rows`` (ledger rows ``start`` onwards, sharing address codes) one at a time.
+
+    Each transaction is scored against the running statistics and then
+    folded into them in O(1), so appended rows never revisit history.
+    """
+    columns = resolve_columns(new_rows)
+    if new_rows.empty or not all([columns.from_col, columns.to_col, columns.amount_col]):
+        return anomalies
+    from_codes, to_codes, n, x, times = _anomaly_inputs(new_rows)
+    old = anomalies.stats
+    sends, wallet_mean, wallet_mean_sq = _grow(old.sends, n, 0), _grow(old.wallet_mean, n, 0.0), _grow(old.wallet_mean_sq, n, 0.0)
+    rate, rate_time, seen = _grow(old.rate, n, 0.0), _grow(old.rate_time, n, NO_TIME), _grow(old.seen, n, 0)
+    count, mean, mean_sq = old.count, old.mean, old.mean_sq
+
+    rows = len(new_rows)
+    score, sender_score, rates = np.full(rows, np.nan), np.full(rows, np.nan), np.zeros(rows)
+    seen_before = np.zeros(rows, dtype=np.int64)
+    window = BURST_WINDOW * 1e9
+    for i in range(rows):
+        sender, recipient, value, when = from_codes[i], to_codes[i], x[i], times[i]
+        has_value = not np.isnan(value)
+        if has_value:
+            if count >= ANOMALY_WARMUP:
+                score[i] = (value - mean) / max(np.sqrt(max(mean_sq - mean * mean, 0)), ANOMALY_MIN_STD)
+            if count == 0:
+                mean, mean_sq = value, value * value
+            else:
+                mean += ANOMALY_ALPHA * (value - mean)
+                mean_sq += ANOMALY_ALPHA * (value * value - mean_sq)
+            count += 1
+        if sender >= 0:
+            if has_value:
+                w_mean, w_mean_sq = wallet_mean[sender], wallet_mean_sq[sender]
+                if sends[sender] >= ANOMALY_WALLET_WARMUP:
+                    std = max(np.sqrt(max(w_mean_sq - w_mean * w_mean, 0)), ANOMALY_MIN_STD)
+                    sender_score[i] = (value - w_mean) / std
+                if sends[sender] == 0:
+                    wallet_mean[sender], wallet_mean_sq[sender] = value, value * value
+                else:
+                    wallet_mean[sender] = w_mean + ANOMALY_WALLET_ALPHA * (value - w_mean)
+                    wallet_mean_sq[sender] = w_mean_sq + ANOMALY_WALLET_ALPHA * (value * value - w_mean_sq)
+                sends[sender] += 1
+            decay = 1.0
+            if when != NO_TIME:
+                if rate_time[sender] != NO_TIME:
+                    decay = np.exp(-max(when - rate_time[sender], 0) / window)
+                rate_time[sender] = when
+            rate[sender] = rate[sender] * decay + 1
+            rates[i] = rate[sender]
+            seen[sender] += 1
+        if recipient >= 0:
+            seen_before[i] = seen[recipient] - (recipient == sender)
+            seen[recipient] += 1
+
+    flags = {
+        'outsized': score >= ANOMALY_Z,
+        'unusual_for_sender': sender_score >= ANOMALY_Z,
+        'burst': (rates >= BURST_COUNT) & (rates - 1 < BURST_COUNT),
+        'new_recipient': (to_codes >= 0) & (seen_before < NEW_WALLET_SEEN) & (score >= NEW_WALLET_Z),
+    }
+    alerts = _alerts(start, score, sender_score, rates, flags)
+    return Anomalies(
+        AnomalyStats(count, float(mean), float(mean_sq), sends, wallet_mean, wallet_mean_sq, rate, rate_time, seen),
+        pd.concat([anomalies.alerts, alerts], ignore_index=True) if not alerts.empty else anomalies.alerts,
+    )
+
+
+def _fixed_width_hashes(col):
+    """Store equal-length ASCII hashes as fixed-width binary, anything else as Arrow strings."""
+    if isinstance(col.dtype, pd.ArrowDtype) and pa.types.is_fixed_size_binary(col.dtype.pyarrow_dtype):
+        return col
+    text = pa.array(col.astype(object).where(col.notna(), None).to_numpy(dtype=object), type=pa.string())
+    raw = text.cast(pa.binary())
+    lengths = pc.binary_length(raw)
+    bounds = pc.min_max(lengths)
+    width = bounds['max'].as_py()
+    if (
+        width
+        and bounds['min'].as_py() == width
+        and pc.all(pc.equal(pc.utf8_length(text), lengths)).as_py()
+    ):
+        return pd.Series(raw.cast(pa.binary(width)), index=col.index, dtype=pd.ArrowDtype(pa.binary(width)))
+    return pd.Series(text, index=col.index, dtype=pd.ArrowDtype(pa.string()))
+
+
+def ledger_addresses(df):
+    """The shared address table of a compact ledger, or None."""
+    from_col = resolve_columns(df).from_col
+    if from_col and isinstance(df[from_col].dtype, pd.CategoricalDtype):
+        return df[from_col].cat.categories
+    return None
+
+
+def compact_ledger(df, addresses=None):
+    """Convert an ingested ledger into the compact in-memory model.
+
+    Sender and recipient columns become categoricals over one shared address
+    table (extending ``addresses`` when given, so codes stay stable across
+    appends), amount and fee columns become float64, hashes become
+    fixed-width binary and other text columns become categoricals or Arrow
+    strings.
+    """
+    df = df.copy(deep=False)
+    from_col, to_col, amount_col, fee_col, hash_col = resolve_columns(df)[:5]
+
+    if from_col and to_col:
+        senders = _wallet_keys(df[from_col])
+        recipients = _wallet_keys(df[to_col])
+        seen = pd.unique(np.column_stack([
+            senders.to_numpy(dtype=object), recipients.to_numpy(dtype=object),
+        ]).ravel())
+        seen = pd.Index(seen[pd.notna(seen)])
+        if addresses is not None:
+            seen = addresses.append(seen.difference(addresses, sort=False))
+        dtype = pd.CategoricalDtype(seen)
+        df[from_col] = senders.astype(dtype)
+        df[to_col] = recipients.astype(dtype)
+
+    for col in (amount_col, fee_col):
+        if col:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+    if hash_col:
+        df[hash_col] = _fixed_width_hashes(df[hash_col])
+
+    handled = {from_col, to_col, amount_col, fee_col, hash_col}
+    for col in df.columns:
+        if col in handled or not (df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype)):
+            continue
+        if isinstance(df[col].dtype, (pd.CategoricalDtype, pd.ArrowDtype)):
+            continue
+        if df[col].nunique() <= len(df) // 2:
+            df[col] = df[col].astype('category')
+        else:
+            df[col] = pd.Series(pa.array(df[col].astype(object).where(df[col].notna(), None).to_numpy(dtype=object), type=pa.string()),
+                                index=df.index, dtype=pd.ArrowDtype(pa.string()))
+    return df
+
+
+def concat_ledgers(df, new_rows):
+    """Append ``new_rows`` to ``df``, keeping the compact column types of ``df``.
+
+    Categories are unified so categorical columns stay categorical, whatever
+    form :func:`compact_ledger` picked for the (often few) new rows.
+    """
+    df = df.copy(deep=False)
+    new_rows = new_rows.copy(deep=False)
+    for col in df.columns.intersection(new_rows.columns):
+        old, new = df[col], new_rows[col]
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            if not isinstance(new.dtype, pd.CategoricalDtype):
+                new = new.astype(object).where(new.notna(), None).astype('category')
+            if not old.cat.categories.equals(new.cat.categories):
+                categories = old.cat.categories.append(new.cat.categories.difference(old.cat.categories, sort=False))
+                df[col] = old.cat.set_categories(categories)
+                new = new.cat.set_categories(categories)
+            new_rows[col] = new
+        elif isinstance(old.dtype, pd.ArrowDtype) and isinstance(new.dtype, pd.CategoricalDtype):
+            new_rows[col] = _arrow_strings(new)
+        elif isinstance(old.dtype, pd.ArrowDtype) and isinstance(new.dtype, pd.ArrowDtype) and old.dtype != new.dtype:
+            # Hashes of another width: fall back to strings, as compact_ledger would for the whole ledger
+            df[col], new_rows[col] = _arrow_strings(old), _arrow_strings(new)
+    return pd.concat([df, new_rows], ignore_index=True)
+
+
+def _arrow_strings(col):
+    values = _arrow_values(col)
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    if pa.types.is_fixed_size_binary(values.type):
+        values = values.cast(pa.binary())
+    return pd.Series(values.cast(pa.string()), index=col.index, dtype=pd.ArrowDtype(pa.string()))
+
+
+def truncate_addresses(values, front=6, back=4):
+    """Vectorized :func:`truncate_address` over a Series, Index or array of strings.
+
+    Returns an object array with "—" for missing values.
+    """
+    if isinstance(values, (pd.Series, pd.Index)):
+        values = values.astype(object).where(values.notna(), None)
+    arr = pa.array(np.asarray(values, dtype=object), type=pa.string(), from_pandas=True)
+    truncated = pc.binary_join_element_wise(
+        pc.utf8_slice_codeunits(arr, 0, front),
+        pc.utf8_slice_codeunits(arr, -back),
+        '...',
+    )
+    out = pc.if_else(pc.less_equal(pc.utf8_length(arr), front + back), arr, truncated)
+    return pc.fill_null(out, '—').to_numpy(zero_copy_only=False)
+
+
+def truncate_column(col, address_labels=None):
+    """Truncated display strings for an address or hash column of the compact ledger.
+
+    ``address_labels`` are the pre-truncated entries of the shared address
+    table (with a trailing "—" for missing), used for categorical columns.
+    """
+    if isinstance(col.dtype, pd.CategoricalDtype) and address_labels is not None \
+            and len(col.cat.categories) == len(address_labels) - 1:
+        return pd.Series(address_labels[col.cat.codes.to_numpy()], index=col.index)
+    if isinstance(col.dtype, pd.ArrowDtype) and pa.types.is_fixed_size_binary(col.dtype.pyarrow_dtype):
+        col = col.astype(pd.ArrowDtype(pa.binary())).astype(pd.ArrowDtype(pa.string()))
+    return pd.Series(truncate_addresses(col.astype(str).where(col.notna())), index=col.index)
+
+
+def _first_per_bucket(mask, bucket):
+    """Index of the first True of ``mask`` within each run of equal (sorted) ``bucket`` ids."""
+    hits = np.flatnonzero(mask)
+    ids = bucket[hits]
+    return hits[np.r_[True, ids[1:] != ids[:-1]]] if len(hits) else hits
+
+
+def downsample_minmax(values, budget=CHART_POINT_BUDGET):
+    """Positions of a shape-preserving subsample of ``values`` with at most ``budget`` points.
+
+    The series is cut into ``budget // 2`` equal buckets and each keeps its
+    lowest and highest point, in order, so spikes and dips survive.
+    Missing values are skipped.
+    """
+    positions = np.flatnonzero(~np.isnan(values))
+    if len(positions) <= budget:
+        return positions
+    values = values[positions]
+    bucket = np.arange(len(values)) * (budget // 2) // len(values)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    sizes = np.diff(np.r_[starts, len(values)])
+    lows = _first_per_bucket(values == np.repeat(np.minimum.reduceat(values, starts), sizes), bucket)
+    highs = _first_per_bucket(values == np.repeat(np.maximum.reduceat(values, starts), sizes), bucket)
+    return positions[np.union1d(lows, highs)]
+
+
+def histogram_bins(values, bins=HISTOGRAM_BINS, scheme='fixed'):
+    """Pre-binned histogram of ``values`` as a DataFrame of ``left``, ``right`` and ``count``.
+
+    ``scheme`` is 'fixed' for equal-width bins or 'quantile' for bins holding
+    roughly equal numbers of values (ties can merge quantile edges).
+    Missing values are skipped.
+    """
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return pd.DataFrame({'left': [], 'right': [], 'count': []})
+    edges = np.histogram_bin_edges(values, bins=bins)
+    if scheme == 'quantile':
+        quantiles = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)))
+        edges = quantiles if len(quantiles) > 1 else edges
+    counts, edges = np.histogram(values, bins=edges)
+    return pd.DataFrame({'left': edges[:-1], 'right': edges[1:], 'count': counts})
+
+
+class LedgerViews(NamedTuple):
+    """Display-ready data derived from one ledger version."""
+    columns: LedgerColumns
+    address_labels: np.ndarray
+    top_wallets: pd.DataFrame
+    volume: pd.DataFrame  # downsampled (index, amount) series, at most CHART_POINT_BUDGET rows
+    histograms: dict  # bin scheme -> pre-binned amount histogram
+
+
+def build_views(ledger):
+    """Display-ready :class:`LedgerViews` of ``ledger``."""
+    df, wallets = ledger.df, ledger.wallets
+    columns = resolve_columns(df)
+    addresses = ledger_addresses(df)
+    address_labels = np.append(
+        truncate_addresses(addresses) if addresses is not None else np.array([], dtype=object), '—'
+    ).astype(object)
+
+    top_wallets = leaderboard_frame(ledger.leaders, addresses, 'balance', 4) if addresses is not None else wallets
+
+    amount_col = columns.amount_col
+    amounts = df[amount_col].to_numpy(dtype=float, na_value=np.nan) if amount_col else np.empty(0)
+    kept = downsample_minmax(amounts)
+    volume = pd.DataFrame({'index': kept, amount_col: amounts[kept]}) if amount_col else pd.DataFrame()
+    histograms = {scheme: histogram_bins(amounts, scheme=scheme) for scheme in ('fixed', 'quantile')}
+
+    return LedgerViews(
+        columns=columns,
+        address_labels=address_labels,
+        top_wallets=top_wallets,
+        volume=volume,
+        histograms=histograms,
+    )
+
+
+class FlowGraph(NamedTuple):
+    """Aggregated wallet-to-wallet flows of one ledger version as a CSR adjacency.
+
+    The edges leaving address code ``c`` are ``offsets[c]:offsets[c + 1]``:
+    recipients ``targets``, total amount ``weights`` and number of
+    transactions ``counts``. ``sources`` repeats each edge's sender.
+    ``component`` labels every address with its weakly connected component
+    (the smallest address code in it) and ``rank`` is its PageRank.
+    """
+    offsets: np.ndarray
+    sources: np.ndarray
+    targets: np.ndarray
+    weights: np.ndarray
+    counts: np.ndarray
+    component: np.ndarray
+    rank: np.ndarray
+
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-9  # L1 change between iterations
+PAGERANK_MAX_ITER = 100
+
+
+def connected_components(n, sources, targets):
+    """Weakly connected component label (smallest member) for ``n`` nodes.
+
+    Vectorized union-find: every round hooks each edge's larger root under
+    the smaller one, then compresses paths by pointer jumping.
+    """
+    labels = np.arange(n, dtype=np.int64)
+    while True:
+        a, b = labels[sources], labels[targets]
+        hooked = labels.copy()
+        np.minimum.at(hooked, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def pagerank(n, sources, targets, weights, damping=PAGERANK_DAMPING):
+    """Amount-weighted PageRank by power iteration; dangling wallets spread their rank evenly.
+
+    Edges that carry no positive amount (zero or negative transfers) pass no
+    rank, so a wallet whose transfers net to zero or less counts as dangling.
+    """
+    if n == 0:
+        return np.empty(0)
+    positive = weights > 0
+    sources, targets, weights = sources[positive], targets[positive], weights[positive]
+    out_weight = np.bincount(sources, weights=weights, minlength=n)
+    dangling = out_weight == 0
+    share = weights / out_weight[sources]
+    rank = np.full(n, 1.0 / n)
+    for _ in range(PAGERANK_MAX_ITER):
+        spread = np.bincount(targets, weights=rank[sources] * share, minlength=n)
+        updated = (1 - damping) / n + damping * (spread + rank[dangling].sum() / n)
+        converged = np.abs(updated - rank).sum() < PAGERANK_TOLERANCE
+        rank = updated
+        if converged:
+            break
+    return rank
+
+
+def build_flow_graph(df):
+    """Aggregate the ledger's sender→recipient transfers into a :class:`FlowGraph`."""
+    columns = resolve_columns(df)
+    if not all([columns.from_col, columns.to_col, columns.amount_col]):
+        empty = np.empty(0, dtype=np.int64)
+        return FlowGraph(np.zeros(1, dtype=np.int64), empty, empty, np.empty(0), empty, empty, np.empty(0))
+    from_codes, to_codes, table = ledger_address_codes(df, columns.from_col, columns.to_col)
+    amounts = pd.to_numeric(df[columns.amount_col], errors='coerce').fillna(0).to_numpy(dtype=float)
+    n = len(table)
+
+    # Mints and burns have only one side and are not flows between wallets
+    keep = (from_codes >= 0) & (to_codes >= 0)
+    pairs = from_codes[keep].astype(np.int64) * n + to_codes[keep]
+    edges, inverse = np.unique(pairs, return_inverse=True)  # sorted by sender, then recipient
+    sources, targets = edges // n, edges % n
+    weights = np.bincount(inverse, weights=amounts[keep], minlength=len(edges))
+    return FlowGraph(
+        offsets=np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=n))]).astype(np.int64),
+        sources=sources,
+        targets=targets,
+        weights=weights,
+        counts=np.bincount(inverse, minlength=len(edges)),
+        component=connected_components(n, sources, targets),
+        rank=pagerank(n, sources, targets, weights),
+    )
+
+
+def top_flows(graph, addresses, limit=20):
+    """The ``limit`` largest sender→recipient flows as a DataFrame."""
+    top = np.argsort(-graph.weights, kind='stable')[:limit]
+    return pd.DataFrame({
+        'from': addresses.take(graph.sources[top]),
+        'to': addresses.take(graph.targets[top]),
+        'amount': graph.weights[top],
+        'transactions': graph.counts[top],
+    })
+
+
+def component_sizes(graph, active):
+    """Sizes of the connected components among ``active`` address codes, largest first."""
+    sizes = np.bincount(graph.component[active], minlength=len(graph.component))
+    return np.sort(sizes[sizes > 0])[::-1]
+
+
+def ledger_rows(ledger, views, positions):
+    """Display frame for the ledger rows at ``positions``, with addresses and hashes truncated."""
+    rows = ledger.df.iloc[positions]
+    return rows.assign(**{
+        col: truncate_column(rows[col], views.address_labels)
+        for col in views.columns.display_cols
+    })
+
+
+class LedgerFilter(NamedTuple):
+    """Transaction filter; ``None`` / empty fields do not filter.
+
+    ``start`` and ``end`` bound the timestamp as [start, end), the amount
+    bounds are inclusive, ``wallet`` is an address code matching either
+    side and ``types`` the accepted transaction types.
+    """
+    start: Optional[pd.Timestamp] = None
+    end: Optional[pd.Timestamp] = None
+    wallet: Optional[int] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    types: Tuple[str, ...] = ()
+
+    def __bool__(self):
+        return any(value is not None and value != () for value in self)
+
+
+class FilterIndex(NamedTuple):
+    """Per-version indexes that resolve a :class:`LedgerFilter` without scanning the ledger.
+
+    ``time_order`` / ``amount_order`` are row positions sorted by timestamp
+    and amount, and ``times`` / ``amounts`` the values in that order;
+    ``row_times`` / ``row_amounts`` are the same values in ledger order.
+    Undated rows sort first (as ``NO_TIME``) and missing amounts last, so
+    neither falls in a bounded range. ``type_bitmaps`` holds a packed
+    bitmap of each type's rows and ``type_counts`` its number of rows.
+    """
+    time_order: Optional[np.ndarray]
+    times: Optional[np.ndarray]
+    row_times: Optional[np.ndarray]
+    amount_order: Optional[np.ndarray]
+    amounts: Optional[np.ndarray]
+    row_amounts: Optional[np.ndarray]
+    type_bitmaps: dict
+    type_counts: dict
+
+
+def build_filter_index(df):
+    """Sort orders and type bitmaps of ``df`` (see :class:`FilterIndex`)."""
+    columns = resolve_columns(df)
+    time_order = times = row_times = amount_order = amounts = row_amounts = None
+    if columns.time_col and pd.api.types.is_datetime64_any_dtype(df[columns.time_col]):
+        row_times = df[columns.time_col].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        time_order = np.argsort(row_times, kind='stable')
+        times = row_times[time_order]
+    if columns.amount_col:
+        row_amounts = df[columns.amount_col].to_numpy(dtype=float, na_value=np.nan)
+        amount_order = np.argsort(row_amounts, kind='stable')
+        amounts = row_amounts[amount_order]
+
+    type_bitmaps, type_counts = {}, {}
+    if columns.type_col:
+        codes, types = pd.factorize(df[columns.type_col])
+        for i, name in enumerate(types):
+            rows = codes == i
+            type_bitmaps[str(name)] = np.packbits(rows)
+            type_counts[str(name)] = int(rows.sum())
+    return FilterIndex(time_order, times, row_times, amount_order, amounts, row_amounts, type_bitmaps, type_counts)
+
+
+def _bitmap_test(bitmap, rows):
+    return ((bitmap[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+
+def _merge_rows(sent, received):
+    # Both are sorted; a self-transfer appears in each
+    rows = np.sort(np.concatenate([sent, received]), kind='stable')
+    return rows[np.r_[True, rows[1:] != rows[:-1]]] if len(rows) else rows
+
+
+def resolve_filter(ledger, index, flt):
+    """Ascending row positions matching ``flt``.
+
+    Each predicate's match count is known from its index alone (two binary
+    searches for a range, a stored count for a type, the row list for a
+    wallet), so only the most selective one is materialized; the others
+    are then checked on those candidate rows only.
+    """
+    n = len(ledger.df)
+    predicates = []  # (candidate count, materialize, check)
+
+    if (flt.start is not None or flt.end is not None) and index.times is not None:
+        lo_t = pd.Timestamp(flt.start).as_unit('ns').value if flt.start is not None else NO_TIME + 1
+        hi_t = pd.Timestamp(flt.end).as_unit('ns').value if flt.end is not None else np.iinfo(np.int64).max
+        lo, hi = np.searchsorted(index.times, [lo_t, hi_t])
+        predicates.append((
+            hi - lo,
+            lambda lo=lo, hi=hi: np.sort(index.time_order[lo:hi]),
+            lambda rows: (index.row_times[rows] >= lo_t) & (index.row_times[rows] < hi_t),
+        ))
+
+    if (flt.min_amount is not None or flt.max_amount is not None) and index.amounts is not None:
+        low = flt.min_amount if flt.min_amount is not None else -np.inf
+        high = flt.max_amount if flt.max_amount is not None else np.inf
+        lo = np.searchsorted(index.amounts, low, side='left')
+        hi = np.searchsorted(index.amounts, high, side='right')
+        predicates.append((
+            hi - lo,
+            lambda lo=lo, hi=hi: np.sort(index.amount_order[lo:hi]),
+            lambda rows: (index.row_amounts[rows] >= low) & (index.row_amounts[rows] <= high),
+        ))
+
+    if flt.types:
+        present = [t for t in flt.types if t in index.type_bitmaps]
+        bitmap = np.zeros((n + 7) // 8, dtype=np.uint8)
+        for name in present:
+            bitmap |= index.type_bitmaps[name]
+        predicates.append((
+            sum(index.type_counts[t] for t in present),
+            lambda: np.flatnonzero(np.unpackbits(bitmap, count=n)),
+            lambda rows: _bitmap_test(bitmap, rows),
+        ))
+
+    if flt.wallet is not None:
+        sent, received = wallet_rows(ledger.index, flt.wallet)
+        columns = resolve_columns(ledger.df)
+        from_codes, to_codes, _ = ledger_address_codes(ledger.df, columns.from_col, columns.to_col)
+        predicates.append((
+            len(sent) + len(received),
+            lambda: _merge_rows(sent, received),
+            lambda rows: (from_codes[rows] == flt.wallet) | (to_codes[rows] == flt.wallet),
+        ))
+
+    if not predicates:
+        return np.arange(n)
+    predicates.sort(key=lambda p: p[0])
+    rows = predicates[0][1]()
+    for _, _, check in predicates[1:]:
+        if not len(rows):
+            break
+        rows = rows[check(rows)]
+    return rows
+
+
+class FilteredLedger(NamedTuple):
+    """The rows of one ledger version matching a filter, with views and totals over them."""
+    filter: LedgerFilter
+    rows: np.ndarray
+    views: LedgerViews
+    tx_count: int
+    total_volume: float
+    wallet_count: int
+
+
+def filtered_ledger(ledger, views, index, flt):
+    """Resolve ``flt`` against ``ledger`` and derive ``views`` and totals for the matching rows."""
+    rows = resolve_filter(ledger, index, flt)
+    df = ledger.df
+    columns = views.columns
+    amounts = index.row_amounts[rows] if index.row_amounts is not None else np.empty(0)
+    kept = downsample_minmax(amounts)
+    views = views._replace(
+        volume=pd.DataFrame({'index': rows[kept], columns.amount_col: amounts[kept]}) if columns.amount_col else pd.DataFrame(),
+        histograms={scheme: histogram_bins(amounts, scheme=scheme) for scheme in ('fixed', 'quantile')},
+    )
+    wallet_count = 0
+    if columns.from_col and columns.to_col:
+        from_codes, to_codes, _ = ledger_address_codes(df, columns.from_col, columns.to_col)
+        involved = np.concatenate([from_codes[rows], to_codes[rows]])
+        wallet_count = int(np.count_nonzero(np.bincount(involved[involved >= 0], minlength=1)))
+    return FilteredLedger(flt, rows, views, len(rows), float(np.nansum(amounts)), wallet_count)
+
+
+def sort_positions(col, ascending):
+    """Positions that sort ``col`` in the given direction, nulls last."""
+    values = pa.array(col, from_pandas=True)
+    order = pc.array_sort_indices(values, order='ascending' if ascending else 'descending', null_placement='at_end')
+    return order.to_numpy()
+
+
+def counterparty_totals(ledger, code, limit=20):
+    """Top counterparties of address ``code`` by total amount exchanged."""
+    df = ledger.df
+    columns = resolve_columns(df)
+    from_codes, to_codes, table = ledger_address_codes(df, columns.from_col, columns.to_col)
+    sent, received = wallet_rows(ledger.index, code)
+    amounts = df[columns.amount_col].to_numpy(dtype=float, na_value=0.0)
+
+    flows = pd.DataFrame({
+        'code': np.concatenate([to_codes[sent], from_codes[received]]),
+        'sent to': np.concatenate([amounts[sent], np.zeros(len(received))]),
+        'received from': np.concatenate([np.zeros(len(sent)), amounts[received]]),
+    })
+    flows = flows[flows['code'] >= 0].groupby('code').agg(
+        **{'sent to': ('sent to', 'sum'), 'received from': ('received from', 'sum'), 'transactions': ('code', 'size')}
+    )
+    flows = flows.loc[(flows['sent to'] + flows['received from']).nlargest(limit).index]
+    flows.index = pd.Index(table.take(flows.index), name='counterparty')
+    return flows
+
+
+class _ChainedStream(io.RawIOBase):
+    """Read-only binary stream over several file-like objects in turn."""
+
+    def __init__(self, *parts):
+        self._parts = list(parts)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._parts:
+            data = self._parts[0].read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+            self._parts.pop(0)
+        return 0
+
+
+class _HashingStream:
+    """Wraps a binary stream, hashing and counting every byte read through it."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._hash = hashlib.sha256()
+        self.count = 0
+        self.last = b''
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        if data:
+            self._hash.update(data)
+            self.count += len(data)
+            self.last = data[-1:]
+        return data
+
+    def digest(self):
+        return self._hash.copy().digest()
+
+
+class _CompleteRows:
+    """Wraps a binary CSV stream, holding back a last row that is still being written.
+
+    A last line without a line break and with fewer fields than the header
+    is left out, so the sync's high-water mark stops before it and the row
+    is read once it is complete. A complete last row without a line break,
+    as spreadsheets export, passes through.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._ready = b''
+        self._pending = b''  # bytes after the last line break read so far
+        self._fields = None  # header field count
+        self._done = False
+
+    def read(self, size=-1):
+        while not self._done and (size < 0 or len(self._ready) < size):
+            data = self._stream.read(CSV_BLOCK_SIZE if size < 0 else max(size, 1))
+            if not data:
+                self._done = True
+                if not self._partial(self._pending):
+                    self._ready += self._pending
+                self._pending = b''
+                break
+            data = self._pending + data
+            cut = data.rfind(b'\n') + 1
+            self._ready, self._pending = self._ready + data[:cut], data[cut:]
+            if self._fields is None and cut:
+                header = self._ready.split(b'\n', 1)[0].decode('utf-8-sig', 'replace')
+                self._fields = len(next(csv.reader([header]), []))
+        if size < 0:
+            size = len(self._ready)
+        data, self._ready = self._ready[:size], self._ready[size:]
+        return data
+
+    def _partial(self, line):
+        # Quoted values may span lines, so only unquoted lines are judged
+        return bool(line) and self._fields is not None and b'"' not in line \
+            and line.count(b',') + 1 < self._fields
+
+
+REJECT_COLUMNS = ['row', 'reason', 'record']
+
+
+class LedgerChunk(NamedTuple):
+    """Result of ingesting a ledger CSV (or an appended part of one)."""
+    df: pd.DataFrame  # valid rows, typed, with schema column names
+    rejects: pd.DataFrame  # malformed rows: sheet row number, reason, raw record
+    header: str  # raw header line
+    records: int  # CSV records read, valid or not
+
+
+def _empty_column(kind):
+    return {'timestamp': pa.timestamp('s'), 'amount': pa.float64()}.get(kind, pa.string())
+
+
+def _parse_iso(values):
+    """General ISO 8601 parse of the values no fixed format matched; null where that fails too."""
+    parsed = pd.to_datetime(values.to_pandas(), format='ISO8601', errors='coerce', utc=True)
+    return pa.Array.from_pandas(parsed.dt.tz_localize(None).astype('datetime64[s]'))
+
+
+def _parse_timestamps(values):
+    """Parse trimmed timestamp strings to ``timestamp[s]``, in UTC where an offset is given."""
+    values = pc.replace_substring_regex(values, _FRACTION_PATTERN, r'\1')
+    parsed = [
+        pc.cast(pc.strptime(values, format=f, unit='s', error_is_null=True), pa.timestamp('s'))
+        for f in TIMESTAMP_FORMATS
+    ]
+    typed = pc.coalesce(*parsed)
+    left = pc.and_(pc.is_null(typed), pc.not_equal(values, ''))
+    if pc.any(left).as_py():
+        rows = pc.indices_nonzero(left)
+        fallback = pa.nulls(len(values), pa.timestamp('s'))
+        fallback = pc.replace_with_mask(fallback, left, _parse_iso(values.take(rows)))
+        typed = pc.coalesce(typed, fallback)
+    return typed
+
+
+def _convert_batch(batch, mapping):
+    """Validate and type one batch of string columns.
+
+    Returns (typed, reasons, raw record text, unparsed): ``unparsed`` flags
+    rows kept without their optional timestamp because it didn't parse.
+    """
+    typed, reason = {}, pa.nulls(batch.num_rows, pa.string())
+    unparsed = pa.array(np.zeros(batch.num_rows, dtype=bool))
+    columns = [pc.utf8_trim_whitespace(col) for col in batch.columns]
+    for (raw, name, kind), values in zip(mapping, columns):
+        empty = pc.equal(values, '')
+        if kind == 'amount':
+            cleaned = pc.replace_substring(values, ',', '')
+            valid = pc.match_substring_regex(cleaned, _NUMBER_PATTERN)
+            typed[name] = pc.cast(pc.if_else(valid, cleaned, pa.scalar(None, pa.string())), pa.float64())
+            required = any(f.name == name and f.required for f in LEDGER_SCHEMA)
+            bad = pc.invert(valid) if required else pc.and_(pc.invert(valid), pc.invert(empty))
+            problem = f"missing or invalid {name}" if required else f"invalid {name}"
+        elif kind == 'timestamp':
+            # Optional: a timestamp that doesn't parse is dropped, not the transfer
+            typed[name] = _parse_timestamps(values)
+            unparsed = pc.or_(unparsed, pc.and_(pc.is_null(typed[name]), pc.invert(empty)))
+            continue
+        else:
+            typed[name] = pc.if_else(empty, pa.scalar(None, pa.string()), values)
+            continue
+        reason = pc.coalesce(reason, pc.if_else(bad, pa.scalar(problem), pa.scalar(None, pa.string())))
+
+    # Blank spreadsheet rows (all cells empty) are dropped without a report
+    blank = pc.equal(pc.binary_join_element_wise(*columns, ''), '')
+    reason = pc.if_else(blank, pa.scalar('blank'), reason)
+    record = pc.binary_join_element_wise(*batch.columns, ',')
+    return typed, reason, record, unparsed
+
+
+def read_ledger_csv(source, header=None, first_row=2):
+    """Stream a ledger CSV into typed columns following :data:`LEDGER_SCHEMA`.
+
+    ``source`` is a binary file-like object, parsed block by block with
+    pyarrow so the body is never held as one string. When ``header`` is
+    given the stream holds only data rows (an appended tail); otherwise its
+    first line is the header. Malformed rows (wrong column count, missing or
+    non-numeric amount or fee) are left out of the ledger and listed in the
+    reject report instead of being coerced. The timestamp is optional: one
+    that no format parses leaves the row in the ledger with a null timestamp
+    and a logged warning. ``first_row`` is the sheet row number of the first
+    data record, used in the report and the warning.
+    """
+    reader = io.BufferedReader(_ChainedStream(source), CSV_BLOCK_SIZE)
+    if header is None:
+        header = reader.readline().decode('utf-8-sig').rstrip('\r\n')
+    names = next(csv.reader([header]), []) if header else []
+    mapping = map_ledger_columns(names)
+
+    schema = pa.schema([(name, _empty_column(kind)) for _, name, kind in mapping])
+    if not reader.peek(1):
+        return LedgerChunk(schema.empty_table().to_pandas(), pd.DataFrame(columns=REJECT_COLUMNS), header, 0)
+
+    skipped, rejects = [], []
+
+    def on_invalid_row(row):
+        skipped.append(row.number)
+        rejects.append((row.number, f"expected {row.expected_columns} columns, found {row.actual_columns}", row.text))
+        return 'skip'
+
+    column_names = [f"c{i}" for i in range(len(mapping))]
+    batches, parsed = [], 0
+    csv_reader = pa_csv.open_csv(
+        reader,
+        read_options=pa_csv.ReadOptions(column_names=column_names, block_size=CSV_BLOCK_SIZE, use_threads=False),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=on_invalid_row),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={c: pa.string() for c in column_names}, strings_can_be_null=False,
+        ),
+    )
+    invalid = []  # (ordinal among well-formed records, reason, record)
+    undated = []  # ordinals of kept records whose timestamp didn't parse
+    for batch in csv_reader:
+        typed, reason, record, unparsed = _convert_batch(batch, mapping)
+        keep = pc.is_null(reason)
+        batches.append(pa.record_batch([typed[name].filter(keep) for name in schema.names], schema=schema))
+        flagged = pc.and_(pc.invert(keep), pc.not_equal(reason, 'blank'))
+        for i in np.flatnonzero(flagged.to_numpy(zero_copy_only=False)):
+            invalid.append((parsed + i + 1, reason[i].as_py(), record[i].as_py()))
+        undated.extend(parsed + 1 + np.flatnonzero(pc.and_(keep, unparsed).to_numpy(zero_copy_only=False)))
+        parsed += batch.num_rows
+
+    # Map well-formed ordinals to record numbers, accounting for skipped records
+    skipped = np.sort(np.array(skipped, dtype=np.int64))
+    shifted = skipped - np.arange(len(skipped))
+
+    def record_number(ordinal):
+        return ordinal + int(np.searchsorted(shifted, ordinal, side='right'))
+
+    for ordinal, reason, record in invalid:
+        rejects.append((record_number(ordinal), reason, record))
+    if undated:
+        rows = ', '.join(str(first_row - 1 + record_number(o)) for o in undated[:5])
+        more = f" and {len(undated) - 5:,} more" if len(undated) > 5 else ""
+        logger.warning("Kept %d ledger row(s) with an unrecognised timestamp as undated: sheet row(s) %s%s",
+                       len(undated), rows, more)
+    rejects.sort(key=lambda r: r[0])
+    report = pd.DataFrame(
+        [(first_row - 1 + number, reason, record) for number, reason, record in rejects],
+        columns=REJECT_COLUMNS,
+    )
+
+    df = pa.Table.from_batches(batches, schema=schema).to_pandas()
+    return LedgerChunk(df, report, header, parsed + len(skipped))
+
+
+class LedgerSnapshot(NamedTuple):
+    """Consistent view of the ledger and everything derived from it."""
+    df: pd.DataFrame
+    wallets: pd.DataFrame
+    tx_count: int
+    total_volume: float
+    version: int
+    rejects: pd.DataFrame  # rows left out of the ledger, see read_ledger_csv
+    history: BalanceHistory  # per-wallet running balances
+    index: AddressIndex  # address search and per-address rows
+    leaders: Leaderboard  # per-wallet totals and top wallets per metric
+    rollups: Rollups  # totals per hour, type and wallet
+    integrity: IntegrityReport  # row digests, chain root and consistency checks
+    anomalies: Anomalies  # flagged transactions and the rolling statistics behind them
+
+
+class LedgerSync:
+    """Folds an append-only ledger CSV into cached results incrementally.
+
+    The high-water mark is the number of CSV bytes already parsed plus a
+    digest of that prefix. When a newer body starts with exactly the same
+    prefix, only the rows after it are parsed and folded into the cached
+    balances and totals. Any other change (edited, deleted or reordered
+    rows, or a new header) triggers a full rebuild. A last row cut short
+    mid-write is left out until a later body completes it. Bodies are
+    consumed as streams; the prefix is spooled (to disk once large) only so
+    a rebuild can replay it.
+
+    Snapshots are never modified once published, so every session can be
+    handed the same object. Stage timings and sync outcomes go to ``metrics``.
+    """
+
+    def __init__(self, store_dir=None, metrics=None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._lock = threading.Lock()
+        self._mark = 0
+        self._digest = None
+        self._header = None
+        self._records = 0
+        self._store_dir = store_dir
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._ready = threading.Event()
+        self.snapshot = None
+        self.base_version = None  # version of the last rebuild; every later snapshot extends its rows
+        self.checked_at = None  # wall-clock time the snapshot was last confirmed current
+        self.last_error = None
+        if store_dir:
+            self._load_store()
+
+    def start(self, fetch, interval=LEDGER_TTL):
+        """Start the background refresher that keeps the snapshot current (idempotent).
+
+        Exactly one fetch is in flight per process. After a failure the next
+        attempt backs off exponentially, with jitter, up to
+        ``REFRESH_BACKOFF_MAX`` seconds; the last good snapshot stays in place.
+        """
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(fetch, interval), name='ledger-refresher', daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self, fetch, interval):
+        failures = 0
+        while True:
+            try:
+                # A partial failure (see MultiLedgerSync) still counts as a sync
+                self.last_error = self._refresh(fetch)
+                self.checked_at = time.time()
+                self.metrics.set_gauge('ledger_last_sync_timestamp_seconds', int(self.checked_at))
+                failures = 0
+                delay = interval
+            except Exception as e:
+                self.last_error = str(e)
+                self.metrics.inc('ledger_sync', outcome='error')
+                failures += 1
+                delay = min(REFRESH_BACKOFF_MAX, REFRESH_BACKOFF_BASE * 2 ** (failures - 1))
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning("Ledger refresh failed (attempt %d, retrying in %.0fs): %s", failures, delay, e)
+            self._ready.set()
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def _refresh(self, fetch):
+        """Fetch once and apply the body; raises if that failed.
+
+        Returns the new :attr:`last_error`: None here, as a single ledger
+        either syncs or fails. :class:`MultiLedgerSync` returns a message
+        when some sources failed but the merged snapshot is still served.
+        """
+        with fetch() as body:
+            if body is not None:
+                self.apply(body)
+            else:
+                self.metrics.inc('ledger_sync', outcome='not_modified')
+        return None
+
+    def request_refresh(self):
+        """Ask the background refresher to fetch now instead of at its next interval."""
+        self._wake.set()
+
+    def wait_ready(self, timeout):
+        """Block until the first fetch attempt has finished or ``timeout`` elapses."""
+        return self._ready.wait(timeout)
+
+    def apply(self, body):
+        """Bring the cached ledger up to date with the CSV ``body`` and return its snapshot.
+
+        ``body`` is a binary file-like object holding the whole published CSV.
+        """
+        with self._lock:
+            stream = _HashingStream(_CompleteRows(body))
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+                # Read (and keep, in case of a rebuild) the part parsed last time
+                remaining = self._mark
+                while remaining > 0:
+                    chunk = stream.read(min(CSV_BLOCK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    spool.write(chunk)
+                    remaining -= len(chunk)
+                prefix_ok = (
+                    self.snapshot is not None
+                    and self._mark > 0
+                    and remaining == 0
+                    and stream.digest() == self._digest
+                )
+                prefix_end = stream.last
+                first = stream.read(CSV_BLOCK_SIZE)
+                if prefix_ok and not first:
+                    self.metrics.inc('ledger_sync', outcome='unchanged')
+                    self.metrics.inc('ledger_download_bytes', stream.count)
+                    return self.snapshot
+
+                spool.seek(0)
+                # The tail must start on a row boundary, otherwise the last row was edited
+                if prefix_ok and (prefix_end in (b'\r', b'\n') or first[:1] in (b'\r', b'\n')):
+                    self._append(_ChainedStream(io.BytesIO(first), stream))
+                    self.metrics.inc('ledger_sync', outcome='append')
+                else:
+                    self._rebuild(_ChainedStream(spool, io.BytesIO(first), stream))
+                    self.metrics.inc('ledger_sync', outcome='rebuild')
+            while stream.read(CSV_BLOCK_SIZE):
+                pass
+            self.metrics.inc('ledger_download_bytes', stream.count)
+            self._mark, self._digest = stream.count, stream.digest()
+            self._save_store()
+            self.metrics.set_gauge('ledger_rows', self.snapshot.tx_count)
+            self.metrics.set_gauge('ledger_wallets', len(self.snapshot.wallets))
+            self.metrics.set_gauge('ledger_version', self.snapshot.version)
+            return self.snapshot
+
+    def _parse(self, source, **kwargs):
+        with self.metrics.timer('parse') as sample:
+            chunk = read_ledger_csv(source, **kwargs)
+            sample['rows'] = chunk.records
+        return chunk
+
+    def _compact(self, df, addresses=None):
+        with self.metrics.timer('compact') as sample:
+            sample['rows'] = len(df)
+            return compact_ledger(df, addresses=addresses)
+
+    def _balances(self, df, leaders=None):
+        """(leaderboard, wallet table) for ``df``, folded into ``leaders`` when given."""
+        with self.metrics.timer('balances') as sample:
+            sample['rows'] = len(df)
+            leaders = build_leaderboard(df) if leaders is None else extend_leaderboard(leaders, df)
+            return leaders, leaderboard_wallets(leaders, ledger_addresses(df))
+
+    def _history(self, df, history=None, start=0):
+        with self.metrics.timer('history') as sample:
+            sample['rows'] = len(df)
+            if history is None:
+                return build_balance_history(df)
+            return extend_balance_history(history, df, start)
+
+    def _rollups(self, df, rollups=None):
+        with self.metrics.timer('rollups') as sample:
+            sample['rows'] = len(df)
+            return build_rollups(df) if rollups is None else extend_rollups(rollups, df)
+
+    def _integrity(self, df, integrity=None, start=0, previous=None):
+        with self.metrics.timer('integrity') as sample:
+            sample['rows'] = len(df)
+            if integrity is None:
+                return build_integrity(df, previous)
+            return extend_integrity(integrity, df, start)
+
+    def _anomalies(self, df, anomalies=None, start=0):
+        with self.metrics.timer('anomalies') as sample:
+            sample['rows'] = len(df)
+            if anomalies is None:
+                return build_anomalies(df)
+            return extend_anomalies(anomalies, df, start)
+
+    def _index(self, df, index=None, start=0):
+        with self.metrics.timer('address_index') as sample:
+            sample['rows'] = len(df)
+            if index is None:
+                return build_address_index(df)
+            return extend_address_index(index, df, start)
+
+    def _rebuild(self, source):
+        chunk = self._parse(source)
+        df = self._compact(chunk.df)
+        self._header, self._records = chunk.header, chunk.records
+        self.snapshot = self._build(df, chunk.rejects, previous=self.snapshot)
+        self.base_version = self.snapshot.version
+
+    def _append(self, source):
+        chunk = self._parse(source, header=self._header, first_row=self._records + 2)
+        self._records += chunk.records
+        if chunk.df.empty and chunk.rejects.empty:
+            return
+        new_rows = self._compact(chunk.df, addresses=ledger_addresses(self.snapshot.df))
+        self.snapshot = self._extend(self.snapshot, new_rows, chunk.rejects)
+
+    def _build(self, df, rejects, previous=None):
+        """A new snapshot version holding the compact ledger ``df``.
+
+        Rows that differ from the ``previous`` snapshot are reported by its integrity checks.
+        """
+        version = self.snapshot.version + 1 if self.snapshot else 1
+        leaders, wallets = self._balances(df)
+        return LedgerSnapshot(
+            df=df,
+            wallets=wallets,
+            tx_count=len(df),
+            total_volume=total_volume(df),
+            version=version,
+            rejects=rejects,
+            history=self._history(df),
+            index=self._index(df),
+            leaders=leaders,
+            rollups=self._rollups(df),
+            integrity=self._integrity(df, previous=previous.integrity if previous is not None else None),
+            anomalies=self._anomalies(df),
+        )
+
+    def _extend(self, old, new_rows, rejects):
+        """The snapshot after ``old`` with the compact ``new_rows`` appended."""
+        leaders, wallets = self._balances(new_rows, old.leaders)
+        return LedgerSnapshot(
+            df=concat_ledgers(old.df, new_rows),
+            wallets=wallets,
+            tx_count=old.tx_count + len(new_rows),
+            total_volume=old.total_volume + total_volume(new_rows),
+            version=old.version + 1,
+            rejects=pd.concat([old.rejects, rejects], ignore_index=True) if not rejects.empty else old.rejects,
+            history=self._history(new_rows, old.history, start=len(old.df)),
+            index=self._index(new_rows, old.index, start=len(old.df)),
+            leaders=leaders,
+            rollups=self._rollups(new_rows, old.rollups),
+            integrity=self._integrity(new_rows, old.integrity, start=len(old.df)),
+            anomalies=self._anomalies(new_rows, old.anomalies, start=len(old.df)),
+        )
+
+    def _load_store(self):
+        stored = load_ledger_store(self._store_dir)
+        if stored is None:
+            return
+        self.snapshot, manifest = stored
+        self.base_version = self.snapshot.version
+        self.checked_at = datetime.fromisoformat(manifest['saved_at']).timestamp()
+        self._mark = manifest['mark']
+        self._digest = bytes.fromhex(manifest['digest'])
+        self._header = manifest['header']
+        self._records = manifest['records']
+
+    def _save_store(self):
+        if not self._store_dir:
+            return
+        try:
+            with self.metrics.timer('store') as sample:
+                sample['rows'] = self.snapshot.tx_count
+                save_ledger_store(self._store_dir, self.snapshot, {
+                    'mark': self._mark,
+                    'digest': self._digest.hex(),
+                    'header': self._header,
+                    'records': self._records,
+                })
+        except Exception as e:
+            logger.warning("Could not save ledger store to %s: %s", self._store_dir, e)
+
+
+def _parquet_safe(df):
+    """Render mixed-type object and fixed-width binary columns as strings.
+
+    pandas cannot read fixed-width binary back from Parquet metadata, so
+    hashes are stored as text and re-encoded by :func:`compact_ledger` on load.
+    """
+    df = df.copy(deep=False)
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.ArrowDtype) and pa.types.is_fixed_size_binary(dtype.pyarrow_dtype):
+            df[col] = df[col].astype(pd.ArrowDtype(pa.binary())).astype(pd.ArrowDtype(pa.string()))
+        elif dtype == object:
+            df[col] = df[col].astype(str).where(df[col].notna())
+    return df
+
+
+def save_ledger_store(store_dir, snapshot, sync_state):
+    """Write ``snapshot`` to ``store_dir`` as Parquet files plus a JSON manifest.
+
+    Files are written to temporary names and renamed into place, with the
+    manifest last, so readers never see a half-written store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    wallets = snapshot.wallets.reset_index()
+    wallets['role'] = wallets['role'].astype(str)
+    files = {
+        'ledger.parquet': _parquet_safe(snapshot.df),
+        'wallets.parquet': wallets,
+        'rejects.parquet': snapshot.rejects.astype({'row': 'int64', 'reason': str, 'record': str}),
+    }
+    for name, frame in files.items():
+        tmp = os.path.join(store_dir, name + '.tmp')
+        frame.to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(store_dir, name))
+
+    manifest = {
+        'format': LEDGER_STORE_FORMAT,
+        'version': snapshot.version,
+        'tx_count': snapshot.tx_count,
+        'total_volume': snapshot.total_volume,
+        'saved_at': datetime.now().isoformat(timespec='seconds'),
+        'integrity': integrity_summary(snapshot.integrity),
+        **sync_state,
+    }
+    tmp = os.path.join(store_dir, 'manifest.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(store_dir, 'manifest.json'))
+
+
+def load_ledger_store(store_dir):
+    """Read a store written by :func:`save_ledger_store`; returns (snapshot, manifest) or None."""
+    try:
+        with open(os.path.join(store_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != LEDGER_STORE_FORMAT:
+            return None
+        df = compact_ledger(pd.read_parquet(os.path.join(store_dir, 'ledger.parquet')))
+        wallets = pd.read_parquet(os.path.join(store_dir, 'wallets.parquet')).set_index('address')
+        rejects = pd.read_parquet(os.path.join(store_dir, 'rejects.parquet'))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable ledger store at %s: %s", store_dir, e)
+        return None
+
+    if len(df) != manifest['tx_count']:
+        logger.warning("Ignoring ledger store at %s: row count does not match manifest", store_dir)
+        return None
+    snapshot = LedgerSnapshot(
+        df=df,
+        wallets=wallets,
+        tx_count=manifest['tx_count'],
+        total_volume=manifest['total_volume'],
+        version=manifest['version'],
+        rejects=rejects,
+        history=build_balance_history(df),
+        index=build_address_index(df),
+        leaders=build_leaderboard(df),
+        rollups=build_rollups(df),
+        integrity=build_integrity(df),
+        anomalies=build_anomalies(df),
+    )
+    if 'integrity' in manifest:
+        # Rows that changed on disk since they were verified
+        mismatch = _stored_mismatch(manifest['integrity'], snapshot.integrity)
+        if mismatch is not None:
+            logger.warning("Ledger store at %s differs from its verified digests from row %d", store_dir, mismatch)
+        # History changes found before the store was saved stay reported, as they do in the running process
+        mismatch = _combine(manifest['integrity'].get('first_mismatch'), mismatch)
+        if mismatch is not None:
+            snapshot = snapshot._replace(integrity=snapshot.integrity._replace(first_mismatch=mismatch))
+    return snapshot, manifest
+
+
+SOURCE_COLUMN = 'Source'  # ledger column naming the source of each row in a merged ledger
+_SOURCE_NAME = re.compile(r'[A-Za-z0-9_.-]+')
+
+
+class LedgerSource(NamedTuple):
+    """One ledger of a multi-ledger dashboard."""
+    name: str
+    url: str
+
+
+def parse_ledger_sources(spec):
+    """Parse ``name=url`` pairs separated by commas (as in ``LEDGER_SOURCES``).
+
+    Names double as store directory names, so they are limited to letters,
+    digits, ``_``, ``.`` and ``-`` and must be unique.
+    """
+    sources = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, sep, url = item.partition('=')
+        name, url = name.strip(), url.strip()
+        if not sep or not url or not _SOURCE_NAME.fullmatch(name) or name in {s.name for s in sources}:
+            raise ValueError(f"Invalid ledger source {item.strip()!r}; expected a unique name=url")
+        sources.append(LedgerSource(name, url))
+    if not sources:
+        raise ValueError("No ledger sources configured")
+    return sources
+
+
+class MultiLedgerSync(LedgerSync):
+    """Keeps several ledgers current and merges them into one snapshot tagged by source.
+
+    Each source has its own :class:`LedgerClient` and :class:`LedgerSync`
+    (with its store under ``store_dir/<name>``), so every source syncs
+    incrementally on its own and :meth:`source_snapshots` gives per-source
+    balances. A refresh fetches all sources concurrently on an asyncio
+    event loop; the blocking HTTP client and parser run in worker threads.
+    A source that fails keeps its last good snapshot and is reported in
+    :attr:`last_error`; only when every source fails is the refresh an error.
+
+    The merged ledger has a :data:`SOURCE_COLUMN` and holds rows in the
+    order they arrived. Rows appended to a source are appended to it and
+    folded into the merged balances, history, index and rollups; sources
+    that did not change are not touched. Only a rebuilt source (edited or
+    removed rows) rebuilds the merged snapshot; rows a source reports as
+    changed history fail the merged integrity checks too, at their merged
+    position.
+    """
+
+    def __init__(self, sources, store_dir=None, metrics=None, client_factory=None):
+        super().__init__(metrics=metrics)
+        if client_factory is None:
+            from cryptocoin.client import LedgerClient
+            client_factory = functools.partial(LedgerClient, metrics=self.metrics)
+        self.sources = list(sources)
+        self._clients = {s.name: client_factory(s.url) for s in self.sources}
+        self._syncs = {
+            s.name: LedgerSync(store_dir=os.path.join(store_dir, s.name) if store_dir else None, metrics=self.metrics)
+            for s in self.sources
+        }
+        self._merged = {}  # source name -> (version, rows, rejects) folded into the merged snapshot
+        self.source_errors = {}  # source name -> last error, for sources whose last refresh failed
+        if any(sync.snapshot is not None for sync in self._syncs.values()):
+            self._merge()
+            self.checked_at = min((sync.checked_at for sync in self._syncs.values() if sync.checked_at is not None),
+                                  default=None)
+
+    def source_snapshots(self):
+        """The current snapshot of each source (None until its first sync), by name."""
+        return {name: sync.snapshot for name, sync in self._syncs.items()}
+
+    def _refresh(self, fetch=None):
+        # ``fetch`` is unused: every source has its own client
+        outcomes = asyncio.run(self._refresh_sources())
+        self.source_errors = {
+            source.name: str(outcome)
+            for source, outcome in zip(self.sources, outcomes) if isinstance(outcome, Exception)
+        }
+        for source, outcome in zip(self.sources, outcomes):
+            self.metrics.inc('ledger_source_sync', source=source.name,
+                             outcome='error' if isinstance(outcome, Exception) else 'ok')
+        self._merge()
+        if len(self.source_errors) == len(self.sources):
+            raise RuntimeError(self._error_message())
+        return self._error_message() if self.source_errors else None
+
+    async def _refresh_sources(self):
+        return await asyncio.gather(
+            *(asyncio.to_thread(self._refresh_source, source.name) for source in self.sources),
+            return_exceptions=True,
+        )
+
+    def _refresh_source(self, name):
+        sync = self._syncs[name]
+        sync._refresh(self._clients[name].fetch)
+        sync.checked_at = time.time()
+
+    def _error_message(self):
+        return '; '.join(f"{name}: {error}" for name, error in self.source_errors.items())
+
+    def _merge(self):
+        """Fold every source's changes since the last merge into the merged snapshot."""
+        with self._lock:
+            current = {name: sync.snapshot for name, sync in self._syncs.items() if sync.snapshot is not None}
+            changed = {name: snap for name, snap in current.items() if self._merged.get(name, (None,))[0] != snap.version}
+            if not changed:
+                return
+            appended = self.snapshot is not None and all(
+                name in self._merged and self._syncs[name].base_version <= self._merged[name][0]
+                for name in changed
+            )
+            if appended:
+                for name, snap in changed.items():
+                    _, rows, rejects = self._merged[name]
+                    new_rows = self._compact(self._tagged(name, snap.df.iloc[rows:]),
+                                             addresses=ledger_addresses(self.snapshot.df))
+                    self.snapshot = self._extend(self.snapshot, new_rows, self._tagged(name, snap.rejects.iloc[rejects:]))
+                    self._merged[name] = (snap.version, snap.tx_count, len(snap.rejects))
+                self.metrics.inc('ledger_merge', outcome='append')
+            else:
+                self._rebuild_merged(current)
+                self.metrics.inc('ledger_merge', outcome='rebuild')
+            self.metrics.set_gauge('ledger_rows', self.snapshot.tx_count)
+            self.metrics.set_gauge('ledger_wallets', len(self.snapshot.wallets))
+            self.metrics.set_gauge('ledger_version', self.snapshot.version)
+
+    def _rebuild_merged(self, current):
+        """Merge the ``current`` source snapshots from scratch, in source order."""
+        frames = [self._tagged(name, snap.df) for name, snap in current.items()]
+        df = frames[0]
+        for frame in frames[1:]:
+            df = concat_ledgers(df, frame)
+        rejects = pd.concat([self._tagged(name, snap.rejects) for name, snap in current.items()], ignore_index=True)
+        snapshot = self._build(self._compact(df), rejects)
+        # Sources are merged in new row orders, so changed history is carried over from each source's own checks
+        offsets = np.cumsum([0] + [snap.tx_count for snap in current.values()])
+        mismatches = [int(offset) + snap.integrity.first_mismatch for offset, snap in zip(offsets, current.values())
+                      if snap.integrity.first_mismatch is not None]
+        if mismatches:
+            snapshot = snapshot._replace(integrity=snapshot.integrity._replace(first_mismatch=min(mismatches)))
+        self.snapshot = snapshot
+        self.base_version = self.snapshot.version
+        self._merged = {name: (snap.version, snap.tx_count, len(snap.rejects)) for name, snap in current.items()}
+
+    def _tagged(self, name, frame):
+        """``frame`` with its rows tagged as coming from source ``name``."""
+        names = [source.name for source in self.sources]
+        return frame.reset_index(drop=True).assign(**{
+            SOURCE_COLUMN: pd.Categorical([name] * len(frame), categories=names),
+        })
+
@@ -0,0 +1,141 @@
+"""
+Ledger, wallet and aggregate exports as CSV, Parquet or Arrow.
+
+Tables are encoded a chunk of rows at a time (:func:`iter_export`), so an
+export can be streamed without building the whole file in memory.
+"""
+
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from cryptocoin.core import ROLLUP_GRANULARITIES, LedgerFilter, rollup_series
+
+EXPORT_CHUNK_ROWS = 65_536  # rows encoded per piece of a streamed export
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+EXPORT_DATASETS = ('ledger', 'wallets', 'aggregates')
+
+
+def export_table(frame):
+    """``frame`` as an Arrow table for export, without its index and with hashes as text.
+
+    Numeric, timestamp and categorical columns are converted without going
+    through Python objects (categoricals become dictionary arrays).
+    """
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_fixed_size_binary(field.type):
+            table = table.set_column(i, field.name, pc.cast(pc.cast(table.column(i), pa.binary()), pa.string()))
+    return table.replace_schema_metadata(None)
+
+
+def dataset_table(snapshot, dataset, granularity='day'):
+    """Export table of ``dataset``: the ledger, the wallet balances or the aggregate series per ``granularity``."""
+    if dataset == 'ledger':
+        return export_table(snapshot.df)
+    if dataset == 'wallets':
+        return export_table(snapshot.wallets.rename_axis('address').reset_index())
+    if dataset == 'aggregates':
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Unknown granularity {granularity!r}; expected one of {', '.join(ROLLUP_GRANULARITIES)}")
+        return export_table(rollup_series(snapshot.rollups, granularity).reset_index())
+    raise ValueError(f"Unknown export dataset {dataset!r}; expected one of {', '.join(EXPORT_DATASETS)}")
+
+
+class _ExportSink(io.RawIOBase):
+    """Write-only stream whose written bytes are handed out piece by piece; ``tell`` keeps counting."""
+
+    def __init__(self):
+        self._pieces = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._pieces.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._pieces)
+        self._pieces = []
+        return data
+
+
+def iter_export(table, fmt, rows=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Encode ``table`` (only its ``rows``, in order, when given) as ``fmt``, yielding bytes per chunk of rows.
+
+    Each chunk is sliced (or taken) from the Arrow columns and written
+    straight to the encoder, so only one chunk is held in memory at a time:
+    a CSV block with the header first, an Arrow IPC stream batch or a
+    Parquet row group.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    sink = _ExportSink()
+    if fmt == 'csv':
+        writer = pa_csv.CSVWriter(sink, table.schema)
+    elif fmt == 'arrow':
+        writer = pa.ipc.new_stream(sink, table.schema)
+    else:
+        writer = pq.ParquetWriter(sink, table.schema)
+    total = len(rows) if rows is not None else table.num_rows
+    with writer:
+        for start in range(0, total, chunk_rows):
+            if rows is not None:
+                chunk = table.take(pa.array(rows[start:start + chunk_rows]))
+            else:
+                chunk = table.slice(start, chunk_rows)
+            writer.write_table(chunk)
+            yield sink.take()
+    yield sink.take()  # the CSV header of an empty export, the IPC end marker or the Parquet footer
+
+
+def filter_query(flt, addresses):
+    """Query parameters selecting the rows of ``flt`` from the export server; see :func:`parse_filter_query`."""
+    params = []
+    if flt.start is not None:
+        params.append(('start', pd.Timestamp(flt.start).isoformat()))
+    if flt.end is not None:
+        params.append(('end', pd.Timestamp(flt.end).isoformat()))
+    if flt.wallet is not None:
+        params.append(('wallet', addresses[flt.wallet]))
+    if flt.min_amount is not None:
+        params.append(('min_amount', repr(flt.min_amount)))
+    if flt.max_amount is not None:
+        params.append(('max_amount', repr(flt.max_amount)))
+    params.extend(('type', kind) for kind in flt.types)
+    return params
+
+
+def parse_filter_query(query, addresses):
+    """:class:`LedgerFilter` from parsed query parameters (a dict of value lists, as from ``parse_qs``).
+
+    Raises ValueError for malformed values; an unknown wallet matches no rows.
+    """
+    def value(name, convert):
+        return convert(query[name][-1]) if query.get(name) else None
+
+    wallet = value('wallet', str)
+    if wallet is not None:
+        wallet = int(addresses.get_loc(wallet)) if addresses is not None and wallet in addresses else -1
+    return LedgerFilter(
+        start=value('start', pd.Timestamp),
+        end=value('end', pd.Timestamp),
+        wallet=wallet,
+        min_amount=value('min_amount', float),
+        max_amount=value('max_amount', float),
+        types=tuple(query.get('type', ())),
+    )
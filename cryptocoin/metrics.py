@@ -0,0 +1,142 @@
+"""
+Per-stage timings, counters and gauges for the ledger pipeline.
+
+:class:`Metrics` is what :class:`~cryptocoin.core.LedgerSync` and
+:class:`~cryptocoin.client.LedgerClient` record into; it renders the
+Prometheus text format, and :func:`cryptocoin.server.serve_metrics` serves it.
+"""
+
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+import pandas as pd
+
+
+class Metrics:
+    """Thread-safe per-stage latency histograms, counters and gauges.
+
+    Stages are timed with :meth:`timer`, which also accumulates the rows and
+    bytes each stage handled. :meth:`render` produces the Prometheus text
+    exposition format; :meth:`summary` the table shown in the debug panel.
+    """
+
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    PREFIX = 'cryptocoin_'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}  # stage -> [bucket counts..., overflow, count, sum, max, rows, bytes]
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}  # name -> value
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """Time the block as ``stage``; set ``rows`` / ``bytes`` on the yielded dict to record volumes."""
+        sample = {'rows': 0, 'bytes': 0}
+        start = time.perf_counter()
+        try:
+            yield sample
+        finally:
+            self.observe(stage, time.perf_counter() - start, sample['rows'], sample['bytes'])
+
+    def observe(self, stage, seconds, rows=0, nbytes=0):
+        n = len(self.BUCKETS)
+        with self._lock:
+            h = self._stages.get(stage)
+            if h is None:
+                h = self._stages[stage] = [0] * (n + 1) + [0, 0.0, 0.0, 0, 0]
+            h[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            h[n + 1] += 1
+            h[n + 2] += seconds
+            h[n + 3] = max(h[n + 3], seconds)
+            h[n + 4] += int(rows)
+            h[n + 5] += int(nbytes)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def _quantile(self, h, q):
+        """Estimate quantile ``q`` from bucket counts, interpolating within the bucket."""
+        n = len(self.BUCKETS)
+        count, top = h[n + 1], h[n + 3]
+        rank, seen = q * count, 0
+        for i, bucket in enumerate(h[:n + 1]):
+            if bucket and seen + bucket >= rank:
+                lower = self.BUCKETS[i - 1] if i else 0.0
+                upper = min(self.BUCKETS[i], top) if i < n else top
+                return lower + (upper - lower) * (rank - seen) / bucket
+            seen += bucket
+        return top
+
+    def summary(self):
+        """Per-stage calls, latency percentiles (ms), rows and bytes as a DataFrame."""
+        n = len(self.BUCKETS)
+        with self._lock:
+            stages = {stage: list(h) for stage, h in self._stages.items()}
+        rows = [{
+            'stage': stage,
+            'calls': h[n + 1],
+            'mean_ms': 1000 * h[n + 2] / h[n + 1],
+            'p50_ms': 1000 * self._quantile(h, 0.5),
+            'p95_ms': 1000 * self._quantile(h, 0.95),
+            'max_ms': 1000 * h[n + 3],
+            'rows': h[n + 4],
+            'bytes': h[n + 5],
+        } for stage, h in sorted(stages.items())]
+        return pd.DataFrame(rows, columns=['stage', 'calls', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms', 'rows', 'bytes'])
+
+    def counters(self):
+        """Counters and gauges as (metric, labels, value) rows."""
+        with self._lock:
+            rows = [(name, ', '.join(f'{k}={v}' for k, v in labels), value)
+                    for (name, labels), value in sorted(self._counters.items())]
+            rows += [(name, '', value) for name, value in sorted(self._gauges.items())]
+        return pd.DataFrame(rows, columns=['metric', 'labels', 'value'])
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        p, n = self.PREFIX, len(self.BUCKETS)
+        with self._lock:
+            stages = {stage: list(h) for stage, h in self._stages.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+
+        lines = [f'# HELP {p}stage_seconds Wall time per dashboard stage.', f'# TYPE {p}stage_seconds histogram']
+        for stage, h in sorted(stages.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.BUCKETS, h):
+                cumulative += bucket
+                lines.append(f'{p}stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{p}stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h[n + 1]}')
+            lines.append(f'{p}stage_seconds_sum{{stage="{stage}"}} {h[n + 2]:.6f}')
+            lines.append(f'{p}stage_seconds_count{{stage="{stage}"}} {h[n + 1]}')
+        for metric, offset in (('stage_rows_total', 4), ('stage_bytes_total', 5)):
+            lines.append(f'# TYPE {p}{metric} counter')
+            lines += [f'{p}{metric}{{stage="{stage}"}} {h[n + offset]}' for stage, h in sorted(stages.items())]
+
+        declared = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in declared:
+                lines.append(f'# TYPE {p}{name}_total counter')
+                declared.add(name)
+            label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f'{p}{name}_total{{{label_text}}} {value}' if label_text else f'{p}{name}_total {value}')
+        for name, value in sorted(gauges.items()):
+            lines += [f'# TYPE {p}{name} gauge', f'{p}{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write :meth:`render` to ``path`` atomically."""
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
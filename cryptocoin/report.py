@@ -0,0 +1,156 @@
+"""
+Balance and aggregate reports for ledger CSV files.
+
+A report holds a summary (counts, totals and time span), the full wallet
+table, totals per transaction type and per day, and the top wallets per
+leaderboard metric. It is written either as one JSON document or as a
+directory of Parquet files plus ``summary.json``.
+"""
+
+import contextlib
+import json
+import os
+from datetime import datetime
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from cryptocoin.client import LedgerClient
+from cryptocoin.core import (
+    LEADERBOARD_METRICS,
+    build_leaderboard,
+    build_rollups,
+    compact_ledger,
+    leaderboard_frame,
+    leaderboard_wallets,
+    ledger_addresses,
+    read_ledger_csv,
+    resolve_columns,
+    rollup_by_type,
+    rollup_series,
+    rollup_totals,
+)
+
+REPORT_FORMATS = ('json', 'parquet')
+REPORT_TOP = 20  # wallets listed per leaderboard metric
+
+
+class LedgerReport(NamedTuple):
+    """Balances and aggregates of one ledger."""
+    summary: dict
+    wallets: pd.DataFrame  # address, sent, received, balance, role
+    by_type: pd.DataFrame  # totals per transaction type, largest volume first
+    daily: pd.DataFrame  # totals per day and transaction type
+    leaders: dict  # leaderboard metric -> top wallets
+
+
+@contextlib.contextmanager
+def open_ledger(source):
+    """Binary stream of the ledger CSV at ``source``, a local path or an http(s) URL."""
+    if urlparse(source).scheme in ('http', 'https'):
+        with LedgerClient(url=source).fetch() as body:
+            yield body
+    else:
+        with open(source, 'rb') as f:
+            yield f
+
+
+def report_name(source):
+    """File name stem for the report of ``source``."""
+    path = urlparse(source).path if urlparse(source).scheme in ('http', 'https') else source
+    stem = os.path.splitext(os.path.basename(path.rstrip('/')))[0]
+    return stem or 'ledger'
+
+
+def _timestamp(value):
+    return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+
+
+def _number(value):
+    return None if pd.isna(value) else float(value)
+
+
+def build_report(source, top=REPORT_TOP):
+    """Read the ledger at ``source`` and compute its :class:`LedgerReport`."""
+    with open_ledger(source) as body:
+        chunk = read_ledger_csv(body)
+    df = compact_ledger(chunk.df)
+    columns = resolve_columns(df)
+    addresses = ledger_addresses(df)
+    board = build_leaderboard(df)
+    rollups = build_rollups(df)
+    wallets = leaderboard_wallets(board, addresses)
+
+    totals = rollup_totals(rollups)
+    times = df[columns.time_col] if columns.time_col else pd.Series([], dtype='datetime64[ns]')
+    summary = {
+        'source': source,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'transactions': len(df),
+        'rejected_rows': len(chunk.rejects),
+        'wallets': len(wallets),
+        'volume': _number(totals['amount']),
+        'fees': _number(totals['fees']),
+        'smallest': _number(totals['min']),
+        'largest': _number(totals['max']),
+        'first_transaction': _timestamp(times.min()),
+        'last_transaction': _timestamp(times.max()),
+    }
+    leaders = {
+        metric: leaderboard_frame(board, addresses, metric, top).reset_index()
+        for metric in LEADERBOARD_METRICS
+    } if addresses is not None else {}
+
+    wallets = wallets.reset_index()
+    wallets['role'] = wallets['role'].astype(str)
+    return LedgerReport(
+        summary=summary,
+        wallets=wallets,
+        by_type=rollup_by_type(rollups).reset_index(),
+        daily=rollup_series(rollups, 'day').reset_index(),
+        leaders=leaders,
+    )
+
+
+def _records(frame):
+    """``frame`` as JSON-ready records; missing values become null."""
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+
+
+def _json_default(value):
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_report(report, path, fmt='json'):
+    """Write ``report`` to ``path``: a JSON file, or a directory of Parquet files for 'parquet'."""
+    if fmt == 'json':
+        document = {
+            'summary': report.summary,
+            'by_type': _records(report.by_type),
+            'daily': _records(report.daily),
+            'leaders': {metric: _records(frame) for metric, frame in report.leaders.items()},
+            'wallets': _records(report.wallets),
+        }
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2, default=_json_default)
+            f.write('\n')
+    elif fmt == 'parquet':
+        os.makedirs(path, exist_ok=True)
+        leaders = pd.concat(
+            [frame.assign(metric=metric, rank=np.arange(1, len(frame) + 1)) for metric, frame in report.leaders.items()],
+            ignore_index=True,
+        ) if report.leaders else pd.DataFrame(columns=['address', 'metric', 'rank'])
+        for name, frame in {'wallets': report.wallets, 'by_type': report.by_type, 'daily': report.daily,
+                            'leaders': leaders}.items():
+            frame.to_parquet(os.path.join(path, f'{name}.parquet'), index=False)
+        with open(os.path.join(path, 'summary.json'), 'w') as f:
+            json.dump(report.summary, f, indent=2)
+            f.write('\n')
+    else:
+        raise ValueError(f"Unknown report format {fmt!r}; expected one of {', '.join(REPORT_FORMATS)}")
@@ -0,0 +1,109 @@
+"""
+HTTP endpoints for the dashboard: Prometheus metrics and streamed exports.
+
+Each server runs on a daemon thread next to the Streamlit app; nothing in
+:mod:`cryptocoin.core` imports this module.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cryptocoin.core import build_filter_index, ledger_addresses, resolve_filter
+from cryptocoin.exports import EXPORT_DATASETS, EXPORT_FORMATS, dataset_table, iter_export, parse_filter_query
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_metrics(metrics, host, port):
+    """Serve ``metrics`` as Prometheus text at ``http://host:port/metrics`` from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+class _ExportHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        dataset, _, fmt = url.path.strip('/').partition('.')
+        if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS:
+            self.send_error(404)
+            return
+        snapshot = self.server.sync.snapshot
+        if snapshot is None:
+            self.send_error(503, "Ledger not loaded yet")
+            return
+        query = parse_qs(url.query)
+        try:
+            table = dataset_table(snapshot, dataset, query.get('granularity', ['day'])[-1])
+            rows = None
+            if dataset == 'ledger':
+                flt = parse_filter_query(query, ledger_addresses(snapshot.df))
+                if flt:
+                    rows = resolve_filter(snapshot, self.server.filter_index(snapshot), flt)
+        except (ValueError, KeyError) as e:
+            self.send_error(400, str(e))
+            return
+
+        self.server.sync.metrics.inc('ledger_export', dataset=dataset, format=fmt)
+        self.send_response(200)
+        self.send_header('Content-Type', EXPORT_FORMATS[fmt])
+        self.send_header('Content-Disposition', f'attachment; filename="{dataset}.{fmt}"')
+        self.end_headers()
+        # No Content-Length: the body is streamed and the connection closed after it
+        with self.server.sync.metrics.timer('export') as sample:
+            sample['rows'] = len(rows) if rows is not None else table.num_rows
+            for piece in iter_export(table, fmt, rows):
+                self.wfile.write(piece)
+                sample['bytes'] += len(piece)
+
+
+class _ExportServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, sync):
+        super().__init__(address, _ExportHandler)
+        self.sync = sync
+        self._index_lock = threading.Lock()
+        self._index = (None, None)
+
+    def filter_index(self, snapshot):
+        """The :class:`FilterIndex` of ``snapshot``, built once per ledger version."""
+        with self._index_lock:
+            version, index = self._index
+            if version != snapshot.version:
+                index = build_filter_index(snapshot.df)
+                self._index = (snapshot.version, index)
+            return index
+
+
+def serve_exports(sync, host, port):
+    """Stream exports of ``sync``'s current snapshot over HTTP from a daemon thread.
+
+    ``GET /<dataset>.<format>`` returns the ``ledger``, ``wallets`` or
+    ``aggregates`` (``?granularity=hour|day|week``) as ``csv``, ``parquet`` or
+    ``arrow``. The ledger takes the filter parameters of
+    :func:`parse_filter_query`. Each request runs on its own thread.
+    """
+    server = _ExportServer((host, port), sync)
+    threading.Thread(target=server.serve_forever, name='export-server', daemon=True).start()
+    return server
@@ -0,0 +1,26 @@
+import json
+import os
+
+from benchmarks.synthetic import ledger_csv_bytes
+from cryptocoin.cli import _output_paths, main
+
+
+def test_output_names_never_collide():
+    sources = ['a.csv', 'x/a.csv', 'a-2.csv', 'https://host/a-2.csv', 'y/A.csv']
+    paths = _output_paths(sources, 'out', 'json')
+    assert paths == [os.path.join('out', name) for name in
+                     ['a.json', 'a-2.json', 'a-2-2.json', 'a-2-3.json', 'A-3.json']]
+
+
+def test_reports_with_the_same_name_are_all_written(tmp_path):
+    sources = []
+    for i, folder in enumerate(['x', 'y', 'z']):
+        os.makedirs(tmp_path / folder)
+        name = 'a-2.csv' if folder == 'z' else 'a.csv'
+        (tmp_path / folder / name).write_bytes(ledger_csv_bytes(100 * (i + 1), 50, i))
+        sources.append(str(tmp_path / folder / name))
+
+    out = tmp_path / 'reports'
+    assert main([*sources, '--out', str(out), '--workers', '1']) == 0
+    written = {name: json.loads((out / name).read_text())['summary']['transactions'] for name in os.listdir(out)}
+    assert written == {'a.json': 100, 'a-2.json': 200, 'a-2-2.json': 300}
@@ -0,0 +1,103 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import ledger_csv_bytes
+from cryptocoin.core import (
+    LedgerFilter,
+    LedgerSync,
+    build_filter_index,
+    build_views,
+    filtered_ledger,
+    ledger_addresses,
+    read_ledger_csv,
+    search_addresses,
+)
+
+BODY = ledger_csv_bytes(5_000, 300, 0)
+# Two undated rows, which no date range may match
+BODY += b'not a date,0xu1,,0x' + b'ab' * 20 + b',12.5,0.01,mint\n'
+BODY += b',0xu2,0x' + b'ab' * 20 + b',0x' + b'cd' * 20 + b',40,0.01,transfer\n'
+
+LEDGER = LedgerSync().apply(io.BytesIO(BODY))
+VIEWS = build_views(LEDGER)
+INDEX = build_filter_index(LEDGER.df)
+RAW = read_ledger_csv(io.BytesIO(BODY)).df  # plain pandas columns, same rows in the same order
+BUSY = RAW['From'].value_counts().index[0]
+START, END = pd.Timestamp('2025-01-01 12:00'), pd.Timestamp('2025-01-02 06:00')
+
+
+def _unique_prefix(address):
+    """The shortest prefix of ``address`` that matches only it, as the filter bar resolves it."""
+    addresses = ledger_addresses(LEDGER.df)
+    for n in range(3, len(address) + 1):
+        if search_addresses(LEDGER.index, addresses, address[:n], limit=2)[1] == 1:
+            return address[:n]
+    raise AssertionError(address)
+
+
+def _code(query):
+    addresses = ledger_addresses(LEDGER.df)
+    matches, total = search_addresses(LEDGER.index, addresses, query, limit=2)
+    assert total == 1 or matches[0].lower() == query.lower()
+    return int(addresses.get_loc(matches[0]))
+
+
+QUIET = RAW['To'].value_counts().index[-1]
+PREFIX = _unique_prefix(QUIET)
+
+
+def _party(address):
+    return (RAW['From'] == address) | (RAW['To'] == address)
+
+
+CASES = {
+    'type': (dict(types=('reward',)), RAW['Type'] == 'reward'),
+    'types': (dict(types=('stake', 'mint')), RAW['Type'].isin(['stake', 'mint'])),
+    'absent type': (dict(types=('transfer', 'refund')), RAW['Type'] == 'transfer'),
+    'wallet': (dict(wallet=_code(BUSY)), _party(BUSY)),
+    'wallet prefix': (dict(wallet=_code(PREFIX)), RAW['From'].str.startswith(PREFIX, na=False)
+                      | RAW['To'].str.startswith(PREFIX, na=False)),
+    'min amount': (dict(min_amount=50.0), RAW['Amount'] >= 50),
+    'amount range': (dict(min_amount=5.0, max_amount=20.0), RAW['Amount'].between(5, 20)),
+    'date range': (dict(start=START, end=END), (RAW['Timestamp'] >= START) & (RAW['Timestamp'] < END)),
+    'since': (dict(start=END), RAW['Timestamp'] >= END),
+    'everything': (dict(types=('transfer',), wallet=_code(BUSY), min_amount=10.0, start=START),
+                   (RAW['Type'] == 'transfer') & _party(BUSY) & (RAW['Amount'] >= 10) & (RAW['Timestamp'] >= START)),
+}
+
+
+@pytest.mark.parametrize('case', list(CASES))
+def test_filter_matches_a_boolean_mask(case):
+    kwargs, mask = CASES[case]
+    mask = mask.fillna(False).to_numpy(dtype=bool)
+    assert mask.any()
+    result = filtered_ledger(LEDGER, VIEWS, INDEX, LedgerFilter(**kwargs))
+
+    np.testing.assert_array_equal(result.rows, np.flatnonzero(mask))
+    expected = RAW[mask]
+    assert result.tx_count == len(expected)
+    assert result.total_volume == pytest.approx(expected['Amount'].sum())
+    wallets = pd.concat([expected['From'], expected['To']]).dropna()
+    assert result.wallet_count == wallets.nunique()
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(types=('refund',)),
+    dict(min_amount=1e12),
+    dict(start=pd.Timestamp('2030-01-01')),
+    dict(min_amount=30.0, max_amount=20.0),
+    dict(types=('mint',), wallet=_code(QUIET), min_amount=1e9),
+], ids=['absent type', 'amount', 'dates', 'empty range', 'combined'])
+def test_filter_without_matches_is_empty(kwargs):
+    result = filtered_ledger(LEDGER, VIEWS, INDEX, LedgerFilter(**kwargs))
+    assert result.rows.size == 0
+    assert (result.tx_count, result.total_volume, result.wallet_count) == (0, 0.0, 0)
+    assert LEDGER.df.iloc[result.rows].empty
+
+
+def test_no_filter_keeps_every_row():
+    assert not LedgerFilter()
+    np.testing.assert_array_equal(filtered_ledger(LEDGER, VIEWS, INDEX, LedgerFilter()).rows, np.arange(len(RAW)))
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from cryptocoin.core import build_flow_graph, pagerank
+
+
+def _ledger(rows):
+    return pd.DataFrame(rows, columns=['From', 'To', 'Amount'])
+
+
+def _assert_distribution(rank):
+    assert np.isfinite(rank).all()
+    assert (rank >= 0).all()
+    assert np.isclose(rank.sum(), 1.0)
+
+
+def test_pagerank_ignores_zero_amount_edges():
+    graph = build_flow_graph(_ledger([('A', 'B', 10.0), ('B', 'C', 0.0), ('C', 'A', 5.0)]))
+    _assert_distribution(graph.rank)
+
+
+def test_pagerank_ignores_negative_amount_edges():
+    sources, targets = np.array([0, 1, 1, 2]), np.array([1, 2, 0, 0])
+    rank = pagerank(3, sources, targets, np.array([10.0, -4.0, 6.0, 5.0]))
+    _assert_distribution(rank)
+    expected = pagerank(3, sources[[0, 2, 3]], targets[[0, 2, 3]], np.array([10.0, 6.0, 5.0]))
+    assert np.allclose(rank, expected)
+
+
+def test_pagerank_all_dangling_is_uniform():
+    rank = pagerank(4, np.array([0, 1]), np.array([1, 2]), np.array([0.0, 0.0]))
+    _assert_distribution(rank)
+    assert np.allclose(rank, 0.25)
+
+
+def test_pagerank_empty():
+    assert pagerank(0, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)).size == 0
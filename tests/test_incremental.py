@@ -0,0 +1,91 @@
+"""
+Every structure folded in incrementally as rows are appended equals the same
+structure built from scratch over the whole ledger.
+"""
+
+import functools
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import ledger_csv_bytes, wallet_addresses
+from cryptocoin.core import LedgerSync
+
+WALLETS = 300
+OLD, BUSY = wallet_addresses(WALLETS, 0)[:2]
+NEW = '0x' + 'ab' * 20
+
+
+def _rows(n, seed):
+    """``n`` ledger CSV data rows, without the header (wallets differ by ``seed``)."""
+    return ledger_csv_bytes(n, WALLETS, seed).split(b'\n', 1)[1]
+
+
+# Rows the synthetic ledger never has
+EDGE_ROWS = [
+    f',0xe1,,{OLD},5.0,0.01,mint\n',  # no timestamp, no sender
+    f'2025-03-01 00:00:00,0xe2,{OLD},{OLD},7.5,0.02,transfer\n',  # self-transfer
+    f'2025-03-01 00:00:01,0xe3,{OLD},{NEW},-3.25,0,transfer\n',  # negative amount to a new wallet
+    f'2025-03-01 00:00:02,0xe2,{NEW},{OLD},1.5,0.01,transfer\n',  # repeated hash
+    f'2025-02-01 00:00:00,0xe4,{NEW},{BUSY},2.0,,\n',  # backdated, no fee or type
+    f'not a date,0xe5,{BUSY},{NEW},3.0,0.01,transfer\n',  # unparsed timestamp
+    f'2025-03-01 00:00:03,0xe6,{BUSY},{NEW},1000000,0.5,transfer\n',  # outsized
+    f'2025-03-01 00:01:00,0xe7,{NEW},0x{"cd" * 20},250000,0.1,transfer\n',  # large, to a new wallet
+]
+EDGE_ROWS = [row.encode() for row in EDGE_ROWS]
+BURST = b''.join(f'2025-03-02 00:00:{i:02d},0xb{i},{BUSY},{OLD},{i + 1},0.01,stake\n'.encode() for i in range(15))
+
+SCENARIOS = {
+    'one_append': (3_000, [_rows(1_000, 1) + b''.join(EDGE_ROWS) + BURST]),
+    'several_appends': (3_000, [_rows(700, 1), b''.join(EDGE_ROWS), _rows(300, 2), BURST]),
+    'row_by_row': (3_000, EDGE_ROWS + [BURST]),
+    'small_base': (10, [_rows(5, 3), b''.join(EDGE_ROWS), _rows(2_000, 4), BURST]),
+}
+STRUCTURES = ['df', 'wallets', 'total_volume', 'rejects', 'history', 'index', 'leaders', 'rollups',
+              'integrity', 'anomalies']
+
+
+@functools.lru_cache
+def _snapshots(scenario):
+    """(snapshot after syncing the base and each append in turn, snapshot of the whole body at once)."""
+    rows, appends = SCENARIOS[scenario]
+    body = ledger_csv_bytes(rows, WALLETS, 0)
+    sync = LedgerSync()
+    sync.apply(io.BytesIO(body))
+    for chunk in appends:
+        body += chunk
+        sync.apply(io.BytesIO(body))
+    assert sync.base_version == 1  # every append was folded in
+    return sync.snapshot, LedgerSync().apply(io.BytesIO(body))
+
+
+def _assert_same(folded, built, path):
+    if isinstance(built, tuple) and hasattr(built, '_fields'):
+        for field in built._fields:
+            _assert_same(getattr(folded, field), getattr(built, field), f'{path}.{field}')
+    elif isinstance(built, dict):
+        assert folded.keys() == built.keys(), path
+        for key in built:
+            _assert_same(folded[key], built[key], f'{path}[{key!r}]')
+    elif isinstance(built, pd.DataFrame):
+        # Appends add categories at the end, a rebuild sorts them; only the values must match
+        pd.testing.assert_frame_equal(folded, built, check_exact=False, rtol=1e-9, check_categorical=False, obj=path)
+    elif isinstance(built, np.ndarray):
+        assert folded.dtype == built.dtype and folded.shape == built.shape, path
+        if built.dtype.kind == 'f':
+            np.testing.assert_allclose(folded, built, rtol=1e-9, atol=1e-9, err_msg=path)
+        else:
+            np.testing.assert_array_equal(folded, built, err_msg=path)
+    elif isinstance(built, float):
+        assert folded == pytest.approx(built, rel=1e-9, nan_ok=True), path
+    else:
+        assert folded == built, path
+
+
+@pytest.mark.parametrize('structure', STRUCTURES)
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+def test_appends_match_a_rebuild(scenario, structure):
+    folded, built = _snapshots(scenario)
+    _assert_same(getattr(folded, structure), getattr(built, structure), structure)
@@ -0,0 +1,113 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import ledger_csv_bytes
+from cryptocoin import core
+from cryptocoin.core import (
+    LedgerSync,
+    build_integrity,
+    compact_ledger,
+    extend_integrity,
+    read_ledger_csv,
+    row_digests,
+)
+
+BODY = ledger_csv_bytes(1_000, 100, 0)
+# A repeated hash and a backdated row
+_, FIRST, _ = BODY.split(b'\n', 2)
+EXTRA = b'2024-12-31 00:00:00,' + FIRST.split(b',', 2)[1] + b',0xaa,0xbb,1.5,0.01,transfer\n'
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """Chunks of 64 rows, so a small ledger spans many chain links."""
+    monkeypatch.setattr(core, 'INTEGRITY_CHUNK_ROWS', 64)
+
+
+def _ledger(body):
+    return compact_ledger(read_ledger_csv(io.BytesIO(body)).df)
+
+
+def _edit(body, row, amount=b'12345.5'):
+    lines = body.split(b'\n')
+    cells = lines[row + 1].split(b',')
+    cells[4] = amount
+    lines[row + 1] = b','.join(cells)
+    return b'\n'.join(lines)
+
+
+def _assert_same(report, expected):
+    for field in expected._fields:
+        a, b = getattr(report, field), getattr(expected, field)
+        if isinstance(b, np.ndarray):
+            np.testing.assert_array_equal(a, b, err_msg=field)
+        else:
+            assert a == b, field
+
+
+@pytest.mark.parametrize('split', [1, 63, 64, 65, 500, 999])
+def test_extending_equals_a_full_build(split):
+    df = _ledger(BODY + EXTRA)
+    report = build_integrity(df.iloc[:split])
+    for start in range(split, len(df), 300):
+        report = extend_integrity(report, df.iloc[start:start + 300], start)
+    expected = build_integrity(df)
+    assert expected.duplicates == 1 and expected.first_duplicate == 1_000
+    assert expected.out_of_order == 1 and expected.first_out_of_order == 1_000
+    _assert_same(report, expected)
+
+
+@pytest.mark.parametrize('row', [0, 64, 700, 999])
+def test_edited_row_reports_its_index(row):
+    before = build_integrity(_ledger(BODY))
+    after = build_integrity(_ledger(_edit(BODY, row)), previous=before)
+    assert after.first_mismatch == row
+    assert not after.verified
+
+
+def test_removed_and_appended_rows():
+    before = build_integrity(_ledger(BODY))
+    assert build_integrity(_ledger(BODY[:BODY.rindex(b'\n', 0, -1) + 1]), previous=before).first_mismatch == 999
+    assert build_integrity(_ledger(BODY + EXTRA.replace(b'0xaa', b'0xcc')), previous=before).first_mismatch is None
+
+
+def test_pooled_digests_match_serial(monkeypatch):
+    monkeypatch.setattr(core, 'INTEGRITY_POOL_ROWS', 0)
+    df = _ledger(BODY + EXTRA)
+    np.testing.assert_array_equal(row_digests(df, workers=2), row_digests(df, workers=1))
+    _assert_same(build_integrity(df, workers=3), build_integrity(df, workers=1))
+
+
+def test_changed_history_stays_reported_across_restarts(tmp_path):
+    store = str(tmp_path)
+    sync = LedgerSync(store_dir=store)
+    sync.apply(io.BytesIO(BODY))
+    assert sync.snapshot.integrity.verified
+    sync.apply(io.BytesIO(_edit(BODY, 300)))
+    assert sync.snapshot.integrity.first_mismatch == 300
+
+    # Changing the row back does not clear the finding, in the same process...
+    sync.apply(io.BytesIO(BODY))
+    assert sync.snapshot.integrity.first_mismatch == 300
+    # ...or after a restart
+    restarted = LedgerSync(store_dir=store)
+    assert restarted.snapshot.integrity.first_mismatch == 300
+    restarted.apply(io.BytesIO(BODY + EXTRA))
+    assert restarted.snapshot.integrity.first_mismatch == 300
+
+
+def test_store_edited_on_disk_is_reported(tmp_path):
+    store = str(tmp_path)
+    LedgerSync(store_dir=store).apply(io.BytesIO(BODY))
+    path = os.path.join(store, 'ledger.parquet')
+    df = pd.read_parquet(path)
+    df.loc[200, 'Amount'] += 1
+    df.to_parquet(path, index=False)
+
+    integrity = LedgerSync(store_dir=store).snapshot.integrity
+    assert integrity.first_mismatch == 192  # start of the 64-row chunk holding row 200
+    assert not integrity.verified
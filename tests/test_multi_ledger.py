@@ -0,0 +1,157 @@
+import contextlib
+import functools
+import io
+import os
+import socket
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.standin import serve_ledger
+from benchmarks.synthetic import ledger_csv_bytes
+from cryptocoin.client import LedgerClient
+from cryptocoin.core import (
+    SOURCE_COLUMN,
+    LedgerSource,
+    MultiLedgerSync,
+    build_rollups,
+    calculate_wallet_balances,
+    compact_ledger,
+    read_ledger_csv,
+)
+
+SOURCE_ROWS = {'north': 3_000, 'south': 4_000, 'east': 1_000}
+no_retries = functools.partial(LedgerClient, retries=0)
+
+
+def _rows(n, seed):
+    """``n`` ledger CSV data rows, without the header."""
+    return ledger_csv_bytes(n, 300, seed).split(b'\n', 1)[1]
+
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    return f'http://127.0.0.1:{port}/ledger.csv'
+
+
+@pytest.fixture
+def stand_ins():
+    """A running stand-in server per source, by name."""
+    with contextlib.ExitStack() as stack:
+        yield {
+            name: stack.enter_context(serve_ledger(ledger_csv_bytes(rows, 300, seed)))
+            for seed, (name, rows) in enumerate(SOURCE_ROWS.items())
+        }
+
+
+def _sources(stand_ins):
+    return [LedgerSource(name, server.url) for name, server in stand_ins.items()]
+
+
+def _assert_merged(sync, stand_ins):
+    """The merged snapshot matches a ledger rebuilt from the concatenated source CSVs."""
+    snapshot = sync.snapshot
+    frames = [read_ledger_csv(io.BytesIO(server.snapshot(gzipped=False)[1])).df for server in stand_ins.values()]
+    expected = calculate_wallet_balances(compact_ledger(pd.concat(frames, ignore_index=True)))
+    assert len(snapshot.wallets) == len(expected)
+    assert np.allclose(snapshot.wallets.loc[expected.index, 'balance'], expected['balance'])
+
+    counts = snapshot.df[SOURCE_COLUMN].value_counts()
+    for name in stand_ins:
+        assert counts[name] == sync.source_snapshots()[name].tx_count
+    pd.testing.assert_frame_equal(snapshot.rollups.cube, build_rollups(snapshot.df).cube)
+
+
+def test_failing_source_keeps_the_others(stand_ins):
+    sources = _sources(stand_ins) + [LedgerSource('down', _closed_port_url())]
+    sync = MultiLedgerSync(sources, client_factory=no_retries)
+
+    error = sync._refresh()
+    assert set(sync.source_errors) == {'down'}
+    assert error.startswith('down: ')
+    assert sync.source_snapshots()['down'] is None
+    _assert_merged(sync, stand_ins)
+
+
+def test_every_source_failing_is_an_error():
+    sync = MultiLedgerSync([LedgerSource('down', _closed_port_url())], client_factory=no_retries)
+    with pytest.raises(RuntimeError, match='down: '):
+        sync._refresh()
+    assert sync.snapshot is None
+
+
+def test_append_only_update_extends_the_merge(stand_ins):
+    sync = MultiLedgerSync(_sources(stand_ins), client_factory=no_retries)
+    sync._refresh()
+    before = sync.source_snapshots()
+    version, base_version = sync.snapshot.version, sync.base_version
+
+    stand_ins['south'].append(_rows(500, 9))
+    assert sync._refresh() is None
+
+    after = sync.source_snapshots()
+    assert after['north'] is before['north'] and after['east'] is before['east']
+    assert after['south'].tx_count == SOURCE_ROWS['south'] + 500
+    assert sync.snapshot.version == version + 1
+    assert sync.base_version == base_version  # folded in, not rebuilt
+    _assert_merged(sync, stand_ins)
+
+
+def test_edited_source_rebuilds_the_merge(stand_ins):
+    sync = MultiLedgerSync(_sources(stand_ins), client_factory=no_retries)
+    sync._refresh()
+    base_version = sync.base_version
+
+    north = stand_ins['north']
+    header, first, rest = north.snapshot(gzipped=False)[1].split(b'\n', 2)
+    cells = first.split(b',')
+    cells[4] = b'12345.5'  # amount of the first transaction
+    north.set_body(b'\n'.join([header, b','.join(cells), rest]))
+    sync._refresh()
+
+    assert sync.base_version != base_version
+    _assert_merged(sync, stand_ins)
+
+
+def test_edited_source_fails_merged_integrity(stand_ins):
+    sync = MultiLedgerSync(_sources(stand_ins), client_factory=no_retries)
+    sync._refresh()
+    assert sync.snapshot.integrity.verified
+
+    south = stand_ins['south']
+    header, first, second, rest = south.snapshot(gzipped=False)[1].split(b'\n', 3)
+    cells = second.split(b',')
+    cells[4] = b'12345.5'  # amount of the second transaction
+    south.set_body(b'\n'.join([header, first, b','.join(cells), rest]))
+    sync._refresh()
+
+    assert sync.source_snapshots()['south'].integrity.first_mismatch == 1
+    assert not sync.snapshot.integrity.verified
+    assert sync.snapshot.integrity.first_mismatch == SOURCE_ROWS['north'] + 1
+    assert sync.snapshot.df[SOURCE_COLUMN].iloc[SOURCE_ROWS['north'] + 1] == 'south'
+
+    stand_ins['east'].append(_rows(100, 7))
+    sync._refresh()  # appends keep the finding
+    assert sync.snapshot.integrity.first_mismatch == SOURCE_ROWS['north'] + 1
+
+
+def test_warm_start_from_source_stores(stand_ins, tmp_path):
+    store = str(tmp_path)
+    sync = MultiLedgerSync(_sources(stand_ins), store_dir=store, client_factory=no_retries)
+    sync._refresh()
+    stand_ins['east'].append(_rows(200, 5))
+    sync._refresh()
+    assert sorted(os.listdir(store)) == sorted(SOURCE_ROWS)
+
+    warm = MultiLedgerSync(_sources(stand_ins), store_dir=store, client_factory=no_retries)
+    assert warm.snapshot is not None  # before any fetch
+    assert warm.snapshot.tx_count == sync.snapshot.tx_count
+    balances = warm.snapshot.wallets['balance']
+    assert np.allclose(balances.sort_index(), sync.snapshot.wallets['balance'].sort_index())
+    assert {name: s.tx_count for name, s in warm.source_snapshots().items()} == {
+        name: s.tx_count for name, s in sync.source_snapshots().items()
+    }
+    _assert_merged(warm, stand_ins)
@@ -0,0 +1,66 @@
+"""
+Sessions share one ledger snapshot: each extra session costs a small, fixed
+amount of memory, however large the ledger and however many sessions are open.
+
+Every ledger size is measured in a fresh spawned process, so the app's
+process-wide caches start empty and read this test's stand-in server.
+"""
+
+import gc
+import multiprocessing
+import os
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+SESSIONS = 8
+SMALL, LARGE = 5_000, 40_000  # ledger rows
+
+
+def _measure(rows, sessions):
+    """Traced bytes of the warm shared state, and of ``n`` more open sessions for n = 1..``sessions``."""
+    from benchmarks.standin import serve_ledger
+    from benchmarks.synthetic import ledger_csv_bytes
+
+    with serve_ledger(ledger_csv_bytes(rows, 1_000, 0)) as server, tempfile.TemporaryDirectory() as store:
+        os.environ.update(LEDGER_CSV_URL=server.url, LEDGER_STORE_DIR=store)
+        from streamlit.testing.v1 import AppTest
+
+        tracemalloc.start()
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        warm = AppTest.from_file(APP_PATH, default_timeout=120).run()
+        assert not warm.exception, warm.exception
+        gc.collect()
+        base = tracemalloc.get_traced_memory()[0]
+
+        open_sessions, used = [], {}
+        for n in range(1, sessions + 1):
+            at = AppTest.from_file(APP_PATH, default_timeout=120).run()
+            assert not at.exception, at.exception
+            open_sessions.append(at)  # keep every session alive while measuring
+            gc.collect()
+            used[n] = tracemalloc.get_traced_memory()[0] - base
+        return base - before, used
+
+
+def _run(rows):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_measure, rows, SESSIONS).result()
+
+
+def test_per_session_memory_stays_flat():
+    small_shared, small = _run(SMALL)
+    large_shared, large = _run(LARGE)
+    ledger_bytes = large_shared - small_shared
+    assert ledger_bytes > 0
+
+    for used in (small, large):
+        per_session = {n: total / n for n, total in used.items()}
+        # Opening more sessions doesn't make each one more expensive
+        assert per_session[SESSIONS] <= 1.5 * per_session[1]
+    # A session holds no copy of the ledger: its cost doesn't grow with the ledger...
+    assert large[SESSIONS] / SESSIONS <= small[SESSIONS] / SESSIONS + 0.05 * ledger_bytes
+    # ...and is a small fraction of what the extra ledger rows take once
+    assert large[SESSIONS] / SESSIONS <= 0.1 * ledger_bytes
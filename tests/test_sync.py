@@ -0,0 +1,100 @@
+import io
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import ledger_csv_bytes
+from cryptocoin import core
+from cryptocoin.core import LedgerSync, calculate_wallet_balances, compact_ledger, read_ledger_csv
+
+BODY = ledger_csv_bytes(2_000, 200, 0)
+MORE = ledger_csv_bytes(500, 200, 1).split(b'\n', 1)[1]
+
+
+def _assert_matches(snapshot, body):
+    """``snapshot`` holds exactly the ledger parsed from ``body`` in one go."""
+    expected = compact_ledger(read_ledger_csv(io.BytesIO(body)).df)
+    assert snapshot.tx_count == len(expected)
+    wallets = calculate_wallet_balances(expected)
+    assert np.allclose(snapshot.wallets.loc[wallets.index, 'balance'], wallets['balance'])
+
+
+def _synced(body=BODY):
+    sync = LedgerSync()
+    sync.apply(io.BytesIO(body))
+    return sync
+
+
+def _outcomes(sync):
+    counters = sync.metrics.counters()
+    counters = counters[counters['metric'] == 'ledger_sync']
+    return dict(zip(counters['labels'], counters['value']))
+
+
+def test_pure_append_folds_in_the_new_rows():
+    sync = _synced()
+    base_version = sync.base_version
+    snapshot = sync.apply(io.BytesIO(BODY + MORE))
+    assert _outcomes(sync) == {'outcome=rebuild': 1, 'outcome=append': 1}
+    assert sync.base_version == base_version
+    assert snapshot.version == base_version + 1
+    assert snapshot.integrity.verified
+    _assert_matches(snapshot, BODY + MORE)
+
+
+def test_unchanged_body_keeps_the_snapshot():
+    sync = _synced()
+    snapshot = sync.snapshot
+    assert sync.apply(io.BytesIO(BODY)) is snapshot
+    assert _outcomes(sync)['outcome=unchanged'] == 1
+
+
+@pytest.mark.parametrize('spool_bytes', [core.SPOOL_MAX_BYTES, 1024])
+def test_edited_prefix_rebuilds(monkeypatch, spool_bytes):
+    # A small spool replays the prefix from disk, in several blocks
+    monkeypatch.setattr(core, 'SPOOL_MAX_BYTES', spool_bytes)
+    monkeypatch.setattr(core, 'CSV_BLOCK_SIZE', 4096)
+    sync = _synced()
+    base_version = sync.base_version
+    header, first, rest = BODY.split(b'\n', 2)
+    cells = first.split(b',')
+    cells[4] = b'12345.5'  # amount of the first transaction
+    edited = b'\n'.join([header, b','.join(cells), rest]) + MORE
+
+    snapshot = sync.apply(io.BytesIO(edited))
+    assert _outcomes(sync) == {'outcome=rebuild': 2}
+    assert sync.base_version == snapshot.version != base_version
+    assert snapshot.integrity.first_mismatch == 0
+    _assert_matches(snapshot, edited)
+
+
+def test_truncated_body_rebuilds():
+    sync = _synced(BODY + MORE)
+    truncated = BODY[:BODY.rindex(b'\n', 0, len(BODY) // 2) + 1]
+    snapshot = sync.apply(io.BytesIO(truncated))
+    assert _outcomes(sync) == {'outcome=rebuild': 2}
+    assert sync.base_version == snapshot.version
+    assert not snapshot.integrity.verified  # rows were removed
+    _assert_matches(snapshot, truncated)
+
+
+def test_partial_last_row_waits_until_complete():
+    cut = len(BODY) + MORE.index(b',', MORE.index(b',') + 1)  # mid-way through the first new row
+    sync = _synced()
+    snapshot = sync.apply(io.BytesIO((BODY + MORE)[:cut]))
+    assert snapshot.tx_count == 2_000
+    assert snapshot.rejects.empty
+
+    snapshot = sync.apply(io.BytesIO(BODY + MORE))
+    assert _outcomes(sync) == {'outcome=rebuild': 1, 'outcome=unchanged': 1, 'outcome=append': 1}
+    assert snapshot.integrity.verified
+    _assert_matches(snapshot, BODY + MORE)
+
+
+def test_complete_last_row_without_line_break_is_kept():
+    body = BODY.rstrip(b'\n')
+    sync = _synced(body)
+    assert sync.snapshot.tx_count == 2_000
+    snapshot = sync.apply(io.BytesIO(body + b'\n' + MORE))
+    assert _outcomes(sync) == {'outcome=rebuild': 1, 'outcome=append': 1}
+    _assert_matches(snapshot, BODY + MORE)